@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+    benchmarks.bulk
+    ~~~~~~~~~~~~~~~
+
+    Compares the lines/sec of extracting the GGA positions of a capture log
+    line by line with formatter.parse and the typed fields against the
+    columnar formatter.parse_file.
+
+    Usage: python benchmarks/bulk.py [lines]
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from nmeaserver import formatter  # noqa: E402
+
+timer = getattr(time, 'perf_counter', time.time)
+
+LINES = [
+    formatter.format('GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,'
+                     '46.9,M,,'),
+    formatter.format('GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,'
+                     '230394,003.1,W'),
+    formatter.format('GPVTG,054.7,T,034.4,M,005.5,N,010.2,K'),
+    formatter.format('HEHDT,274.07,T'),
+]
+
+
+def line_by_line(path):
+    latitudes, longitudes = [], []
+    with open(path, 'rb') as log:
+        for line in log:
+            try:
+                message = formatter.parse(line.strip())
+            except ValueError:
+                continue
+            if message['sentence_type'] == 'GGA':
+                latitudes.append(message.fields.latitude)
+                longitudes.append(message.fields.longitude)
+    return len(latitudes)
+
+
+def columnar(path):
+    rows = 0
+    for chunk in formatter.parse_file(path, 'GGA'):
+        rows += len(chunk['columns']['latitude'])
+    return rows
+
+
+def run(count):
+    log = tempfile.NamedTemporaryFile(suffix='.log', delete=False)
+    try:
+        log.write((('\r\n'.join(LINES) + '\r\n') * (count // len(LINES)))
+                  .encode('ascii'))
+        log.close()
+        for extract in (line_by_line, columnar):
+            start = timer()
+            rows = extract(log.name)
+            seconds = timer() - start
+            print('{:<14} {:>8} rows {:>14,.0f} lines/sec'.format(
+                extract.__name__, rows, count / seconds))
+    finally:
+        os.remove(log.name)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+    benchmarks.checksum
+    ~~~~~~~~~~~~~~~~~~~
+
+    Compares the checksums/sec of the original reduce based checksum against
+    formatter.calc_checksum on str and bytes and formatter.calc_checksums.
+
+    Usage: python benchmarks/checksum.py [count]
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+from __future__ import print_function
+
+import operator
+import os
+import sys
+import timeit
+from functools import reduce
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from nmeaserver import formatter  # noqa: E402
+
+SENTENCE = formatter.format('GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,'
+                            '545.4,M,46.9,M,,')
+
+
+def reduce_checksum(nmea_str):
+    # formatter.calc_checksum as of 0.1.10
+    if nmea_str.startswith('$'):
+        nmea_str = nmea_str[1:]
+    if nmea_str.find('*') >= 0:
+        nmea_str = nmea_str[:nmea_str.find('*')]
+    checksum = hex(reduce(operator.xor, map(ord, nmea_str), 0))[2:].upper()
+    if len(checksum) == 2:
+        return checksum
+    else:
+        return '0' + checksum
+
+
+def report(name, seconds, count):
+    print('{:<24} {:>12,.0f} checksums/sec'.format(name, count / seconds))
+
+
+def run(count):
+    encoded = SENTENCE.encode('ascii')
+    for name, function in [
+            ('reduce (str)', lambda: reduce_checksum(SENTENCE)),
+            ('calc_checksum (str)', lambda: formatter.calc_checksum(SENTENCE)),
+            ('calc_checksum (bytes)',
+             lambda: formatter.calc_checksum(encoded))]:
+        report(name, min(timeit.repeat(function, number=count, repeat=3)),
+               count)
+
+    batch = [SENTENCE] * count
+    report('calc_checksums (batch)',
+           min(timeit.repeat(lambda: formatter.calc_checksums(batch),
+                             number=1, repeat=3)), count)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+    benchmarks.latency
+    ~~~~~~~~~~~~~~~~~~
+
+    Measures the request/response round-trip time of a NMEAServer over a
+    loopback connection and reports the p50/p99 latency.
+
+    Usage: python benchmarks/latency.py [count]
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+from __future__ import print_function
+
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from nmeaserver import server, formatter  # noqa: E402
+
+timer = getattr(time, 'perf_counter', time.time)
+
+PORT = 9123
+REQUEST = formatter.format('RBTST,101218,161229,21.31198,N,157.88972,W') + \
+    '\r\n'
+
+
+def percentile(samples, pct):
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100.0))]
+
+
+def run(count):
+    app = server.NMEAServer('127.0.0.1', PORT)
+
+    @app.message('RBTST')
+    def tst(context, message):
+        return formatter.format('TXTST,' + message['data'][0])
+
+    app.start()
+    time.sleep(0.2)
+    client = socket.create_connection(('127.0.0.1', PORT))
+    client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    rfile = client.makefile('rb')
+    request = REQUEST.encode('ascii')
+
+    samples = []
+    for _ in range(count):
+        start = timer()
+        client.sendall(request)
+        rfile.readline()
+        samples.append(timer() - start)
+
+    client.close()
+    app.shutdown()
+
+    samples.sort()
+    print('sentences: {}'.format(count))
+    print('p50: {:.3f} ms'.format(percentile(samples, 50) * 1000))
+    print('p99: {:.3f} ms'.format(percentile(samples, 99) * 1000))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""
+    benchmarks.parse
+    ~~~~~~~~~~~~~~~~
+
+    Compares the sentences/sec of formatter.parse against the regex based
+    formatter.regex_parse on GGA, RMC and proprietary sentences.
+
+    Usage: python benchmarks/parse.py [count]
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from nmeaserver import formatter  # noqa: E402
+
+SENTENCES = {
+    'GGA': formatter.format('GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,'
+                            '545.4,M,46.9,M,,'),
+    'RMC': formatter.format('GPRMC,123519,A,4807.038,N,01131.000,E,022.4,'
+                            '084.4,230394,003.1,W'),
+    'proprietary': formatter.format('RBHRB,101218,161229,21.31198,N,'
+                                    '157.88972,W,AUVSI,2'),
+}
+
+
+def run(count):
+    for name, sentence in sorted(SENTENCES.items()):
+        for strict in (True, False):
+            for parse in (formatter.regex_parse, formatter.parse):
+                seconds = min(timeit.repeat(
+                    lambda: parse(sentence, strict), number=count, repeat=3))
+                print('{:<12} {:<6} {:<12} {:>12,.0f} sentences/sec'.format(
+                    name, 'strict' if strict else 'lax', parse.__name__,
+                    count / seconds))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
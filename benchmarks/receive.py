@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+    benchmarks.receive
+    ~~~~~~~~~~~~~~~~~~
+
+    Compares the sentences/sec of receiving and parsing a stream with
+    readline().strip() against framing.LineBuffer over a socket pair.
+
+    Usage: python benchmarks/receive.py [count]
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+from __future__ import print_function
+
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from nmeaserver import formatter  # noqa: E402
+from nmeaserver.framing import LineBuffer  # noqa: E402
+
+timer = getattr(time, 'perf_counter', time.time)
+
+SENTENCE = (formatter.format('GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,'
+                             '545.4,M,46.9,M,,') + '\r\n').encode('ascii')
+
+
+def send(sock, count):
+    data = SENTENCE * 1000
+    for _ in range(count // 1000):
+        sock.sendall(data)
+    sock.close()
+
+
+def readline(sock):
+    rfile = sock.makefile('rb')
+    parsed = 0
+    while True:
+        line = rfile.readline()
+        if not line:
+            return parsed
+        formatter.parse(line.strip().decode('latin-1'))
+        parsed += 1
+
+
+def line_buffer(sock):
+    lines = LineBuffer()
+    parsed = 0
+    while lines.recv_into(sock):
+        for sentence in lines.sentences():
+            formatter.parse(sentence)
+            parsed += 1
+    return parsed
+
+
+def measure(receive, count):
+    left, right = socket.socketpair()
+    sender = threading.Thread(target=send, args=(left, count))
+    start = timer()
+    sender.start()
+    parsed = receive(right)
+    seconds = timer() - start
+    sender.join()
+    right.close()
+    return parsed / seconds
+
+
+def run(count, repeat=5):
+    best = {}
+    for _ in range(repeat):
+        for receive in (readline, line_buffer):
+            best[receive] = max(best.get(receive, 0), measure(receive, count))
+    for receive in (readline, line_buffer):
+        print('{:<12} {:>12,.0f} sentences/sec'.format(
+            receive.__name__, best[receive]))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
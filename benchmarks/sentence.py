@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+    benchmarks.sentence
+    ~~~~~~~~~~~~~~~~~~~
+
+    Compares the memory per message and the sentences/sec of the dicts
+    returned by formatter.regex_parse against the lazily split
+    formatter.Sentence returned by formatter.parse, for handlers reading the
+    sentence_id only, one field or every field.
+
+    Usage: python benchmarks/sentence.py [count]
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+from __future__ import print_function
+
+import gc
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from nmeaserver import formatter  # noqa: E402
+
+SENTENCE = formatter.format('GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,'
+                            '545.4,M,46.9,M,,')
+
+ACCESSES = [
+    ('sentence_id', lambda message: message['sentence_id']),
+    ('one field', lambda message: message['data'][3]),
+    ('all fields', lambda message: message['data']),
+]
+
+
+def deep_size(message):
+    # The bytes held by a message besides the shared sentence str.
+    size = sys.getsizeof(message) + sys.getsizeof(message['sentence_id'])
+    if isinstance(message, dict):
+        size += sys.getsizeof(message['talker']) + \
+            sys.getsizeof(message['sentence_type'])
+    data = message['data'] if isinstance(message, dict) else message._data
+    if data is not None:
+        size += sys.getsizeof(data) + sum(map(sys.getsizeof, data))
+    return size
+
+
+def memory():
+    for parse in (formatter.regex_parse, formatter.parse):
+        message = parse(SENTENCE)
+        print('{:<12} {:<12} {:>6} bytes/message'.format(
+            parse.__name__, 'parsed', deep_size(message)))
+        message['data']
+        print('{:<12} {:<12} {:>6} bytes/message'.format(
+            parse.__name__, 'fields split', deep_size(message)))
+
+
+def throughput(count):
+    for name, access in ACCESSES:
+        for parse in (formatter.regex_parse, formatter.parse):
+            gc.collect()
+            seconds = min(timeit.repeat(
+                lambda: access(parse(SENTENCE)), number=count, repeat=5))
+            print('{:<12} {:<12} {:>12,.0f} sentences/sec'.format(
+                parse.__name__, name, count / seconds))
+
+
+if __name__ == '__main__':
+    memory()
+    throughput(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
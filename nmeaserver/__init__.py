@@ -1,7 +1,16 @@
+import sys
+
 from .server import NMEAServer
+from .client import NMEAClient
 from .formatter import *
+from . import decoders
+
+if sys.version_info >= (3, 7):
+    from .aioserver import AsyncNMEAServer
 
 __all__ = [
         'server',
         'formatter',
-        ]
\ No newline at end of file
+        'decoders',
+        'replay',
+        ]
@@ -0,0 +1,384 @@
+"""An asyncio backend for the NMEAServer.
+
+Every connection is served by a coroutine on a single event loop rather than
+by its own OS thread, which lets a single process hold thousands of
+connections. Requires Python 3.7+.
+"""
+
+import asyncio
+import concurrent.futures
+import inspect
+import logging
+import threading
+
+from . import formatter
+from .framing import LineBuffer
+from .server import NMEAServer, _to_str, timer
+
+logger = logging.getLogger("nmeaserver")
+
+#: The NMEAServer options of the threaded backend, with their defaults, that
+#: the asyncio backend does not support.
+UNSUPPORTED = (('workers', 0), ('flush_delay', 0), ('flush_size', 65536),
+               ('tcp_nodelay', None), ('tcp_cork', False),
+               ('max_backlog', None), ('overflow', 'block'))
+
+
+async def _resolve(result):
+    """Awaits the result of a handler if it returned an awaitable."""
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class _ThreadsafeWriter:
+    """Lets a synchronous response streamer running in a thread of its own
+    write to an asyncio StreamWriter. Writes from another thread block until
+    the transport has drained below its high-water mark, so that a slow
+    client pushes back on its streamer rather than growing the buffer, and
+    raise an IOError once the connection is closed."""
+
+    def __init__(self, loop, writer):
+        self.loop = loop
+        self.writer = writer
+        #: Serializes the drains of the connection, which some Python
+        #: versions do not allow concurrently.
+        self.lock = asyncio.Lock()
+        #: Set once the connection is closed.
+        self.closed = False
+        #: The number of bytes written, counted when handed to the loop.
+        self.bytes_sent = 0
+
+    async def send(self, data):
+        """Writes bytes on the loop and waits for the transport to drain."""
+        async with self.lock:
+            self.writer.write(data)
+            await self.writer.drain()
+
+    def write(self, data):
+        if self.closed:
+            raise IOError("Connection writer is closed")
+        if isinstance(data, str):
+            data = data.encode('latin-1')
+        self.bytes_sent += len(data)
+        if _running_loop() is self.loop:
+            # From a handler publishing on the loop, which must not block.
+            self.writer.write(data)
+            return
+        try:
+            future = asyncio.run_coroutine_threadsafe(self.send(data),
+                                                      self.loop)
+            while True:
+                try:
+                    return future.result(0.1)
+                except concurrent.futures.TimeoutError:
+                    if self.closed:
+                        future.cancel()
+                        raise IOError("Connection writer is closed")
+        except IOError:
+            raise
+        except Exception as err:
+            # Cancelled at shutdown, connection reset or loop closed.
+            raise IOError("Connection writer is closed: {}".format(err))
+
+    def flush(self):
+        pass
+
+    def backlog(self):
+        return {'pending_bytes':
+                self.writer.transport.get_write_buffer_size()}
+
+
+class AsyncNMEAServer(NMEAServer):
+    """A NMEAServer serving all of its connections from one asyncio event
+    loop. Handlers are registered exactly like with :class:`NMEAServer`
+    (:meth:`message`, :meth:`prehandler`, :meth:`posthandler`, :meth:`error`,
+    :meth:`bad_checksum`, :meth:`context_creator`, ...) and may either be
+    plain functions or ``async def`` coroutines::
+
+        app = AsyncNMEAServer(port=9000)
+
+        @app.message('RBHRB')
+        async def HRB(context, message):
+            await asyncio.sleep(0)
+            return formatter.format("$TXHRB,Success")
+
+    A response streamer defined with ``async def`` runs on the event loop and
+    receives the connection's :class:`asyncio.StreamWriter`. A plain function
+    response streamer runs on a thread of its own instead, as it may block,
+    like with :class:`NMEAServer`: its writes block while the client is slow
+    to read and raise an IOError once the connection is closed.
+
+    Handlers run on the event loop, and responses are written straight to
+    the :class:`asyncio.StreamWriter`, so the ``workers``, ``flush_delay``,
+    ``flush_size``, ``tcp_nodelay``, ``tcp_cork``, ``max_backlog`` and
+    ``overflow`` options of :class:`NMEAServer` are not supported and raise
+    a ValueError. Blocking handlers should use the loop's executor instead.
+
+    .. versionadded:: 0.2.0
+    """
+
+    #: The event loop serving the connections, once started.
+    loop = None
+
+    #: The size of the receive buffer of each connection, which bounds the
+    #: length of a sentence.
+    read_limit = 2 ** 16
+
+    def __init__(self, *args, **kwargs):
+        NMEAServer.__init__(self, *args, **kwargs)
+        unsupported = [name for name, default in UNSUPPORTED
+                       if getattr(self, name) != default]
+        if unsupported:
+            raise ValueError('AsyncNMEAServer does not support ' +
+                             ', '.join(unsupported))
+        self._server = None
+        self._started = threading.Event()
+
+    async def dispatch_async(self, raw_message, connection_context):
+        """Coroutine counterpart of :meth:`dispatch` that awaits any handler
+        returning an awaitable. May be extended, do not override."""
+
+        if self._rejected(raw_message, connection_context):
+            return None
+        metrics = self.metrics
+        if metrics is not None:
+            stamps = [timer()]
+        if self.message_pre_handler is not None:
+            raw_message = await _resolve(self.message_pre_handler(
+                connection_context, _to_str(raw_message)))
+        if metrics is not None:
+            stamps.append(timer())
+
+        sentence_id = None
+        try:
+            if not len(raw_message):
+                raise EOFError("Empty message received. Ending comm")
+
+            message = formatter.parse(raw_message)
+            sentence_id = message['sentence_id']
+            if metrics is not None:
+                stamps.append(timer())
+            handler, unknown = self.router.resolve(sentence_id)
+            response = None
+            if handler is not None:
+                response = await _resolve(handler(connection_context, message))
+            if metrics is not None:
+                stamps.append(timer())
+
+            if self.message_post_handler is not None:
+                await _resolve(self.message_post_handler(
+                    connection_context, message, response))
+            if not response.endswith("\n"):
+                response = response + "\n"
+            if metrics is not None:
+                stamps.append(timer())
+                metrics.dispatched(sentence_id, stamps, unknown)
+            return response
+        except ValueError:
+            if metrics is not None:
+                if sentence_id is None:
+                    metrics.count('bad_checksum')
+                else:
+                    metrics.count('errors', sentence_id)
+            if self.bad_checksum_message_handler is not None:
+                return await _resolve(self.bad_checksum_message_handler(
+                    connection_context, _to_str(raw_message)))
+        except EOFError:
+            raise
+        except BaseException as err:
+            if metrics is not None:
+                metrics.count('errors', sentence_id)
+            logger.error("Detected exception: {}".format(str(err)))
+            if self.error_handler is not None:
+                await _resolve(self.error_handler(connection_context, err))
+        return None
+
+    def dispatch_from_thread(self, raw_message, connection_context):
+        """Dispatch a message received by another thread on the event loop,
+        blocking until it is handled."""
+
+        return asyncio.run_coroutine_threadsafe(
+            self.dispatch_async(raw_message, connection_context),
+            self.loop).result()
+
+    def default_context(self, writer):
+        """Creates a default connection context dictionary"""
+
+        peername = writer.get_extra_info('peername')
+        default_context = {}
+        default_context['client_address'] = peername[0]
+        default_context['connection'] = "{}:{}".format(*peername[:2])
+        return default_context
+
+    async def handle(self, reader, writer):
+        """Serves one connection, passing each line to :meth:`dispatch_async`
+        in order."""
+
+        context = self.default_context(writer)
+        address = context['connection']
+        if self.max_connections is not None and \
+                len(self.connections) >= self.max_connections:
+            self.rejected_connections += 1
+            logger.warning("Refused connection from {}, {} connections "
+                           "already".format(context['client_address'],
+                                            self.max_connections))
+            writer.close()
+            return
+        # Registered before the first await, which holds the connection's
+        # place against max_connections.
+        connection = _ThreadsafeWriter(self.loop, writer)
+        self._add_connection(address, connection)
+        streamer = None
+        lines = LineBuffer(self.read_limit)
+        metrics = self.metrics
+        admission = None
+        if self.rate_limits is not None:
+            admission = self.rate_limits.connection()
+        try:
+            if self.connection_context_creator is not None:
+                context = await _resolve(
+                    self.connection_context_creator(context))
+            if self.response_streamer is not None:
+                context['stream'] = True
+                if asyncio.iscoroutinefunction(self.response_streamer):
+                    streamer = self.loop.create_task(
+                        self.response_streamer(context, writer))
+                else:
+                    streamer = threading.Thread(
+                        target=self.stream, args=(context, connection),
+                        name="stream-" + str(context['client_address']))
+                    streamer.daemon = True
+                    streamer.start()
+
+            while not self.shutdown_flag:
+                timeout = None if admission is None else admission.delay()
+                if timeout is None:
+                    data = await reader.read(self.read_limit)
+                else:
+                    try:
+                        data = await asyncio.wait_for(
+                            reader.read(self.read_limit), timeout)
+                    except asyncio.TimeoutError:
+                        data = None
+                if data is None:
+                    received = admission.ready()
+                elif data:
+                    if metrics is not None:
+                        metrics.received(address, len(data))
+                    received = lines.feed(data)
+                    if self.conflation is not None:
+                        received = self.conflation.conflate(received)
+                    if admission is not None:
+                        received = admission.offer(
+                            self._accepted(received, context))
+                else:
+                    received = lines.flush()
+                    if admission is not None:
+                        received = admission.offer(
+                            self._accepted(received, context))
+                    received.append(b'')
+                for sentence in received:
+                    if self.debug:
+                        logger.debug("< " + _to_str(sentence))
+                    response = await self.dispatch_async(sentence, context)
+
+                    if response is not None:
+                        if self.debug:
+                            logger.debug("> " + response)
+                        data = response.encode('latin-1')
+                        connection.bytes_sent += len(data)
+                        await connection.send(data)
+                if admission is not None:
+                    admission.check()
+        except BaseException:
+            logger.warning("Connection closing")
+        finally:
+            self._remove_connection(address)
+            if admission is not None:
+                admission.close()
+            if metrics is not None:
+                metrics.closed(address)
+            context['stream'] = False
+            connection.closed = True
+            if isinstance(streamer, asyncio.Task):
+                streamer.cancel()
+            writer.close()
+
+    def stream(self, context, connection):
+        """Runs a plain function response_streamer on its own thread until it
+        returns or the connection is closed."""
+
+        try:
+            self.response_streamer(context, connection)
+        except IOError:
+            if not connection.closed:
+                raise
+            logger.debug("Stopped streaming, connection closed")
+
+    async def serve(self):
+        """Starts listening on the event loop this coroutine runs on and
+        returns the underlying :class:`asyncio.AbstractServer`."""
+
+        self.loop = asyncio.get_event_loop()
+        options = {'reuse_port': True} if self.reuse_port else {}
+        self._server = await asyncio.start_server(
+            self.handle, self.host or None, self.port,
+            limit=self.read_limit, reuse_address=True, **options)
+        logger.info('Server Address: {}:{}'.format(
+            str(self.host or "localhost"), str(self.port)))
+        return self._server
+
+    def _start_server(self):
+        self._started.clear()
+        self._start_error = None
+        self.server_thread = threading.Thread(
+            name='nmea', target=self._run_loop)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        self._started.wait()
+        if self._start_error is not None:
+            self.server_thread.join()
+            raise self._start_error
+
+    def _run_loop(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self.serve())
+        except BaseException as err:
+            self._start_error = err
+            loop.close()
+            return
+        finally:
+            self._started.set()
+        loop.run_forever()
+        loop.run_until_complete(self._close())
+        loop.close()
+
+    async def _close(self):
+        self._server.close()
+        tasks = [t for t in asyncio.all_tasks()
+                 if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._server.wait_closed()
+
+    @property
+    def server_address(self):
+        """The (host, port) actually bound, useful when started on port 0."""
+        if self.process_group is not None:
+            return self.process_group.server_address
+        return self._server.sockets[0].getsockname()[:2]
+
+    def _shutdown_server(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.server_thread.join()
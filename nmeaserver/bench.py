@@ -0,0 +1,415 @@
+"""Benchmark suite and load generator for the formatter and the NMEAServer.
+
+Run from the command line::
+
+    python -m nmeaserver.bench micro
+    python -m nmeaserver.bench load --connections 50 --rate 20000
+    python -m nmeaserver.bench state --threads 500
+    python -m nmeaserver.bench all --json results.json
+
+``micro`` times :func:`formatter.calc_checksum`, :func:`formatter.format`
+and :func:`formatter.parse` on short and long sentences. ``load`` starts a
+NMEAServer on the loopback interface and has N connections send it
+sentences at a target total rate, measuring the round-trip time of each.
+Both report CPU time and RSS. ``state`` has hundreds of threads read the
+shared :class:`state.StateStore` while others update it, against a dict
+behind a lock. ``--json`` writes every result as JSON to diff between
+releases.
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import json
+import logging
+import os
+import platform
+import socket
+import sys
+import threading
+import time
+import timeit
+
+from . import formatter
+from .state import StateStore
+
+timer = getattr(time, 'perf_counter', time.time)
+
+SENTENCES = {
+    'short': formatter.format('RBHRB,Test'),
+    'long': formatter.format('GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,'
+                             '545.4,M,46.9,M,,'),
+}
+
+#: The sentence sent by the load generator, answered by the server.
+REQUEST_ID = 'RXBEN'
+
+
+def percentile(samples, fraction):
+    """Returns the fraction percentile of a sorted list of samples."""
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def resources():
+    """Returns the CPU seconds used by this process so far and its resident
+    set size in bytes, None where unavailable."""
+    times = os.times()
+    rss = None
+    try:
+        with open('/proc/self/statm') as statm:
+            rss = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, AttributeError):
+        try:
+            import resource
+            # Peak rather than current, in KiB on Linux and bytes on macOS.
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if sys.platform != 'darwin':
+                rss *= 1024
+        except ImportError:
+            pass
+    return times[0] + times[1], rss
+
+
+def micro(count=100000, repeat=3):
+    """Times the formatter functions, returning the operations/sec and
+    nanoseconds/operation of each, by name."""
+    results = {}
+    for size, sentence in sorted(SENTENCES.items()):
+        body = sentence[1:sentence.index('*')]
+        cases = [
+            ('calc_checksum', lambda: formatter.calc_checksum(sentence)),
+            ('format', lambda: formatter.format(body)),
+            ('parse strict', lambda: formatter.parse(sentence, True)),
+            ('parse lax', lambda: formatter.parse(sentence, False)),
+        ]
+        for name, function in cases:
+            seconds = min(timeit.repeat(function, number=count,
+                                        repeat=repeat))
+            results['{} {}'.format(name, size)] = {
+                'ops_per_sec': count / seconds,
+                'ns_per_op': seconds / count * 1e9,
+            }
+    return results
+
+
+class _Client(object):
+    # A loopback connection sending requests at a rate and timing the
+    # response to each.
+
+    def __init__(self, address, rate, duration, window):
+        self.sock = socket.create_connection(address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rate = rate
+        self.duration = duration
+        self.window = threading.Semaphore(window)
+        self.sent = collections.deque()
+        self.latencies = []
+        self.count = 0
+        self.request = (formatter.format(REQUEST_ID + ',1') + '\r\n') \
+            .encode('ascii')
+
+    def send(self):
+        start = timer()
+        end = start + self.duration
+        while True:
+            now = timer()
+            if now >= end:
+                break
+            if self.rate:
+                due = int((now - start) * self.rate) + 1 - self.count
+                if due <= 0:
+                    time.sleep(min(0.001, (self.count - (now - start) *
+                                           self.rate) / self.rate))
+                    continue
+            else:
+                due = 1
+            for _ in range(due):
+                self.window.acquire()
+            self.sent.extend([now] * due)
+            self.sock.sendall(self.request * due)
+            self.count += due
+        self.sock.shutdown(socket.SHUT_WR)
+
+    def receive(self):
+        rfile = self.sock.makefile('rb')
+        try:
+            for _ in rfile:
+                self.latencies.append(timer() - self.sent.popleft())
+                self.window.release()
+        finally:
+            rfile.close()
+            self.sock.close()
+
+
+def load(connections=10, rate=None, duration=5.0, window=64,
+         nmeaserver=None):
+    """Has connections send sentences to a NMEAServer on the loopback
+    interface for duration seconds and times the response to each.
+
+    :param connections: the number of connections
+    :param rate: the target total sentences/sec, None for as fast as the
+                 server answers
+    :param duration: how long to send for, in seconds
+    :param window: the most requests a connection has waiting for their
+                   response
+    :param nmeaserver: the stopped NMEAServer to start and load, with a
+                       handler answering 'RXBEN' sentences. By default one
+                       is created with an echo handler.
+    :returns: a dict of the sentences answered, sentences/sec, p50, p99 and
+              p999 latency in seconds, and the CPU seconds and RSS in bytes
+              of this process, which also runs the clients
+    """
+    from .server import NMEAServer
+
+    if nmeaserver is None:
+        nmeaserver = NMEAServer('127.0.0.1', 0)
+        nmeaserver.message_handlers = {
+            REQUEST_ID: lambda context, message: formatter.format(
+                'TXBEN,' + message['data'][0])}
+    nmeaserver.start()
+    try:
+        address = nmeaserver.nmeaserver.server_address
+        clients = [_Client(address, float(rate) / connections
+                           if rate else None, duration, window)
+                   for _ in range(connections)]
+        cpu, _ = resources()
+        start = timer()
+        threads = []
+        for client in clients:
+            for target in (client.send, client.receive):
+                threads.append(threading.Thread(target=target))
+                threads[-1].daemon = True
+                threads[-1].start()
+        for thread in threads:
+            thread.join()
+        seconds = timer() - start
+        cpu_end, rss = resources()
+    finally:
+        nmeaserver.shutdown()
+
+    latencies = sorted(latency for client in clients
+                       for latency in client.latencies)
+    return {
+        'connections': connections,
+        'target_rate': rate,
+        'sentences': len(latencies),
+        'seconds': seconds,
+        'sentences_per_sec': len(latencies) / seconds,
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+        'p999': percentile(latencies, 0.999),
+        'cpu_seconds': cpu_end - cpu,
+        'rss': rss,
+    }
+
+
+def _answer(values, keys):
+    # What a handler of the state benchmark answers from the state.
+    return formatter.format('TXSTA,' + ','.join(
+        '{:.1f}'.format(values.get(key)) for key in keys))
+
+
+class _LockedDict(object):
+    # The baseline of the state benchmark, a dict behind a lock.
+
+    def __init__(self, values):
+        self.values = dict(values)
+        self.lock = threading.Lock()
+
+    def read(self, keys):
+        # Held while answering, to answer with values of the same write.
+        with self.lock:
+            return _answer(self.values, keys)
+
+    def write(self, key, value):
+        with self.lock:
+            self.values[key] = value
+
+
+class _Store(object):
+    # The state benchmark's adapter of a StateStore.
+
+    def __init__(self, values):
+        self.store = StateStore(values)
+
+    def read(self, keys):
+        return _answer(self.store.snapshot(), keys)
+
+    def write(self, key, value):
+        self.store.set(key, value)
+
+
+def state(threads=200, writers=2, duration=2.0, keys=32):
+    """Has threads answer sentences with 4 values of a shared state,
+    yielding between answers like handlers between sentences, while writers
+    update them, first with a :class:`state.StateStore` then with a dict
+    locked while answering.
+
+    :param threads: the number of reading threads
+    :param writers: the number of writing threads
+    :param duration: how long each variant runs, in seconds
+    :param keys: the number of keys of the state
+    :returns: a dict of the reads/sec, writes/sec and the p50, p99 and max
+              seconds a write took, for 'store' and 'locked_dict'
+    """
+
+    names = ['key{}'.format(index) for index in range(keys)]
+    results = {'threads': threads, 'writers': writers}
+    for name, kind in (('store', _Store), ('locked_dict', _LockedDict)):
+        shared = kind(dict((key, 0.0) for key in names))
+        start = threading.Event()
+        stop = threading.Event()
+        reads = []
+        latencies = []
+
+        def read(offset):
+            wanted = [names[(offset + step) % keys] for step in range(4)]
+            count = 0
+            start.wait()
+            while not stop.is_set():
+                shared.read(wanted)
+                count += 1
+                # Like a handler waiting for the next sentence.
+                time.sleep(0)
+            reads.append(count)
+
+        def write(offset):
+            taken = []
+            count = 0
+            start.wait()
+            while not stop.is_set():
+                key = names[(offset + count) % keys]
+                began = timer()
+                shared.write(key, float(count))
+                taken.append(timer() - began)
+                count += 1
+                time.sleep(0)
+            latencies.extend(taken)
+
+        workers = [threading.Thread(target=read, args=(index,))
+                   for index in range(threads)]
+        workers += [threading.Thread(target=write, args=(index,))
+                    for index in range(writers)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        began = timer()
+        start.set()
+        time.sleep(duration)
+        stop.set()
+        for worker in workers:
+            worker.join()
+        seconds = timer() - began
+        latencies.sort()
+        results[name] = {
+            'reads_per_sec': sum(reads) / seconds,
+            'writes_per_sec': len(latencies) / seconds,
+            'write_p50': percentile(latencies, 0.5),
+            'write_p99': percentile(latencies, 0.99),
+            'write_max': latencies[-1] if latencies else None,
+        }
+    return results
+
+
+def environment():
+    """Returns a dict describing the interpreter and machine benchmarked."""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpus': _cpu_count(),
+    }
+
+
+def _cpu_count():
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def _print_micro(results):
+    for name, result in sorted(results.items()):
+        print('{:<22} {:>14,.0f} ops/sec {:>10,.0f} ns/op'.format(
+            name, result['ops_per_sec'], result['ns_per_op']))
+
+
+def _print_load(result):
+    def ms(value):
+        return 'n/a' if value is None else '{:.3f} ms'.format(value * 1000)
+    print('{} connections, {:,} sentences in {:.2f} s: {:,.0f} sentences/sec'
+          .format(result['connections'], result['sentences'],
+                  result['seconds'], result['sentences_per_sec']))
+    print('p50 {}  p99 {}  p999 {}'.format(
+        ms(result['p50']), ms(result['p99']), ms(result['p999'])))
+    print('cpu {:.2f} s  rss {}'.format(
+        result['cpu_seconds'], 'n/a' if result['rss'] is None else
+        '{:.1f} MiB'.format(result['rss'] / 1048576.0)))
+
+
+def _print_state(results):
+    def us(value):
+        return 'n/a' if value is None else '{:.1f} us'.format(value * 1e6)
+    print('{} readers, {} writers'.format(results['threads'],
+                                          results['writers']))
+    for name in ('store', 'locked_dict'):
+        result = results[name]
+        print('{:<12} {:>14,.0f} reads/sec {:>10,.0f} writes/sec  write p50 '
+              '{}  p99 {}  max {}'.format(
+                  name, result['reads_per_sec'], result['writes_per_sec'],
+                  us(result['write_p50']), us(result['write_p99']),
+                  us(result['write_max'])))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m nmeaserver.bench',
+        description='Benchmarks the nmeaserver formatter, server and '
+                    'state store.')
+    parser.add_argument('suite', nargs='?', default='all',
+                        choices=['micro', 'load', 'state', 'all'])
+    parser.add_argument('--count', type=int, default=100000,
+                        help='calls per micro-benchmark')
+    parser.add_argument('--connections', type=int, default=10)
+    parser.add_argument('--threads', type=int, default=200,
+                        help='threads reading the state')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='total sentences/sec, as fast as possible if '
+                             'omitted')
+    parser.add_argument('--duration', type=float, default=5.0,
+                        help='seconds of load')
+    parser.add_argument('--json', metavar='PATH',
+                        help="write the results as JSON, '-' for stdout")
+    args = parser.parse_args(argv)
+    # Clients closing their connections is expected here.
+    logging.getLogger("nmeaserver").setLevel(logging.ERROR)
+
+    results = {'environment': environment()}
+    quiet = args.json == '-'
+    if args.suite in ('micro', 'all'):
+        results['micro'] = micro(args.count)
+        if not quiet:
+            _print_micro(results['micro'])
+    if args.suite in ('load', 'all'):
+        results['load'] = load(args.connections, args.rate, args.duration)
+        if not quiet:
+            _print_load(results['load'])
+    if args.suite in ('state', 'all'):
+        results['state'] = state(args.threads, duration=args.duration)
+        if not quiet:
+            _print_state(results['state'])
+    if args.json == '-':
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+    elif args.json:
+        with open(args.json, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,420 @@
+"""Persistent connections to upstream NMEA servers, such as AIS feeds.
+
+An :class:`NMEAClient` keeps connections to any number of endpoints open
+from a single thread multiplexing them with a selector, reconnects them with
+an exponential backoff, and dispatches the sentences they send through the
+handlers of a NMEAServer, exactly like those received on its own
+connections::
+
+    app = NMEAServer(port=9000)
+    client = NMEAClient(app)
+    client.add('ais.example.com', 5631)
+    client.add('10.0.0.7', 9000, respond=True)
+    app.start()
+    client.start()
+
+Requires the selectors module of Python 3.
+"""
+
+import collections
+import errno
+import heapq
+import itertools
+import logging
+import random
+import socket
+import threading
+import time
+
+try:
+    import selectors
+except ImportError:  # Python 2
+    selectors = None
+
+from .framing import LineBuffer
+from .pool import OrderedResponses
+
+logger = logging.getLogger("nmeaserver")
+timer = getattr(time, 'monotonic', time.time)
+
+_IN_PROGRESS = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN,
+                errno.EALREADY)
+_WOULD_BLOCK = (errno.EAGAIN, errno.EWOULDBLOCK)
+
+
+class Upstream(object):
+    """An endpoint kept connected by an :class:`NMEAClient`, with its
+    connection context and counters.
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, host, port, name, respond, context):
+        self.host = host
+        self.port = port
+        self.name = name
+        self.respond = respond
+        self.context = context
+        #: 'idle', 'connecting', 'connected', 'waiting' to reconnect or
+        #: 'removed'.
+        self.state = 'idle'
+        self.sock = None
+        self.lines = None
+        self.responses = None
+        self.outgoing = bytearray()
+        self.writing = False
+        self.attempts = 0
+        self.generation = 0
+        self.connects = 0
+        self.failures = 0
+        self.sentences = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.dropped = 0
+        self.last_error = None
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'connects': self.connects,
+            'failures': self.failures,
+            'sentences': self.sentences,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'pending_bytes': len(self.outgoing),
+            'dropped': self.dropped,
+            'last_error': self.last_error,
+        }
+
+
+class NMEAClient(object):
+    """Connects to upstream endpoints and dispatches their sentences through
+    a NMEAServer from one thread, named 'upstream'.
+
+    A connection that fails or closes is retried after ``backoff`` seconds,
+    doubled on every consecutive failure up to ``max_backoff`` and jittered
+    so that endpoints lost together are not all retried at once.
+
+    Handlers run on the client's thread, or on the handler pool of the
+    NMEAServer once started with ``workers``, in which case the responses of
+    each upstream are still relayed in order. Responses are only relayed to
+    the upstreams added with ``respond=True``, as feeds seldom expect any.
+
+    Host names are resolved on the client's thread, which blocks every
+    connection meanwhile: give the addresses of many endpoints.
+
+    :param nmeaserver: the NMEAServer whose handlers dispatch the sentences
+    :param backoff: the seconds before the first reconnection attempt
+    :param max_backoff: the most seconds between reconnection attempts
+    :param connect_timeout: the seconds a connection may take to establish
+    :param read_size: the size of the receive buffer of each connection
+    :param max_backlog: the most bytes waiting to be sent to an upstream,
+                        sentences beyond are dropped
+    :param respond: whether to relay responses by default
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, nmeaserver, backoff=0.5, max_backoff=30.0,
+                 connect_timeout=5.0, read_size=65536, max_backlog=1 << 20,
+                 respond=False):
+        if selectors is None:
+            raise ValueError('NMEAClient requires the selectors module')
+        self.nmeaserver = nmeaserver
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.connect_timeout = connect_timeout
+        self.read_size = read_size
+        self.max_backlog = max_backlog
+        self.respond = respond
+        #: The :class:`Upstream` endpoints by name.
+        self.upstreams = {}
+        self.thread = None
+        self._commands = collections.deque()
+        self._timers = []
+        self._sequence = itertools.count()
+        self._stopping = False
+        self._wakeup = None
+
+    def add(self, host, port, name=None, respond=None):
+        """Adds an endpoint to keep connected to, named 'host:port' by
+        default. May be called before or after :meth:`start`.
+
+        :returns: the :class:`Upstream`"""
+
+        name = name or '{}:{}'.format(host, port)
+        if name in self.upstreams:
+            raise ValueError('Upstream {} already added'.format(name))
+        context = {
+            'client_address': host,
+            'connection': name,
+            'transport': 'upstream',
+        }
+        if self.nmeaserver.connection_context_creator is not None:
+            context = self.nmeaserver.connection_context_creator(context)
+        upstream = Upstream(host, port, name,
+                            self.respond if respond is None else respond,
+                            context)
+        self.upstreams[name] = upstream
+        self._command(self._connect, upstream)
+        return upstream
+
+    def remove(self, upstream):
+        """Disconnects from an endpoint, given as an :class:`Upstream` or by
+        name, and forgets it."""
+
+        if not isinstance(upstream, Upstream):
+            upstream = self.upstreams[upstream]
+        self.upstreams.pop(upstream.name, None)
+        self._command(self._remove, upstream)
+
+    def send(self, upstream, sentence):
+        """Queues a sentence, as str or bytes, to be sent to an endpoint
+        given as an :class:`Upstream` or by name. Dropped unless connected.
+        May be called from any thread."""
+
+        if not isinstance(upstream, Upstream):
+            upstream = self.upstreams[upstream]
+        if not isinstance(sentence, bytes):
+            sentence = sentence.encode('latin-1')
+        if not sentence.endswith(b"\n"):
+            sentence = sentence + b"\n"
+        if threading.current_thread() is self.thread:
+            self._queue(upstream, sentence)
+        else:
+            self._command(self._queue, upstream, sentence)
+
+    def stats(self):
+        """Returns the stats of each :class:`Upstream`, by name."""
+        return dict((name, upstream.stats())
+                    for name, upstream in list(self.upstreams.items()))
+
+    def start(self):
+        self._stopping = False
+        self.selector = selectors.DefaultSelector()
+        self._wakeup = socket.socketpair()
+        for sock in self._wakeup:
+            sock.setblocking(False)
+        self.selector.register(self._wakeup[1], selectors.EVENT_READ, None)
+        self._timers = []
+        for upstream in list(self.upstreams.values()):
+            self._commands.append((self._connect, (upstream,)))
+        self.thread = threading.Thread(target=self._run, name='upstream')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def shutdown(self):
+        if self.thread is None:
+            return
+        self._stopping = True
+        self._wake()
+        self.thread.join()
+        self.thread = None
+        self.selector.close()
+        for sock in self._wakeup:
+            sock.close()
+        self._wakeup = None
+
+    def _command(self, function, *args):
+        # Runs function(*args) on the client's thread.
+        self._commands.append((function, args))
+        self._wake()
+
+    def _wake(self):
+        if self._wakeup is not None:
+            try:
+                self._wakeup[0].send(b'x')
+            except (IOError, OSError):
+                pass  # Full, it is awake already.
+
+    def _schedule(self, delay, function, *args):
+        heapq.heappush(self._timers, (timer() + delay, next(self._sequence),
+                                      function, args))
+
+    def _run(self):
+        selector = self.selector
+        try:
+            while not self._stopping:
+                while self._commands:
+                    function, args = self._commands.popleft()
+                    function(*args)
+                timeout = None
+                if self._timers:
+                    timeout = max(0, self._timers[0][0] - timer())
+                for key, events in selector.select(timeout):
+                    upstream = key.data
+                    if upstream is None:
+                        try:
+                            while key.fileobj.recv(4096):
+                                pass
+                        except (IOError, OSError):
+                            pass
+                    elif upstream.sock is not key.fileobj:
+                        continue  # Closed by an earlier event.
+                    elif upstream.state == 'connecting':
+                        self._connected(upstream)
+                    else:
+                        if events & selectors.EVENT_READ:
+                            self._read(upstream)
+                        if events & selectors.EVENT_WRITE and \
+                                upstream.state == 'connected':
+                            self._write(upstream)
+                now = timer()
+                while self._timers and self._timers[0][0] <= now:
+                    _, _, function, args = heapq.heappop(self._timers)
+                    function(*args)
+        except BaseException as err:
+            logger.error("Upstream client failed: {}".format(err))
+            raise
+        finally:
+            for upstream in list(self.upstreams.values()):
+                self._close(upstream)
+                upstream.state = 'idle'
+
+    def _connect(self, upstream):
+        if upstream.state in ('removed', 'connecting', 'connected'):
+            return
+        upstream.generation += 1
+        try:
+            family, kind, proto, _, address = socket.getaddrinfo(
+                upstream.host, upstream.port, 0, socket.SOCK_STREAM)[0]
+            sock = socket.socket(family, kind, proto)
+        except (IOError, OSError) as err:
+            self._failed(upstream, err)
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        code = sock.connect_ex(address)
+        upstream.sock = sock
+        if code and code not in _IN_PROGRESS:
+            self._failed(upstream, socket.error(code, errno.errorcode.get(
+                code, str(code))))
+            return
+        upstream.state = 'connecting'
+        self.selector.register(sock, selectors.EVENT_WRITE, upstream)
+        self._schedule(self.connect_timeout, self._connect_timeout,
+                       upstream, upstream.generation)
+
+    def _connect_timeout(self, upstream, generation):
+        if upstream.state == 'connecting' and \
+                upstream.generation == generation:
+            self._failed(upstream, socket.timeout('connect timed out'))
+
+    def _connected(self, upstream):
+        code = upstream.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if code:
+            self._failed(upstream, socket.error(code, errno.errorcode.get(
+                code, str(code))))
+            return
+        logger.info("Connected to upstream " + upstream.name)
+        upstream.state = 'connected'
+        upstream.attempts = 0
+        upstream.connects += 1
+        upstream.lines = LineBuffer(self.read_size)
+        upstream.responses = OrderedResponses(
+            lambda response: self.send(upstream, response))
+        self.selector.modify(upstream.sock, selectors.EVENT_READ, upstream)
+
+    def _read(self, upstream):
+        try:
+            received = upstream.lines.recv_into(upstream.sock)
+        except (IOError, OSError) as err:
+            if err.errno not in _WOULD_BLOCK:
+                self._failed(upstream, err)
+            return
+        if not received:
+            self._dispatch(upstream, upstream.lines.flush())
+            self._failed(upstream, EOFError('closed by the upstream'))
+            return
+        upstream.bytes_in += received
+        metrics = self.nmeaserver.metrics
+        if metrics is not None:
+            metrics.received(upstream.name, received)
+        self._dispatch(upstream, upstream.lines.sentences())
+
+    def _dispatch(self, upstream, sentences):
+        nmeaserver = self.nmeaserver
+        context = upstream.context
+        if nmeaserver.conflation is not None:
+            sentences = nmeaserver.conflation.conflate(sentences)
+        for sentence in sentences:
+            upstream.sentences += 1
+            if nmeaserver.handler_pool is not None:
+                responses = upstream.responses
+                seq = responses.reserve()
+                try:
+                    nmeaserver.dispatch_to_pool(
+                        sentence, context,
+                        lambda response, seq=seq: responses.complete(
+                            seq, response if upstream.respond else None))
+                except BaseException as err:
+                    responses.complete(seq, None)
+                    logger.error("Detected exception: {}".format(err))
+                continue
+            try:
+                response = nmeaserver.dispatch_from_thread(sentence, context)
+            except BaseException as err:
+                logger.error("Detected exception: {}".format(err))
+                continue
+            if upstream.respond and response is not None:
+                self._queue(upstream, response.encode('latin-1'))
+
+    def _queue(self, upstream, data):
+        if upstream.state != 'connected' or \
+                len(upstream.outgoing) + len(data) > self.max_backlog:
+            upstream.dropped += 1
+            return
+        idle = not upstream.outgoing
+        upstream.outgoing += data
+        if idle:
+            self._write(upstream)
+            if upstream.outgoing and upstream.state == 'connected':
+                # Sent once writable again.
+                upstream.writing = True
+                self.selector.modify(
+                    upstream.sock,
+                    selectors.EVENT_READ | selectors.EVENT_WRITE, upstream)
+
+    def _write(self, upstream):
+        try:
+            sent = upstream.sock.send(upstream.outgoing)
+        except (IOError, OSError) as err:
+            if err.errno not in _WOULD_BLOCK:
+                self._failed(upstream, err)
+            return
+        upstream.bytes_out += sent
+        del upstream.outgoing[:sent]
+        if not upstream.outgoing and upstream.writing:
+            upstream.writing = False
+            self.selector.modify(upstream.sock, selectors.EVENT_READ,
+                                 upstream)
+
+    def _close(self, upstream):
+        if upstream.sock is not None:
+            try:
+                self.selector.unregister(upstream.sock)
+            except (KeyError, ValueError):
+                pass
+            upstream.sock.close()
+            upstream.sock = None
+        upstream.outgoing = bytearray()
+        upstream.writing = False
+
+    def _failed(self, upstream, err):
+        # Closes the connection and retries it after the backoff.
+        self._close(upstream)
+        upstream.last_error = str(err)
+        if upstream.state == 'removed':
+            return
+        upstream.failures += 1
+        delay = min(self.max_backoff, self.backoff * 2 ** upstream.attempts)
+        delay *= random.uniform(0.5, 1.0)
+        upstream.attempts += 1
+        upstream.state = 'waiting'
+        logger.warning("Upstream {} lost ({}), reconnecting in {:.2f}s"
+                       .format(upstream.name, err, delay))
+        self._schedule(delay, self._connect, upstream)
+
+    def _remove(self, upstream):
+        upstream.state = 'removed'
+        self._close(upstream)
@@ -0,0 +1,80 @@
+"""Conflation of the sentences of which only the latest value matters.
+
+For telemetry such as positions and headings, a sentence is made stale by
+the next one of the same sentence ID. With ``conflate`` a NMEAServer keeps a
+single slot per connection and sentence ID for those, in both directions::
+
+    app = NMEAServer(port=9000, conflate=['*GGA', '*HDT', '*VTG'])
+
+* Of the sentences received at once on a connection, because its handlers
+  fell behind, only the latest of each such sentence ID is dispatched.
+* With a handler pool, a sentence waiting for a worker behind one of the
+  same sentence ID and connection is replaced by a newer one, so that at
+  most one of each is queued or running and one waiting, whatever the
+  depth of the pool's backlog.
+* Of the sentences waiting to be sent to a slow client, such as those
+  published to its subscriptions or written by the response_streamer, a
+  newer one of the same sentence ID replaces the one waiting, in place.
+"""
+
+import threading
+
+from .router import SentenceFilter, address
+
+
+class Conflator(object):
+    """Tells the sentences to conflate from their sentence ID, and
+    conflates batches of received sentences.
+
+    :param message_ids: the IDs or patterns, such as '*GGA', of the
+                        sentences to conflate
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, message_ids):
+        self.message_ids = tuple(message_ids)
+        self._filter = SentenceFilter(allow=self.message_ids)
+        self._lock = threading.Lock()
+        #: The received sentences coalesced away.
+        self.conflated = 0
+
+    def key(self, sentence):
+        """Returns the address field of a raw sentence to conflate, as
+        returned by :func:`router.address`, or None for the others."""
+        field = address(sentence)
+        if field is not None and self._filter.matches(field):
+            return field
+        return None
+
+    def conflate(self, sentences):
+        """Returns the list of sentences keeping, of those to conflate, only
+        the latest of each sentence ID, where it was received."""
+
+        if len(sentences) < 2:
+            return sentences
+        seen = set()
+        kept = []
+        for sentence in reversed(sentences):
+            key = self.key(sentence)
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(sentence)
+        if len(kept) < len(sentences):
+            self.count(len(sentences) - len(kept))
+        kept.reverse()
+        return kept
+
+    def count(self, value=1):
+        """Counts sentences coalesced away elsewhere, such as while waiting
+        for a worker of the handler pool."""
+        with self._lock:
+            self.conflated += value
+
+    def stats(self):
+        return {
+            'message_ids': self.message_ids,
+            'conflated': self.conflated,
+        }
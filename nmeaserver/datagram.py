@@ -0,0 +1,162 @@
+"""Reception of NMEA sentences over UDP, unicast or multicast.
+
+Much equipment broadcasts its sentences in UDP datagrams rather than over a
+TCP connection. A :class:`DatagramServer` receives them and dispatches each
+sentence through the handlers of a NMEAServer, like those received on its
+connections::
+
+    app = NMEAServer(port=9000)
+    app.listen_udp(10110)
+    app.listen_udp(10111, group='239.192.0.1')
+    app.start()
+"""
+
+import errno
+import logging
+import socket
+import struct
+
+from .framing import split_sentences
+from .sources import InputSource
+
+logger = logging.getLogger("nmeaserver")
+
+_MSG_DONTWAIT = getattr(socket, 'MSG_DONTWAIT', None)
+_WOULD_BLOCK = (errno.EAGAIN, errno.EWOULDBLOCK)
+
+
+class DatagramServer(InputSource):
+    """Receives datagrams on a UDP port from a thread and dispatches every
+    sentence they hold through a NMEAServer.
+
+    Datagrams are received into a preallocated buffer, and up to ``batch`` of
+    them are drained at once without blocking before waiting again, which
+    keeps the cost per datagram low at high packet rates.
+
+    Each sender gets its own connection context, created like those of TCP
+    connections with 'client_address', 'connection' (``udp:host:port``) and
+    'transport' set to 'udp'. Responses are only sent back to the sender with
+    ``respond=True``, as most senders do not expect any.
+
+    :param nmeaserver: the NMEAServer whose handlers dispatch the sentences
+    :param port: the UDP port, 0 for any
+    :param host: the address to bind to, all interfaces by default
+    :param group: a multicast group to join, such as '239.192.0.1'
+    :param interface: the address of the interface to join the group on
+    :param respond: whether to send responses back to the sender
+    :param read_size: the size of the receive buffer, the longest datagram
+    :param batch: the most datagrams received per wakeup
+    :param max_senders: the most connection contexts kept, the oldest
+                        senders' are forgotten beyond
+
+    .. versionadded:: 0.2.0
+    """
+
+    transport = 'udp'
+
+    def __init__(self, nmeaserver, port, host='', group=None,
+                 interface='0.0.0.0', respond=False, read_size=65536,
+                 batch=64, max_senders=1024):
+        InputSource.__init__(self, nmeaserver, 'udp:{}'.format(port),
+                             respond)
+        self.port = port
+        self.host = host
+        self.group = group
+        self.interface = interface
+        self.read_size = read_size
+        self.batch = batch
+        self.max_senders = max_senders
+        self.contexts = {}
+        self.sock = None
+        #: The datagrams received.
+        self.datagrams = 0
+
+    def open(self):
+        """Creates the socket, binds it and joins the multicast group."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self.nmeaserver.reuse_port:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            sock.bind((self.host, self.port))
+            if self.group is not None:
+                membership = struct.pack(
+                    '4s4s', socket.inet_aton(self.group),
+                    socket.inet_aton(self.interface))
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                                membership)
+        except BaseException:
+            sock.close()
+            raise
+        self.sock = sock
+        self.name = 'udp:{}'.format(self.server_address[1])
+        self.buffer = bytearray(self.read_size)
+        self.view = memoryview(self.buffer)
+        logger.info('UDP Address: {}:{}{}'.format(
+            self.host or "localhost", self.server_address[1],
+            ' group ' + self.group if self.group else ''))
+
+    @property
+    def server_address(self):
+        return self.sock.getsockname()[:2]
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def thread_name(self):
+        return 'udp-{}'.format(self.server_address[1])
+
+    def close(self):
+        self.sock.close()
+
+    def context(self, address):
+        """Returns the connection context of a sender."""
+        context = self.contexts.get(address)
+        if context is None:
+            if len(self.contexts) >= self.max_senders:
+                self.contexts.clear()
+            context = {
+                'client_address': address[0],
+                'connection': 'udp:{}:{}'.format(*address[:2]),
+                'transport': 'udp',
+            }
+            creator = self.nmeaserver.connection_context_creator
+            if creator is not None:
+                context = creator(context)
+            self.contexts[address] = context
+        return context
+
+    def read_ready(self):
+        sock = self.sock
+        buffer = self.buffer
+        metrics = self.nmeaserver.metrics
+        for _ in range(self.batch):
+            try:
+                if _MSG_DONTWAIT is None:
+                    size, address = sock.recvfrom_into(buffer)
+                else:
+                    size, address = sock.recvfrom_into(
+                        buffer, 0, _MSG_DONTWAIT)
+            except (IOError, OSError) as err:
+                if err.errno in _WOULD_BLOCK:
+                    break
+                raise
+            self.datagrams += 1
+            if metrics is not None:
+                metrics.received(self.name, size)
+            self.received(split_sentences(self.view[:size].tobytes()),
+                          address)
+            if _MSG_DONTWAIT is None:
+                break
+        return True
+
+    def received(self, sentences, address):
+        """Dispatches the sentences of a datagram from address."""
+        self.dispatch(sentences, self.context(address),
+                      lambda response: self.sock.sendto(response, address))
+
+    def stats(self):
+        stats = InputSource.stats(self)
+        stats['datagrams'] = self.datagrams
+        stats['senders'] = len(self.contexts)
+        return stats
@@ -0,0 +1,247 @@
+"""Typed decoding of the data fields of parsed sentences.
+
+A decoder is registered for a sentence type, or for a whole sentence_id, with
+the schema of its fields::
+
+    decoders.register('HRB', [
+        ('date', decoders.date),
+        ('time', decoders.utc_time),
+        ('latitude', decoders.latitude, 2),
+        ('longitude', decoders.longitude, 2),
+        ('team', str),
+    ])
+
+after which :attr:`formatter.Sentence.fields` converts each field the first
+time it is read::
+
+    @app.message('GPGGA')
+    def gga(context, message):
+        fields = message.fields
+        return formatter.format('TXPOS,{},{}'.format(fields.latitude,
+                                                     fields.longitude))
+
+Decoders for GGA, RMC, VTG and HDT sentences are registered by default.
+"""
+
+import datetime
+
+
+def _coordinate(value, hemisphere, negative):
+    # ddmm.mmmm or dddmm.mmmm and its hemisphere to signed decimal degrees.
+    if not value:
+        return None
+    number = float(value)
+    degrees = int(number // 100)
+    degrees += (number - degrees * 100) / 60
+    return -degrees if hemisphere in negative else degrees
+
+
+def latitude(value, hemisphere=''):
+    """Converts a ddmm.mmmm latitude and its 'N' or 'S' hemisphere to signed
+    decimal degrees."""
+    return _coordinate(value, hemisphere, 'Ss')
+
+
+def longitude(value, hemisphere=''):
+    """Converts a dddmm.mmmm longitude and its 'E' or 'W' hemisphere to signed
+    decimal degrees."""
+    return _coordinate(value, hemisphere, 'Ww')
+
+
+def variation(value, direction=''):
+    """Converts a magnetic variation and its 'E' or 'W' direction to signed
+    degrees, west being negative."""
+    if not value:
+        return None
+    return -float(value) if direction in 'Ww' else float(value)
+
+
+def utc_time(value):
+    """Converts a hhmmss.ss time to a :class:`datetime.time`."""
+    if not value:
+        return None
+    seconds = float(value[4:] or 0)
+    return datetime.time(int(value[:2]), int(value[2:4]), int(seconds),
+                         int(round((seconds % 1) * 1e6)) % 1000000)
+
+
+def date(value):
+    """Converts a ddmmyy date to a :class:`datetime.date`, years before 80
+    being in the 2000s."""
+    if not value:
+        return None
+    year = int(value[4:6])
+    return datetime.date(year + (2000 if year < 80 else 1900),
+                         int(value[2:4]), int(value[:2]))
+
+
+class Fields(object):
+    """The typed fields of a sentence, read as attributes or keys. Each field
+    is converted the first time it is read and is then a plain attribute.
+    Fields missing from the sentence or empty are None.
+
+    .. versionadded:: 0.2.0
+    """
+
+    #: The (function, index, count) converting each field, by name.
+    _converters = {}
+    #: The field names, in order.
+    _names = ()
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getattr__(self, name):
+        try:
+            function, index, count = self._converters[name]
+        except KeyError:
+            raise AttributeError(name)
+        values = self._data[index:index + count]
+        if len(values) < count or not values[0]:
+            value = None
+        else:
+            value = function(*values)
+        setattr(self, name, value)
+        return value
+
+    def __getitem__(self, name):
+        if name not in self._converters:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __contains__(self, name):
+        return name in self._converters
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def keys(self):
+        return list(self._names)
+
+    def as_dict(self):
+        """Returns a dict of every field, converting those not read yet."""
+        return dict((name, getattr(self, name)) for name in self._names)
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.as_dict())
+
+
+class Decoder(object):
+    """Compiles a schema, the sequence of the fields of a sentence type, once
+    into the :class:`Fields` class its sentences are decoded with.
+
+    Each field of the schema is a ``(name, function)`` pair converting one
+    data field, or a ``(name, function, count)`` triple passing the next
+    count data fields to the function. None skips a data field, such as a
+    units field.
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, name, schema):
+        converters = {}
+        names = []
+        index = 0
+        for field in schema:
+            if field is None:
+                index += 1
+                continue
+            count = field[2] if len(field) > 2 else 1
+            if field[0] in converters:
+                raise ValueError("Duplicate field '{}'".format(field[0]))
+            converters[field[0]] = (field[1], index, count)
+            names.append(field[0])
+            index += count
+        self.name = name
+        self.schema = schema
+        self.fields_class = type(str(name + 'Fields'), (Fields,), {
+            '_converters': converters,
+            '_names': tuple(names),
+        })
+
+    def decode(self, data):
+        """Returns the :class:`Fields` of a list of data fields."""
+        return self.fields_class(data)
+
+
+#: The registered :class:`Decoder` by sentence type or sentence_id.
+registry = {}
+
+
+def register(sentence_type, schema):
+    """Registers the schema of the fields of a sentence type, such as 'GGA',
+    or of a whole sentence_id, such as 'RBHRB', which takes precedence.
+    Returns the compiled :class:`Decoder`."""
+
+    decoder = Decoder(sentence_type, schema)
+    registry[sentence_type] = decoder
+    return decoder
+
+
+def unregister(sentence_type):
+    """Removes the decoder of a sentence type or sentence_id."""
+    registry.pop(sentence_type, None)
+
+
+def decoder_for(message):
+    """Returns the :class:`Decoder` of a parsed message, or None."""
+    decoder = registry.get(message['sentence_id'])
+    if decoder is None:
+        decoder = registry.get(message['sentence_type'])
+    return decoder
+
+
+def decode(message):
+    """Returns the typed :class:`Fields` of a message returned by
+    :func:`formatter.parse`, or None when no decoder is registered for it."""
+    decoder = decoder_for(message)
+    if decoder is None:
+        return None
+    return decoder.decode(message['data'])
+
+
+register('GGA', [
+    ('time', utc_time),
+    ('latitude', latitude, 2),
+    ('longitude', longitude, 2),
+    ('quality', int),
+    ('satellites', int),
+    ('hdop', float),
+    ('altitude', float),
+    None,
+    ('geoid_separation', float),
+    None,
+    ('age', float),
+    ('station', str),
+])
+
+register('RMC', [
+    ('time', utc_time),
+    ('status', str),
+    ('latitude', latitude, 2),
+    ('longitude', longitude, 2),
+    ('speed_knots', float),
+    ('course', float),
+    ('date', date),
+    ('variation', variation, 2),
+    ('mode', str),
+])
+
+register('VTG', [
+    ('true_track', float),
+    None,
+    ('magnetic_track', float),
+    None,
+    ('speed_knots', float),
+    None,
+    ('speed_kmh', float),
+    None,
+    ('mode', str),
+])
+
+register('HDT', [
+    ('heading', float),
+])
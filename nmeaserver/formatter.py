@@ -1,6 +1,14 @@
 import operator
+import os
 import re
+import string
 from functools import reduce
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # Python 2
+    from collections import MutableMapping
+
+from . import decoders
 
 #: RegEx pattern for a strict NMEA sentence (mandatory checksum).
 NMEApattern_strict = re.compile('''
@@ -25,19 +33,146 @@ NMEApattern = re.compile('''
         ''', re.X | re.IGNORECASE)
 
 
+#: The 2 digit hexadecimal representation of every possible checksum.
+_HEX = ['%02X' % value for value in range(256)]
+
+#: (shift, mask) pairs folding the upper half of an integer of 2 ** (i + 1)
+#: bytes onto its lower half.
+_FOLDS = [(8 << i, (1 << (8 << i)) - 1) for i in range(12)]
+_FOLD_MAX = 1 << len(_FOLDS)
+
+_STAR = re.compile(b'\\*')
+
+if bytes is str:  # Python 2
+    import binascii
+
+    def _to_int(data):
+        return int(binascii.hexlify(data) or '0', 16)
+
+    def _latin1(text):
+        if isinstance(text, str):
+            return text
+        return text.encode('latin-1')
+
+    def _decode(data):
+        if isinstance(data, memoryview):
+            return data.tobytes()
+        return bytes(data)
+else:
+    def _to_int(data):
+        return int.from_bytes(data, 'little')
+
+    def _latin1(text):
+        return text.encode('latin-1')
+
+    def _decode(data):
+        return str(data, 'latin-1')
+
+
+def _xor(data):
+    # XOR of every byte of a bytes-like object: the bytes are read as one
+    # integer that is folded in half until a single byte is left.
+    size = len(data)
+    if size > _FOLD_MAX:
+        data = memoryview(data)
+        value = 0
+        for offset in range(0, size, _FOLD_MAX):
+            value ^= _xor(data[offset:offset + _FOLD_MAX])
+        return value
+    value = _to_int(data)
+    for shift, mask in _FOLDS[(size - 1).bit_length() - 1::-1]:
+        value = (value >> shift) ^ (value & mask)
+    return value
+
+
+def _text_checksum(text):
+    # The checksum of a str already stripped of its '$' and '*' parts.
+    try:
+        return _HEX[_xor(_latin1(text))]
+    except UnicodeError:
+        # Characters beyond latin-1 can XOR past 0xFF, which calc_checksum
+        # has always reported with an extra leading '0'.
+        value = reduce(operator.xor, map(ord, text), 0)
+        return _HEX[value] if value < 256 else '0%X' % value
+
+
 def calc_checksum(nmea_str):
+    """Returns the checksum of a sentence as a 2 digit hexadecimal string.
+    A leading '$' and everything from the '*' on are ignored.
+
+    :param nmea_str: the sentence as a str, or as bytes, bytearray or
+                     memoryview, which are read without being copied
+    """
+    if isinstance(nmea_str, (bytes, bytearray, memoryview)):
+        if isinstance(nmea_str, memoryview) and bytes is str:
+            # Python 2 regexes cannot search a memoryview.
+            nmea_str = nmea_str.tobytes()
+        start = 1 if nmea_str[:1] == b'$' else 0
+        if isinstance(nmea_str, memoryview):
+            star = _STAR.search(nmea_str, start)
+            end = star.start() if star else -1
+        else:
+            end = nmea_str.find(b'*', start)
+        if end < 0:
+            end = len(nmea_str)
+        if start or end < len(nmea_str):
+            nmea_str = memoryview(nmea_str)[start:end]
+        return _HEX[_xor(nmea_str)]
+
     # Strip '$' and everything after the '*'
     if nmea_str.startswith('$'):
         nmea_str = nmea_str[1:]
     if nmea_str.find('*') >= 0:
         nmea_str = nmea_str[:nmea_str.find('*')]
+    return _text_checksum(nmea_str)
 
-    # this returns a 2 digit hexadecimal string to use as a checksum.
-    checksum = hex(reduce(operator.xor, map(ord, nmea_str), 0))[2:].upper()
-    if len(checksum) == 2:
-        return checksum
-    else:
-        return '0' + checksum
+
+def checksum_batch(buffer, starts, ends):
+    """XORs the bytes of buffer[starts[i]:ends[i]] for every i at once.
+
+    :param buffer: a bytes-like object holding packed sentences
+    :param starts: the offsets where each checksum starts
+    :param ends: the offsets where each checksum ends, exclusive
+    :returns: a numpy uint8 array of the checksums
+    """
+    import numpy
+
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    # prefix[i] is the XOR of data[:i], so data[s:e] XORs to
+    # prefix[e] ^ prefix[s].
+    prefix = numpy.empty(len(data) + 1, dtype=numpy.uint8)
+    prefix[0] = 0
+    numpy.bitwise_xor.accumulate(data, out=prefix[1:])
+    return prefix[numpy.asarray(ends, dtype=numpy.intp)] ^ \
+        prefix[numpy.asarray(starts, dtype=numpy.intp)]
+
+
+def calc_checksums(sentences):
+    """Vectorized :func:`calc_checksum` returning the list of checksums of
+    many sentences, packed in a single buffer and XORed with numpy."""
+    import numpy
+
+    try:
+        encoded = [sentence if isinstance(sentence, bytes) else
+                   _latin1(sentence) for sentence in sentences]
+    except UnicodeError:
+        return [calc_checksum(sentence) for sentence in sentences]
+    if not encoded:
+        return []
+
+    data = numpy.frombuffer(b''.join(encoded), dtype=numpy.uint8)
+    lengths = numpy.fromiter(map(len, encoded), numpy.intp, len(encoded))
+    line_ends = numpy.cumsum(lengths)
+    starts = line_ends - lengths
+    if len(data):
+        first = data[numpy.minimum(starts, len(data) - 1)]
+        starts += (lengths > 0) & (first == ord('$'))
+
+    # The first '*' at or after the start of each sentence, if within it.
+    stars = numpy.append(numpy.flatnonzero(data == ord('*')), len(data))
+    ends = numpy.minimum(stars[numpy.searchsorted(stars, starts)], line_ends)
+    return [_HEX[value] for value in
+            checksum_batch(data, starts, ends).tolist()]
 
 
 def format(sentence, new_line=False):
@@ -50,7 +185,345 @@ def format(sentence, new_line=False):
     return sentence
 
 
+if bytes is str:  # Python 2, where \w only matches ASCII characters
+    _WORD_CHARS = string.ascii_letters + string.digits + '_'
+
+    def _is_word(chars):
+        return not chars.translate(None, _WORD_CHARS)
+else:
+    def _is_word(chars):
+        return chars.isalnum() or chars.replace('_', 'a').isalnum()
+
+_HEX_DIGITS = frozenset(string.hexdigits)
+
+
+def _match_at(nmea_str, start, strict):
+    # Returns the index of the end of the data field if a sentence starts at
+    # start, the same way the NMEApattern regexes would match it.
+    comma = start + 5
+    if nmea_str[comma:comma + 1] != ',' or \
+            not _is_word(nmea_str[start:comma]):
+        return -1
+    end = nmea_str.find('*', comma + 1)
+    if end < 0:
+        if strict:
+            return -1
+        end = len(nmea_str)
+    if end == comma + 1:
+        return -1
+    if strict and (nmea_str[end + 1:end + 2] not in _HEX_DIGITS or
+                   nmea_str[end + 2:end + 3] not in _HEX_DIGITS):
+        return -1
+    return end
+
+
+def _match(nmea_str, strict):
+    # The regexes try the character after the first '$' first, then every
+    # position before it, backwards.
+    dollar = nmea_str.find('$')
+    if dollar >= 0:
+        end = _match_at(nmea_str, dollar + 1, strict)
+        if end >= 0:
+            return dollar + 1, end
+        start = dollar - 1
+    else:
+        start = len(nmea_str) - 6
+    while start >= 0:
+        end = _match_at(nmea_str, start, strict)
+        if end >= 0:
+            return start, end
+        start -= 1
+    return -1, -1
+
+
+_KEYS = ('sentence', 'sentence_id', 'talker', 'sentence_type', 'data')
+
+
+class Sentence(object):
+    """A parsed NMEA sentence. It keeps the received str and the offsets of
+    its data, and only splits the data into fields the first time they are
+    accessed, which handlers looking at the sentence_id alone never do.
+
+    It is a mapping with the 'sentence', 'sentence_id', 'talker',
+    'sentence_type' and 'data' keys of the dict :func:`parse` used to return,
+    so ``message['data'][0]`` keeps working, as do the attributes
+    ``message.data[0]``. It has the methods of a dict, such as ``pop``,
+    ``update`` or ``copy``, and other keys may be set or any removed like on
+    a dict. Not being a dict, it must be converted with ``dict(message)``
+    for ``json.dumps``.
+
+    .. versionadded:: 0.2.0
+    """
+
+    __slots__ = ('sentence', 'sentence_id', '_start', '_end', '_data',
+                 '_extra', '_fields', '_removed')
+
+    def __init__(self, sentence, sentence_id, start, end):
+        #: The sentence as received.
+        self.sentence = sentence
+        #: The talker and sentence type, upper cased.
+        self.sentence_id = sentence_id
+        self._start = start
+        self._end = end
+        self._data = None
+        self._extra = None
+        self._fields = None
+        self._removed = None
+
+    @property
+    def talker(self):
+        """The 2 character talker ID, upper cased."""
+        if self._extra is not None and 'talker' in self._extra:
+            return self._extra['talker']
+        if len(self.sentence_id) == 5:
+            return self.sentence_id[:2]
+        # Upper casing changed the length of a non ASCII sentence_id.
+        return self.sentence[self._start - 6:self._start - 4].upper()
+
+    @property
+    def sentence_type(self):
+        """The 3 character sentence type, upper cased."""
+        if self._extra is not None and 'sentence_type' in self._extra:
+            return self._extra['sentence_type']
+        if len(self.sentence_id) == 5:
+            return self.sentence_id[2:]
+        return self.sentence[self._start - 4:self._start - 1].upper()
+
+    @property
+    def data(self):
+        """The list of the comma separated data fields, split once."""
+        if self._data is None:
+            self._data = self.sentence[self._start:self._end].split(',')
+        return self._data
+
+    @property
+    def fields(self):
+        """The typed :class:`decoders.Fields` of the data, each converted on
+        first access, or None if no decoder is registered for the sentence
+        type or sentence_id."""
+        if self._fields is None:
+            self._fields = decoders.decode(self)
+        return self._fields
+
+    def __getitem__(self, key):
+        if self._removed is not None and key in self._removed:
+            raise KeyError(key)
+        if key == 'sentence_id':
+            return self.sentence_id
+        if key == 'data':
+            return self.data
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        if key in _KEYS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if self._removed is not None:
+            self._removed.discard(key)
+        if key == 'sentence':
+            self._detach()
+            self.sentence = value
+        elif key == 'sentence_id':
+            self._detach()
+            self.sentence_id = value
+        elif key == 'data':
+            self._data = value
+            self._fields = None
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def _detach(self):
+        # Keeps the fields derived from the sentence and sentence_id as they
+        # are, like the keys of a dict, before either is replaced.
+        talker, sentence_type = self.talker, self.sentence_type
+        self._data = self.data
+        if self._extra is None:
+            self._extra = {}
+        self._extra['talker'] = talker
+        self._extra['sentence_type'] = sentence_type
+
+    def __delitem__(self, key):
+        if key in _KEYS:
+            # The attributes stay, the key is only hidden from the mapping.
+            if key not in self:
+                raise KeyError(key)
+            if self._removed is None:
+                self._removed = set()
+            self._removed.add(key)
+        elif self._extra is None or key not in self._extra:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+
+    def __contains__(self, key):
+        if key in _KEYS:
+            return self._removed is None or key not in self._removed
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        removed = self._removed
+        for key in _KEYS:
+            if removed is None or key not in removed:
+                yield key
+        if self._extra is not None:
+            for key in self._extra:
+                if key not in _KEYS:
+                    yield key
+
+    def __len__(self):
+        return len(_KEYS) - len(self._removed or ()) + \
+            sum(1 for key in self._extra or () if key not in _KEYS)
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, *default):
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self[key]
+        return value
+
+    def popitem(self):
+        """Removes and returns a (key, value) pair, the last one where dicts
+        keep their order."""
+        keys = self.keys()
+        if not keys:
+            raise KeyError('popitem(): sentence is empty')
+        key = keys[-1]
+        return key, self.pop(key)
+
+    def setdefault(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            self[key] = default
+            return default
+
+    def update(self, *args, **kwargs):
+        if len(args) > 1:
+            raise TypeError('update expected at most 1 argument')
+        other = args[0] if args else ()
+        if hasattr(other, 'keys'):
+            other = [(key, other[key]) for key in other.keys()]
+        for key, value in other:
+            self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def clear(self):
+        for key in self.keys():
+            del self[key]
+
+    def copy(self):
+        """Returns a shallow copy, a Sentence sharing the values but not the
+        keys, like dict.copy does."""
+        other = Sentence(self.sentence, self.sentence_id, self._start,
+                         self._end)
+        other._data = self._data
+        other._fields = self._fields
+        if self._extra is not None:
+            other._extra = dict(self._extra)
+        if self._removed is not None:
+            other._removed = set(self._removed)
+        return other
+
+    def __eq__(self, other):
+        if isinstance(other, (Sentence, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __getstate__(self):
+        return (self.sentence, self.sentence_id, self._start, self._end,
+                self._data, self._extra, self._removed)
+
+    def __setstate__(self, state):
+        (self.sentence, self.sentence_id, self._start, self._end,
+         self._data, self._extra, self._removed) = state
+        self._fields = None
+
+    def __repr__(self):
+        return 'Sentence(%r)' % dict(self.items())
+
+
+# Not a subclass, which would give every Sentence a __dict__ on Python 2.
+MutableMapping.register(Sentence)
+
+
 def parse(nmea_str, strict=True):
+    """Parses a NMEA sentence into a :class:`Sentence` mapping its
+    'sentence', 'sentence_id', 'talker', 'sentence_type' and its comma
+    separated 'data' fields, split on first access.
+
+    A single pass parser giving the same results and errors as
+    :func:`regex_parse`, which it replaces as the default.
+
+    :param nmea_str: the sentence to parse, as a str or as bytes, bytearray
+                     or memoryview which are decoded as latin-1
+    :param strict: whether a valid checksum is mandatory
+    :raises ValueError: if the sentence cannot be parsed or if its checksum
+                        does not match
+    """
+    if type(nmea_str) is not str:
+        if isinstance(nmea_str, bytes):
+            nmea_str = nmea_str.decode('latin-1')
+        elif isinstance(nmea_str, (bytearray, memoryview)):
+            nmea_str = _decode(nmea_str)
+        else:
+            return regex_parse(nmea_str, strict)
+
+    # Fast path for the usual '$' prefixed sentence, see _match_at().
+    start = nmea_str.find('$') + 1
+    end = nmea_str.find('*', start + 6)
+    if end < 0 and not strict:
+        end = len(nmea_str)
+    if start == 0 or end <= start + 6 or \
+            nmea_str[start + 5:start + 6] != ',' or \
+            not nmea_str[start:start + 5].isalnum() or \
+            (strict and (nmea_str[end + 1:end + 2] not in _HEX_DIGITS or
+                         nmea_str[end + 2:end + 3] not in _HEX_DIGITS)):
+        start, end = _match(nmea_str, strict)
+        if start < 0:
+            raise ValueError('Could not parse data:', nmea_str)
+    message = Sentence(nmea_str, nmea_str[start:start + 5].upper(),
+                       start + 6, end)
+
+    if strict:
+        checksum = nmea_str[end + 1:end + 3]
+        expected = _text_checksum(nmea_str[start:end])
+        if checksum != expected:
+            raise ValueError(
+                'Checksum does not match: %s != %s.' % (checksum, expected))
+    return message
+
+
+def regex_parse(nmea_str, strict=True):
+    """Parses a NMEA sentence with the NMEApattern regexes. Kept as the
+    reference implementation of :func:`parse`."""
     # parse NMEA string into dict of fields.
     # the data will be split by commas and accessible by index.
     match = None
@@ -78,3 +551,287 @@ def parse(nmea_str, strict=True):
                 'Checksum does not match: %s != %s.' %
                 (checksum, calc_checksum(nmea_str)))
     return nmea_dict
+
+
+#: The widest numeric field :func:`parse_buffer` converts, longer ones are
+#: taken as missing.
+_NUMBER_WIDTH = 32
+
+_BULK_TABLES = {}
+
+
+def _bulk_tables():
+    # 256 entry lookup tables of the word characters and of the value of the
+    # upper case hexadecimal digits, built with numpy on first use.
+    if not _BULK_TABLES:
+        import numpy
+
+        word = numpy.zeros(256, dtype=bool)
+        word[bytearray((string.ascii_letters + string.digits + '_')
+                       .encode('ascii'))] = True
+        hex_value = numpy.full(256, -1, dtype=numpy.int16)
+        hex_value[bytearray(b'0123456789ABCDEF')] = numpy.arange(16)
+        _BULK_TABLES.update(word=word, hex=hex_value)
+    return _BULK_TABLES
+
+
+def _field_strings(data, starts, ends, width=None):
+    # The bytes of every data[starts[i]:ends[i]] as a numpy 'S' array. Those
+    # longer than width are returned empty.
+    import numpy
+
+    lengths = ends - starts
+    if not len(lengths) or not lengths.max():
+        return numpy.zeros(len(lengths), dtype='S1')
+    longest = int(lengths.max())
+    width = longest if width is None else max(1, min(width, longest))
+    index = starts[:, None] + numpy.arange(width)
+    chars = data[numpy.minimum(index, len(data) - 1)]
+    chars[index >= ends[:, None]] = 0
+    chars[lengths > width] = 0
+    return chars.view('S%d' % width).ravel()
+
+
+def _bulk_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return float('nan')
+
+
+def _numbers(strings):
+    # float64 array of a 'S' array, NaN where empty or invalid.
+    import numpy
+
+    strings = numpy.where(strings == b'', b'nan', strings)
+    try:
+        return strings.astype(numpy.float64)
+    except ValueError:
+        return numpy.array([_bulk_float(value) for value in strings],
+                           dtype=numpy.float64)
+
+
+def _signed(values, direction, negative):
+    import numpy
+
+    return numpy.where(numpy.isin(direction, negative), -values, values)
+
+
+def _coordinates(strings, hemisphere, negative):
+    import numpy
+
+    values = _numbers(strings)
+    degrees = numpy.floor(values / 100)
+    return _signed(degrees + (values - degrees * 100) / 60, hemisphere,
+                   negative)
+
+
+def _seconds_of_day(strings):
+    import numpy
+
+    values = _numbers(strings)
+    return numpy.floor(values / 10000) * 3600 + \
+        (numpy.floor(values / 100) % 100) * 60 + values % 100
+
+
+def _dates(strings):
+    import numpy
+
+    values = _numbers(strings)
+    missing = numpy.isnan(values)
+    values = numpy.where(missing, 0, values).astype(numpy.int64)
+    years = values % 100
+    years += numpy.where(years < 80, 2000, 1900)
+    dates = (years - 1970).astype('M8[Y]') + \
+        ((values // 100) % 100 - 1).astype('m8[M]')
+    dates = dates.astype('M8[D]') + (values // 10000 - 1).astype('m8[D]')
+    dates[missing] = numpy.datetime64('NaT')
+    return dates
+
+
+def _bulk_str(value):
+    return value if bytes is str else value.decode('latin-1')
+
+
+def _column(function, strings):
+    # The column of a decoder field, vectorized for the converters of the
+    # decoders module, or calling function for each row otherwise.
+    import numpy
+
+    if function is float or function is int:
+        return _numbers(strings[0])
+    if function is str:
+        return strings[0]
+    if function is decoders.latitude:
+        return _coordinates(strings[0], strings[1], [b'S', b's'])
+    if function is decoders.longitude:
+        return _coordinates(strings[0], strings[1], [b'W', b'w'])
+    if function is decoders.variation:
+        return _signed(_numbers(strings[0]), strings[1], [b'W', b'w'])
+    if function is decoders.utc_time:
+        return _seconds_of_day(strings[0])
+    if function is decoders.date:
+        return _dates(strings[0])
+    column = numpy.empty(len(strings[0]), dtype=object)
+    for row, values in enumerate(zip(*strings)):
+        if values[0]:
+            column[row] = function(*[_bulk_str(value) for value in values])
+    return column
+
+
+def parse_buffer(buffer, sentence_type, strict=True, first_line=0):
+    """Parses the sentences of one type out of a buffer of '\\n' separated
+    lines, such as a capture log, at once with numpy, and returns their
+    fields as columns.
+
+    The fields are those of the decoder registered for the sentence_id or
+    sentence type in the :mod:`decoders` module. Numbers, coordinates and
+    times of day, in seconds since midnight, are float64 columns holding NaN
+    where missing, dates are datetime64[D] columns, and str fields are bytes
+    columns. Decoders with both a 'date' and a 'time' also get a
+    datetime64[us] 'timestamp' column.
+
+    Each line is parsed from its first '$'. Unlike :func:`parse`, lines
+    without a '$' are not parsed.
+
+    :param buffer: a bytes-like object, such as a mmap
+    :param sentence_type: the sentence type or sentence_id to return
+    :param strict: whether a valid checksum is mandatory
+    :param first_line: the number of the first line of the buffer
+    :returns: a dict of the number of 'lines' in the buffer, a 'bad' boolean
+              mask of the lines that could not be parsed or whose checksum
+              does not match, the 'line' number of each row returned and the
+              dict of 'columns' by field name
+    :raises ValueError: if no decoder is registered for sentence_type
+    """
+    import numpy
+
+    decoder = decoders.registry.get(sentence_type) or \
+        decoders.registry.get(sentence_type[2:])
+    if decoder is None:
+        raise ValueError("No decoder registered for '{}'"
+                         .format(sentence_type))
+    tables = _bulk_tables()
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    size = len(data)
+
+    ends = numpy.flatnonzero(data == ord('\n'))
+    if size and (not len(ends) or ends[-1] != size - 1):
+        ends = numpy.append(ends, size)
+    starts = numpy.zeros_like(ends)
+    starts[1:] = ends[:-1] + 1
+    last = numpy.maximum(ends - 1, 0)
+    ends = ends - ((ends > starts) & (data[last] == ord('\r')))
+    blank = ends == starts
+
+    def at(offsets):
+        return data[numpy.minimum(offsets, size - 1)]
+
+    dollars = numpy.append(numpy.flatnonzero(data == ord('$')), size)
+    start = dollars[numpy.searchsorted(dollars, starts)]
+    valid = start + 7 < ends
+    start = numpy.where(valid, start, 0)
+    for offset in range(1, 6):
+        valid &= tables['word'][at(start + offset)]
+    valid &= at(start + 6) == ord(',')
+
+    stars = numpy.append(numpy.flatnonzero(data == ord('*')), size)
+    star = stars[numpy.searchsorted(stars, start + 7)]
+    has_star = valid & (star < ends)
+    end = numpy.where(has_star, star, ends)
+    valid &= end > start + 7
+    if strict:
+        checksums = checksum_batch(data, numpy.where(valid, start + 1, 0),
+                                   numpy.where(valid, end, 0))
+        high = tables['hex'][at(star + 1)]
+        low = tables['hex'][at(star + 2)]
+        valid &= has_star & (star + 2 < ends) & (high >= 0) & (low >= 0) & \
+            (high * 16 + low == checksums)
+
+    bad = ~blank & ~valid
+    wanted = bytearray(sentence_type.upper().encode('ascii'))
+    offset = 6 - len(wanted)
+    for index, char in enumerate(wanted):
+        got = at(start + offset + index)
+        valid &= (got == char) | (got == char + 32) & (char >= ord('A'))
+    rows = numpy.flatnonzero(valid)
+
+    # Field i of a row spans from its i-th comma to the next one.
+    start, end = start[rows], end[rows]
+    commas = numpy.append(numpy.flatnonzero(data == ord(',')), size)
+    first = numpy.searchsorted(commas, start + 6)
+
+    def field(index, width):
+        left = commas[numpy.minimum(first + index, len(commas) - 1)]
+        right = commas[numpy.minimum(first + index + 1, len(commas) - 1)]
+        missing = left >= end
+        left = numpy.where(missing, end, left + 1)
+        right = numpy.where(missing, end, numpy.minimum(right, end))
+        return _field_strings(data, left, right, width)
+
+    columns = {}
+    for name in decoder.fields_class._names:
+        function, index, count = decoder.fields_class._converters[name]
+        width = None if function is str else _NUMBER_WIDTH
+        columns[name] = _column(function, [field(index + i, width)
+                                           for i in range(count)])
+    converters = decoder.fields_class._converters
+    if converters.get('date', (None,))[0] is decoders.date and \
+            converters.get('time', (None,))[0] is decoders.utc_time:
+        seconds = columns['time']
+        missing = numpy.isnan(seconds)
+        micros = numpy.round(numpy.where(missing, 0, seconds) * 1e6)
+        timestamps = columns['date'].astype('M8[us]') + \
+            micros.astype(numpy.int64).astype('m8[us]')
+        timestamps[missing] = numpy.datetime64('NaT')
+        columns['timestamp'] = timestamps
+
+    return {
+        'lines': len(ends),
+        'bad': bad,
+        'line': rows + first_line,
+        'columns': columns,
+    }
+
+
+def parse_file(path, sentence_type, strict=True, chunk_size=1 << 24):
+    """Memory-maps a log of '\\n' separated sentences and parses it with
+    :func:`parse_buffer` chunk by chunk, so that logs bigger than the memory
+    can be processed. Yields the result of each chunk of about chunk_size
+    bytes, whose 'line' numbers count from the start of the file::
+
+        for chunk in formatter.parse_file('capture.log', 'GGA'):
+            plot(chunk['columns']['longitude'], chunk['columns']['latitude'])
+
+    :param path: the path of the log
+    :param sentence_type: the sentence type or sentence_id to return
+    :param strict: whether a valid checksum is mandatory
+    :param chunk_size: the number of bytes parsed at once, rounded up to the
+                       end of a line
+    """
+    import mmap
+    import numpy
+
+    with open(path, 'rb') as log:
+        size = os.fstat(log.fileno()).st_size
+        if not size:
+            return
+        mapped = mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ)
+        data = numpy.frombuffer(mapped, dtype=numpy.uint8)
+        try:
+            position = line = 0
+            while position < size:
+                end = min(position + chunk_size, size)
+                if end < size:
+                    cut = mapped.rfind(b'\n', position, end) + 1
+                    if cut <= position:
+                        cut = mapped.find(b'\n', end) + 1 or size
+                    end = cut
+                chunk = parse_buffer(data[position:end], sentence_type,
+                                     strict, line)
+                line += chunk['lines']
+                position = end
+                yield chunk
+        finally:
+            del data
+            mapped.close()
@@ -0,0 +1,131 @@
+"""Splitting of received bytes into NMEA sentences."""
+
+import logging
+import os
+
+logger = logging.getLogger("nmeaserver")
+
+
+def split_sentences(chunk):
+    """Splits bytes holding complete lines into the list of their stripped
+    sentences, also splitting a line at every '$' after its first one so
+    that sentences sent back to back without a line break are told apart.
+    Blank lines are skipped."""
+
+    sentences = []
+    for line in chunk.split(b'\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if line.find(b'$', 1) < 0:
+            sentences.append(line)
+            continue
+        pieces = line.split(b'$')
+        first = (pieces[0] + b'$' + pieces[1]).strip()
+        if first:
+            sentences.append(first)
+        for piece in pieces[2:]:
+            sentences.append((b'$' + piece).strip())
+    return sentences
+
+
+class LineBuffer(object):
+    """A reusable receive buffer splitting a stream of bytes into sentences.
+
+    Data is received straight into a preallocated bytearray, and the complete
+    lines it holds are split into sentences with one pass of C level bytes
+    operations rather than a Python level call and copy per line. Sentences
+    are returned as bytes, which :func:`formatter.parse` decodes only once.
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, size=65536):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        #: The start of the data not yet split into sentences.
+        self.start = 0
+        #: The end of the data received.
+        self.end = 0
+        #: Whether the rest of an overlong line is being skipped.
+        self.discarding = False
+
+    def _make_room(self):
+        if self.start == self.end:
+            self.start = self.end = 0
+        elif self.end == len(self.buffer):
+            if self.start == 0:
+                logger.warning("Discarding a line longer than {} bytes"
+                               .format(self.end))
+                self.start = self.end = 0
+                self.discarding = True
+            else:
+                size = self.end - self.start
+                self.buffer[:size] = self.buffer[self.start:self.end]
+                self.start, self.end = 0, size
+
+    def recv_into(self, sock):
+        """Receives from a socket into the free end of the buffer. Returns the
+        number of bytes received, 0 once the socket is closed."""
+
+        self._make_room()
+        received = sock.recv_into(self.view[self.end:])
+        self.end += received
+        return received
+
+    def read_into(self, fd):
+        """Reads from a file descriptor into the free end of the buffer, like
+        :meth:`recv_into`. Returns 0 at the end of the file."""
+
+        self._make_room()
+        if hasattr(os, 'readv'):
+            received = os.readv(fd, [self.view[self.end:]])
+        else:  # Python 2
+            data = os.read(fd, len(self.buffer) - self.end)
+            received = len(data)
+            self.buffer[self.end:self.end + received] = data
+        self.end += received
+        return received
+
+    def feed(self, data):
+        """Copies bytes read by other means into the buffer and returns the
+        list of sentences they complete."""
+
+        sentences = []
+        data = memoryview(data)
+        while len(data):
+            self._make_room()
+            size = min(len(data), len(self.buffer) - self.end)
+            self.buffer[self.end:self.end + size] = data[:size]
+            self.end += size
+            data = data[size:]
+            sentences.extend(self.sentences())
+        return sentences
+
+    def sentences(self):
+        """Returns the list of the sentences completed since the last call."""
+
+        if self.discarding:
+            newline = self.buffer.find(b'\n', self.start, self.end)
+            if newline < 0:
+                self.start = self.end
+                return []
+            self.start = newline + 1
+            self.discarding = False
+        last = self.buffer.rfind(b'\n', self.start, self.end)
+        if last < 0:
+            return []
+        chunk = self.view[self.start:last].tobytes()
+        self.start = last + 1
+        return split_sentences(chunk)
+
+    def flush(self):
+        """Returns whatever is left in the buffer as sentences, for when the
+        stream has ended without a final line break."""
+
+        chunk = self.view[self.start:self.end].tobytes()
+        self.start = self.end = 0
+        if self.discarding:
+            self.discarding = False
+            return []
+        return split_sentences(chunk)
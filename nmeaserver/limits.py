@@ -0,0 +1,310 @@
+"""Admission control of the sentences received on the connections.
+
+Token buckets bound the sentences and bytes per second each connection, and
+all of them together, may have dispatched. The sentences beyond are shed as
+the overload policy says, so that a talker flooding its connection cannot
+starve the others::
+
+    app = NMEAServer(port=9000, max_connections=200)
+    app.add_rate_limit(sentences=20000, connection_sentences=500,
+                       policy='latest', critical=['*HRB', 'RBSTP'])
+
+The policies are:
+
+* ``'drop_newest'`` drops the sentences received beyond the limits.
+* ``'drop_oldest'`` queues them, up to ``max_queue``, to be dispatched once
+  the limits allow, dropping the oldest ones queued once full.
+* ``'latest'`` queues only the latest sentence of each sentence ID,
+  replacing any older one, so that what is eventually dispatched is fresh.
+* ``'disconnect'`` closes the connection.
+
+Sentences matching ``critical`` IDs or patterns are never limited nor shed,
+so that their latency stays bounded under overload.
+"""
+
+import collections
+import threading
+import time
+
+from .router import SentenceFilter, address
+
+timer = getattr(time, 'monotonic', time.time)
+
+#: The overload policies.
+POLICIES = ('drop_newest', 'drop_oldest', 'latest', 'disconnect')
+
+#: The counters of the sentences shed, of the critical sentences let through
+#: and of the connections closed by the 'disconnect' policy.
+COUNTERS = ('dropped_newest', 'dropped_oldest', 'replaced', 'disconnected',
+            'critical')
+
+
+class Overloaded(IOError):
+    """Raised by :meth:`Admission.check` to close a connection over its
+    limits with the 'disconnect' policy.
+
+    .. versionadded:: 0.2.0
+    """
+
+
+class TokenBucket(object):
+    """Holds up to ``burst`` tokens, refilled at ``rate`` tokens per second.
+    Not thread-safe, see :class:`RateLimit`.
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self.tokens = self.burst
+        self.stamp = timer()
+
+    def _refill(self, now):
+        tokens = self.tokens + (now - self.stamp) * self.rate
+        self.tokens = tokens if tokens < self.burst else self.burst
+        self.stamp = now
+
+    def delay(self, amount, now):
+        """Returns the seconds until amount tokens are available, 0 if they
+        are now. An amount above the burst only waits for a full bucket."""
+        self._refill(now)
+        missing = min(amount, self.burst) - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.burst)
+
+    def give(self, amount):
+        self.tokens = min(self.burst, self.tokens + min(amount, self.burst))
+
+
+class RateLimit(object):
+    """Limits both the sentences and the bytes per second, either being
+    None for no limit, allowing bursts of ``burst`` seconds worth of them.
+    Thread-safe.
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, sentences=None, bytes=None, burst=1.0):
+        self.sentences = None if sentences is None else \
+            TokenBucket(sentences, max(sentences * burst, 1))
+        self.bytes = None if bytes is None else \
+            TokenBucket(bytes, max(bytes * burst, 1))
+        self._lock = threading.Lock()
+
+    def _buckets(self, size):
+        if self.sentences is not None:
+            yield self.sentences, 1
+        if self.bytes is not None:
+            yield self.bytes, size
+
+    def admit(self, size, now):
+        """Takes the tokens of a sentence of size bytes, if available."""
+        with self._lock:
+            for bucket, amount in self._buckets(size):
+                if bucket.delay(amount, now):
+                    return False
+            for bucket, amount in self._buckets(size):
+                bucket.take(amount)
+            return True
+
+    def refund(self, size):
+        """Gives back the tokens taken for a sentence not dispatched."""
+        with self._lock:
+            for bucket, amount in self._buckets(size):
+                bucket.give(amount)
+
+    def delay(self, size, now):
+        """Returns the seconds until a sentence of size bytes is admitted."""
+        with self._lock:
+            return max([bucket.delay(amount, now)
+                        for bucket, amount in self._buckets(size)] or [0.0])
+
+
+class LoadShedder(object):
+    """The limits of a NMEAServer, with the counters of what they shed,
+    created by :meth:`NMEAServer.add_rate_limit`. Each connection gets its
+    :class:`Admission` from :meth:`connection`.
+
+    :param sentences: the sentences per second of all connections together
+    :param bytes: the bytes per second of all connections together
+    :param connection_sentences: the sentences per second of a connection
+    :param connection_bytes: the bytes per second of a connection
+    :param policy: what to do with the sentences over the limits, one of
+                   :data:`POLICIES`
+    :param max_queue: the most sentences queued by a connection with the
+                      'drop_oldest' or 'latest' policies
+    :param critical: the IDs or patterns of the sentences never limited
+    :param burst: the seconds worth of sentences and bytes let through at
+                  once after a quiet time
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, sentences=None, bytes=None, connection_sentences=None,
+                 connection_bytes=None, policy='drop_newest', max_queue=256,
+                 critical=None, burst=1.0):
+        if policy not in POLICIES:
+            raise ValueError('policy must be one of ' + ', '.join(POLICIES))
+        self.limit = None
+        if sentences is not None or bytes is not None:
+            self.limit = RateLimit(sentences, bytes, burst)
+        self.connection_sentences = connection_sentences
+        self.connection_bytes = connection_bytes
+        self.policy = policy
+        self.max_queue = max_queue
+        self.critical = SentenceFilter(allow=critical) if critical else None
+        self.burst = burst
+        self.counters = dict((name, 0) for name in COUNTERS)
+        self._lock = threading.Lock()
+
+    def connection(self):
+        """Returns the :class:`Admission` of a new connection."""
+        return Admission(self)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['policy'] = self.policy
+        return stats
+
+
+class Admission(object):
+    """Decides which of the sentences received on a connection are
+    dispatched, and when, under the limits of a :class:`LoadShedder`.
+    Used by the thread or task reading the connection only.
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, shedder):
+        self.shedder = shedder
+        self.limit = None
+        if shedder.connection_sentences is not None or \
+                shedder.connection_bytes is not None:
+            self.limit = RateLimit(shedder.connection_sentences,
+                                   shedder.connection_bytes, shedder.burst)
+        if shedder.policy == 'latest':
+            self.queue = collections.OrderedDict()
+        else:
+            self.queue = collections.deque()
+        #: Whether the connection went over its limits with the
+        #: 'disconnect' policy.
+        self.overloaded = False
+
+    def _admit(self, sentence, now):
+        size = len(sentence)
+        limit = self.limit
+        if limit is not None and not limit.admit(size, now):
+            return False
+        shared = self.shedder.limit
+        if shared is not None and not shared.admit(size, now):
+            if limit is not None:
+                limit.refund(size)
+            return False
+        return True
+
+    def offer(self, sentences):
+        """Returns the sentences queued before and the new sentences that
+        may be dispatched now, in order, queuing or shedding the others.
+        With the 'disconnect' policy, the sentences from the first one over
+        the limits are ignored and :attr:`overloaded` is set.
+        """
+
+        now = timer()
+        admitted = self.ready(now)
+        critical = self.shedder.critical
+        for sentence in sentences:
+            if self.overloaded:
+                break
+            if critical is not None:
+                field = address(sentence)
+                if field is not None and critical.matches(field):
+                    self.shedder.count('critical')
+                    admitted.append(sentence)
+                    continue
+            if not self.queue and self._admit(sentence, now):
+                admitted.append(sentence)
+            else:
+                self._shed(sentence)
+        return admitted
+
+    def _shed(self, sentence):
+        shedder = self.shedder
+        policy = shedder.policy
+        if policy == 'drop_newest':
+            shedder.count('dropped_newest')
+            return
+        if policy == 'disconnect':
+            shedder.count('disconnected')
+            self.overloaded = True
+            return
+        queue = self.queue
+        if policy == 'latest':
+            key = address(sentence) or sentence
+            if queue.pop(key, None) is not None:
+                shedder.count('replaced')
+            queue[key] = sentence
+            if len(queue) > shedder.max_queue:
+                queue.popitem(last=False)
+                shedder.count('dropped_oldest')
+        else:
+            queue.append(sentence)
+            if len(queue) > shedder.max_queue:
+                queue.popleft()
+                shedder.count('dropped_oldest')
+
+    def _first(self):
+        if isinstance(self.queue, collections.OrderedDict):
+            return next(iter(self.queue.values()))
+        return self.queue[0]
+
+    def _pop(self):
+        if isinstance(self.queue, collections.OrderedDict):
+            self.queue.popitem(last=False)
+        else:
+            self.queue.popleft()
+
+    def ready(self, now=None):
+        """Returns the queued sentences that may be dispatched now."""
+        now = timer() if now is None else now
+        admitted = []
+        while self.queue:
+            sentence = self._first()
+            if not self._admit(sentence, now):
+                break
+            self._pop()
+            admitted.append(sentence)
+        return admitted
+
+    def delay(self):
+        """Returns the seconds until the first queued sentence may be
+        dispatched, or None when none is queued."""
+        if not self.queue:
+            return None
+        size = len(self._first())
+        now = timer()
+        delay = 0.0
+        if self.limit is not None:
+            delay = self.limit.delay(size, now)
+        if self.shedder.limit is not None:
+            delay = max(delay, self.shedder.limit.delay(size, now))
+        return delay
+
+    def check(self):
+        """Raises :class:`Overloaded` once :attr:`overloaded`, to be called
+        after dispatching the sentences admitted."""
+        if self.overloaded:
+            raise Overloaded('Connection over its rate limits')
+
+    def close(self):
+        """Forgets the sentences still queued, counting them as dropped."""
+        if self.queue:
+            self.shedder.count('dropped_oldest', len(self.queue))
+            self.queue.clear()
@@ -0,0 +1,344 @@
+"""Instrumentation of the dispatch of sentences.
+
+When a NMEAServer is created with ``metrics=True``, :meth:`NMEAServer.dispatch`
+counts the sentences of each sentence_id, the bad checksums, unknown messages
+and errors, and records how long the prehandler, the parse, the message
+handler and the posthandler took in latency histograms::
+
+    app = NMEAServer(port=9000, metrics=True, metrics_port=9100)
+    ...
+    print(app.metrics_snapshot()['sentences']['GPGGA']['stages']['handler'])
+
+Each thread records into its own :class:`Recorder`, without locking, and the
+recorders are merged when a snapshot is taken. With ``metrics_port`` the
+snapshot is also served in the Prometheus text format on
+``http://127.0.0.1:<metrics_port>/metrics``.
+"""
+
+import threading
+import time
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # Python 3
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+timer = getattr(time, 'perf_counter', time.time)
+
+#: The stages of a dispatch, timed between consecutive timestamps.
+STAGES = ('prehandler', 'parse', 'handler', 'posthandler')
+
+#: The counters kept for each sentence_id.
+COUNTERS = ('messages', 'bad_checksum', 'unknown', 'errors')
+
+#: Each power of 2 of nanoseconds is split into 2 ** _SUB_BITS buckets.
+_SUB_BITS = 4
+_SUB = 1 << _SUB_BITS
+
+
+class Histogram(object):
+    """An HDR style histogram of durations: every power of 2 of nanoseconds
+    is split into 16 linear buckets, so that recorded values are kept within
+    about 6% whatever their magnitude, in a few dozen buckets.
+
+    .. versionadded:: 0.2.0
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        #: The number of values recorded in each bucket, by bucket index.
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """Records a duration in seconds."""
+        nanoseconds = int(seconds * 1e9)
+        if nanoseconds < 2 * _SUB:
+            index = max(nanoseconds, 0)
+        else:
+            shift = nanoseconds.bit_length() - _SUB_BITS - 1
+            index = shift * _SUB + (nanoseconds >> shift)
+        counts = self.counts
+        counts[index] = counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        """Adds the values recorded by another histogram to this one."""
+        counts = self.counts
+        for index, count in list(other.counts.items()):
+            counts[index] = counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    @staticmethod
+    def _value(index):
+        # The upper bound of a bucket, in seconds.
+        if index < 2 * _SUB:
+            return (index + 1) / 1e9
+        shift = index // _SUB - 1
+        return ((index % _SUB + _SUB + 1) << shift) / 1e9
+
+    def percentile(self, fraction):
+        """Returns the upper bound of the bucket holding the fraction
+        percentile of the recorded values, None when there are none."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._value(index), self.max)
+        return self.max
+
+    def summary(self):
+        """Returns a dict of the count, sum, mean, p50, p99, p999 and max in
+        seconds."""
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(0.5),
+            'p99': self.percentile(0.99),
+            'p999': self.percentile(0.999),
+            'max': self.max,
+        }
+
+
+class Recorder(object):
+    """The counters and histograms recorded by one thread.
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, thread=None):
+        self.thread = thread
+        #: The counters by (name, sentence_id).
+        self.counters = {}
+        #: The histograms by (sentence_id, stage).
+        self.histograms = {}
+        #: The bytes received by connection.
+        self.bytes_in = {}
+
+    def merge(self, other):
+        for key, value in list(other.counters.items()):
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, histogram in list(other.histograms.items()):
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].merge(histogram)
+        for key, value in list(other.bytes_in.items()):
+            self.bytes_in[key] = self.bytes_in.get(key, 0) + value
+
+
+class Metrics(object):
+    """The dispatch metrics of a NMEAServer. Recording only touches the
+    :class:`Recorder` of the calling thread; :meth:`snapshot` merges them.
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._recorders = []
+        # What the recorders of finished threads recorded.
+        self._retired = Recorder()
+
+    def recorder(self):
+        """Returns the :class:`Recorder` of the calling thread."""
+        try:
+            return self._local.recorder
+        except AttributeError:
+            recorder = Recorder(threading.current_thread())
+            with self._lock:
+                self._recorders.append(recorder)
+            self._local.recorder = recorder
+            return recorder
+
+    def count(self, name, sentence_id=None):
+        """Increments a counter, one of :data:`COUNTERS`."""
+        counters = self.recorder().counters
+        key = (name, sentence_id)
+        counters[key] = counters.get(key, 0) + 1
+
+    def dispatched(self, sentence_id, stamps, unknown=False):
+        """Records a dispatched sentence from the timestamps taken before
+        each of the :data:`STAGES` and after the last one."""
+        recorder = self.recorder()
+        counters = recorder.counters
+        key = ('messages', sentence_id)
+        counters[key] = counters.get(key, 0) + 1
+        if unknown:
+            key = ('unknown', sentence_id)
+            counters[key] = counters.get(key, 0) + 1
+        histograms = recorder.histograms
+        for stage, start, end in zip(STAGES, stamps, stamps[1:]):
+            key = (sentence_id, stage)
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = Histogram()
+            histogram.record(end - start)
+
+    def received(self, connection, size):
+        """Counts bytes received on a connection."""
+        bytes_in = self.recorder().bytes_in
+        bytes_in[connection] = bytes_in.get(connection, 0) + size
+
+    def closed(self, connection):
+        """Forgets the bytes received on a connection, from the thread that
+        received them."""
+        self.recorder().bytes_in.pop(connection, None)
+
+    def merged(self):
+        """Returns a :class:`Recorder` merging those of every thread."""
+        merged = Recorder()
+        with self._lock:
+            alive = []
+            for recorder in self._recorders:
+                if recorder.thread.is_alive():
+                    alive.append(recorder)
+                else:
+                    self._retired.merge(recorder)
+            self._recorders = alive
+            merged.merge(self._retired)
+        for recorder in alive:
+            merged.merge(recorder)
+        return merged
+
+    def snapshot(self, others=()):
+        """Returns a dict of the uptime, the totals and rates per second of
+        the :data:`COUNTERS`, the counters and stage latency summaries of
+        each sentence_id, and the bytes received by connection. The others
+        are recorders to merge too, such as those of other processes."""
+        merged = self.merged()
+        for other in others:
+            merged.merge(other)
+        uptime = time.time() - self.started
+        totals = dict((name, 0) for name in COUNTERS)
+        sentences = {}
+        for (name, sentence_id), value in merged.counters.items():
+            totals[name] += value
+            if sentence_id is not None:
+                entry = sentences.setdefault(sentence_id, _entry())
+                entry[name] += value
+        for (sentence_id, stage), histogram in merged.histograms.items():
+            entry = sentences.setdefault(sentence_id, _entry())
+            entry['stages'][stage] = histogram.summary()
+        return {
+            'uptime': uptime,
+            'totals': totals,
+            'rates': dict((name, value / uptime if uptime else 0.0)
+                          for name, value in totals.items()),
+            'sentences': sentences,
+            'connections': dict(
+                (connection, {'bytes_in': size})
+                for connection, size in merged.bytes_in.items()),
+        }
+
+    def reset(self):
+        """Forgets everything recorded so far."""
+        with self._lock:
+            self.started = time.time()
+            self._retired = Recorder()
+            for recorder in self._recorders:
+                recorder.counters.clear()
+                recorder.histograms.clear()
+                recorder.bytes_in.clear()
+
+
+def _entry():
+    entry = dict((name, 0) for name in COUNTERS)
+    entry['stages'] = {}
+    return entry
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def prometheus(snapshot):
+    """Renders a snapshot in the Prometheus text exposition format."""
+    lines = []
+    for name in COUNTERS:
+        metric = 'nmeaserver_{}_total'.format(name)
+        lines.append('# TYPE {} counter'.format(metric))
+        lines.append('{} {}'.format(metric, snapshot['totals'][name]))
+        for sentence_id, entry in sorted(snapshot['sentences'].items()):
+            lines.append('{}{{sentence_id="{}"}} {}'.format(
+                metric, _label(sentence_id), entry[name]))
+    metric = 'nmeaserver_dispatch_seconds'
+    lines.append('# TYPE {} summary'.format(metric))
+    for sentence_id, entry in sorted(snapshot['sentences'].items()):
+        for stage, summary in sorted(entry['stages'].items()):
+            labels = 'sentence_id="{}",stage="{}"'.format(
+                _label(sentence_id), stage)
+            for quantile, key in (('0.5', 'p50'), ('0.99', 'p99'),
+                                  ('0.999', 'p999')):
+                value = summary[key]
+                lines.append('{}{{{},quantile="{}"}} {!r}'.format(
+                    metric, labels, quantile, value))
+            lines.append('{}_sum{{{}}} {!r}'.format(
+                metric, labels, summary['sum']))
+            lines.append('{}_count{{{}}} {}'.format(
+                metric, labels, summary['count']))
+    for direction in ('in', 'out'):
+        metric = 'nmeaserver_connection_bytes_{}_total'.format(direction)
+        lines.append('# TYPE {} counter'.format(metric))
+        for connection, entry in sorted(snapshot['connections'].items()):
+            lines.append('{}{{connection="{}"}} {}'.format(
+                metric, _label(connection),
+                entry.get('bytes_' + direction, 0)))
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsEndpoint(object):
+    """Serves the metrics of a NMEAServer in the Prometheus text format on
+    http://host:port/metrics from a daemon thread.
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, nmeaserver, port, host='127.0.0.1'):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = prometheus(nmeaserver.metrics_snapshot()) \
+                    .encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = HTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       name='metrics')
+        self.thread.daemon = True
+
+    @property
+    def server_address(self):
+        return self.httpd.server_address
+
+    def start(self):
+        self.thread.start()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
@@ -0,0 +1,215 @@
+"""Bounded worker pools used by the NMEAServer to run message handlers off
+the connection threads."""
+
+import logging
+import multiprocessing
+import multiprocessing.pool
+import sys
+import threading
+
+logger = logging.getLogger("nmeaserver")
+
+
+def _call(function, args):
+    """Runs function(*args) in a worker and reports how it went as a
+    (succeeded, result_or_exception) tuple, since Python 2 pools lack an
+    error_callback."""
+    try:
+        return True, function(*args)
+    except BaseException as err:
+        return False, err
+
+
+class HandlerPool(object):
+    """A pool of worker threads or processes with a bound on the number of
+    calls queued or running at once. :meth:`submit` blocks once the bound is
+    reached, which pushes back on the connection threads and therefore on
+    the clients.
+
+    With ``kind='process'`` the function, its arguments and its result are
+    pickled: handlers must be module-level functions and any change they make
+    to the connection context is not seen by the server. A call that cannot
+    be pickled fails with its error passed to error_callback.
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, workers, kind='thread', max_pending=None):
+        if workers < 1:
+            raise ValueError('workers must be at least 1')
+        if kind == 'thread':
+            self.pool = multiprocessing.pool.ThreadPool(workers)
+        elif kind == 'process':
+            self.pool = multiprocessing.Pool(workers)
+        else:
+            raise ValueError("kind must be 'thread' or 'process'")
+        self.workers = workers
+        self.kind = kind
+        self.max_pending = max_pending or workers * 64
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.peak_pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.blocked = 0
+        #: The keyed calls replaced by a newer one before they ran.
+        self.superseded = 0
+        # The call waiting, or None, by key of the calls queued or running.
+        self._keyed = {}
+
+    def submit(self, function, args, callback, error_callback, key=None,
+               superseded=None):
+        """Queues function(*args) on the pool then calls callback(result) or
+        error_callback(exception) from the pool's result thread. Blocks while
+        max_pending calls are already queued or running.
+
+        Of the calls submitted with the same key, only one is queued or
+        running at once. A call submitted meanwhile waits, without taking a
+        slot nor blocking, for that one to complete, replacing any call of
+        the key already waiting, which is then passed to superseded() rather
+        than run: a handler falling behind only ever gets the latest one."""
+
+        if key is not None:
+            with self._lock:
+                queued = key in self._keyed
+                if queued:
+                    replaced = self._keyed[key]
+                    self._keyed[key] = (function, args, callback,
+                                        error_callback, superseded)
+                    if replaced is not None:
+                        self.superseded += 1
+                else:
+                    self._keyed[key] = None
+            if queued:
+                if replaced is not None and replaced[4] is not None:
+                    try:
+                        replaced[4]()
+                    except BaseException:
+                        logger.exception("Failed to supersede a pooled "
+                                         "handler call")
+                return
+
+        if not self._slots.acquire(False):
+            with self._lock:
+                self.blocked += 1
+            self._slots.acquire()
+        with self._lock:
+            self.pending += 1
+            self.submitted += 1
+            if self.pending > self.peak_pending:
+                self.peak_pending = self.pending
+        self._apply(function, args, callback, error_callback, key)
+
+    def _apply(self, function, args, callback, error_callback, key):
+        # Queues a call holding a slot, which it releases once completed.
+
+        def done(outcome):
+            self._complete(key)
+            succeeded, result = outcome
+            try:
+                if succeeded:
+                    callback(result)
+                else:
+                    error_callback(result)
+            except BaseException:
+                logger.exception("Failed to complete a pooled handler call")
+
+        def failed(err):
+            # The call never ran, such as when it could not be pickled.
+            self._complete(key)
+            try:
+                error_callback(err)
+            except BaseException:
+                logger.exception("Failed to complete a pooled handler call")
+
+        try:
+            if sys.version_info >= (3,):
+                self.pool.apply_async(_call, (function, args), callback=done,
+                                      error_callback=failed)
+            else:
+                self.pool.apply_async(_call, (function, args), callback=done)
+        except ValueError as err:
+            # The pool is closed.
+            failed(err)
+
+    def _complete(self, key):
+        # Releases the slot of a completed call, or hands it to the call of
+        # the same key waiting, which is queued without blocking.
+        waiting = None
+        with self._lock:
+            self.completed += 1
+            if key is not None:
+                waiting = self._keyed.pop(key)
+                if waiting is not None:
+                    self._keyed[key] = None
+                    self.submitted += 1
+            if waiting is None:
+                self.pending -= 1
+        if waiting is None:
+            self._slots.release()
+        else:
+            self._apply(waiting[0], waiting[1], waiting[2], waiting[3], key)
+
+    def stats(self):
+        """Returns a snapshot of the queue depth counters as a dict."""
+
+        with self._lock:
+            return {'kind': self.kind,
+                    'workers': self.workers,
+                    'max_pending': self.max_pending,
+                    'pending': self.pending,
+                    'peak_pending': self.peak_pending,
+                    'submitted': self.submitted,
+                    'completed': self.completed,
+                    'blocked': self.blocked,
+                    'superseded': self.superseded}
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+class OrderedResponses(object):
+    """Puts the responses of a connection back in the order their requests
+    were received, whatever order the pool completes them in.
+
+    Responses are written from the pool's result thread, shared by every
+    connection, so write must never block: the connection writes them with
+    ``block=False`` and waits for room before submitting more requests."""
+
+    def __init__(self, write):
+        self.write = write
+        self._lock = threading.Condition()
+        self._next = 0
+        self._written = 0
+        self._done = {}
+
+    def reserve(self):
+        """Returns the sequence number of the next request. Only called from
+        the connection thread."""
+
+        seq = self._next
+        self._next += 1
+        return seq
+
+    def complete(self, seq, response):
+        """Records the response, or None, for a sequence number and writes
+        every response that is now in order."""
+
+        with self._lock:
+            self._done[seq] = response
+            while self._written in self._done:
+                response = self._done.pop(self._written)
+                self._written += 1
+                if response is not None:
+                    self.write(response)
+            self._lock.notify_all()
+
+    def wait(self):
+        """Blocks until the response of every sequence number reserved has
+        been written, or skipped for None."""
+
+        with self._lock:
+            while self._written < self._next:
+                self._lock.wait()
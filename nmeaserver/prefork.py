@@ -0,0 +1,160 @@
+"""Pre-forked processes sharing the port of a NMEAServer with SO_REUSEPORT.
+
+A single process runs handlers on about one core, whatever its number of
+connection threads. With ``processes=N`` the NMEAServer forks N processes,
+each running the registered handlers and listening on the same port with
+SO_REUSEPORT, so that the kernel spreads the connections between them. The
+process that called :meth:`NMEAServer.start` supervises them: it shuts them
+down and merges their metrics and stats.
+"""
+
+import logging
+import multiprocessing
+import socket
+import threading
+
+from .metrics import Metrics
+
+logger = logging.getLogger("nmeaserver")
+
+
+def supported():
+    """Whether the platform can fork processes sharing a port."""
+    return hasattr(socket, 'SO_REUSEPORT') and \
+        hasattr(multiprocessing, 'Process') and \
+        _context() is not None
+
+
+def _context():
+    # Handlers are closures, only a forked process inherits them.
+    if not hasattr(multiprocessing, 'get_context'):  # Python 2
+        return multiprocessing
+    try:
+        return multiprocessing.get_context('fork')
+    except ValueError:
+        return None
+
+
+def _serve(nmeaserver, index, port, conn, inherited):
+    # Runs in each forked process, until the supervisor says to stop or dies.
+    # The supervisor's ends of the pipes must be closed to see it die.
+    for other in inherited:
+        other.close()
+    try:
+        nmeaserver.process_index = index
+        nmeaserver.processes = 1
+        nmeaserver.port = port
+        nmeaserver.reuse_port = True
+        nmeaserver.process_group = None
+        nmeaserver.metrics_port = None
+        nmeaserver.profiler = None
+        if nmeaserver.metrics is not None:
+            nmeaserver.metrics = Metrics()
+        nmeaserver.start()
+    except BaseException as err:
+        conn.send(err)
+        return
+    conn.send(None)
+    try:
+        while True:
+            command = conn.recv()
+            if command == 'shutdown':
+                break
+            elif command == 'metrics':
+                conn.send((nmeaserver.metrics.merged(),
+                           nmeaserver._bytes_sent()))
+            elif command == 'stats':
+                conn.send(nmeaserver.stats())
+    except (EOFError, IOError, OSError):
+        logger.warning("Lost the supervisor, shutting down")
+    finally:
+        nmeaserver.shutdown()
+        conn.close()
+
+
+class ProcessGroup(object):
+    """The processes serving the port of a NMEAServer, seen from the process
+    that started them.
+
+    The port is reserved with a socket bound but not listening, which takes
+    no connection, so that port 0 picks one port for every process.
+
+    Each connection is served by a single process for its lifetime, and so
+    is its connection context. Connections from the same client are spread
+    like any others.
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, nmeaserver, processes):
+        if not supported():
+            raise ValueError('processes require SO_REUSEPORT and fork')
+        self.nmeaserver = nmeaserver
+        self.processes = []
+        self._lock = threading.Lock()
+        self.reserved = reserved = socket.socket(socket.AF_INET,
+                                                 socket.SOCK_STREAM)
+        try:
+            reserved.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            reserved.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            reserved.bind((nmeaserver.host, nmeaserver.port))
+        except BaseException:
+            reserved.close()
+            raise
+        port = self.server_address[1]
+        context = _context()
+        try:
+            for index in range(processes):
+                conn, child = context.Pipe()
+                process = context.Process(
+                    target=_serve, args=(
+                        nmeaserver, index, port, child,
+                        [other for _, other in self.processes] + [conn]),
+                    name='nmea-{}'.format(index))
+                process.daemon = True
+                process.start()
+                child.close()
+                self.processes.append((process, conn))
+            for process, conn in self.processes:
+                err = conn.recv()
+                if err is not None:
+                    raise err
+        except BaseException:
+            self.shutdown()
+            raise
+        logger.info('Started {} processes on port {}'.format(processes, port))
+
+    @property
+    def server_address(self):
+        return self.reserved.getsockname()[:2]
+
+    def ask(self, command):
+        """Sends a command to every process and returns their replies."""
+        with self._lock:
+            replies = []
+            for process, conn in self.processes:
+                try:
+                    conn.send(command)
+                    replies.append(conn.recv())
+                except (EOFError, IOError, OSError):
+                    logger.warning("Process {} is gone".format(process.name))
+            return replies
+
+    def shutdown(self, timeout=5):
+        """Has every process shut down, terminating those that do not within
+        timeout seconds."""
+        with self._lock:
+            for process, conn in self.processes:
+                try:
+                    conn.send('shutdown')
+                except (IOError, OSError):
+                    pass
+            for process, conn in self.processes:
+                process.join(timeout)
+                if process.is_alive():
+                    logger.warning("Terminating process " + process.name)
+                    process.terminate()
+                    process.join()
+                conn.close()
+            self.processes = []
+            self.reserved.close()
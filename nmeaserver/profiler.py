@@ -0,0 +1,130 @@
+"""Sampling profiler for the threads of a running NMEAServer.
+
+A :class:`Profiler` samples the Python stacks of the threads whose name
+starts with one of its prefixes, by default the ``client-*`` connection
+threads, the ``stream-*`` response streamers and the ``nmea`` server thread,
+and counts each distinct stack. :meth:`Profiler.collapsed` renders them in
+the collapsed stack format read by flamegraph.pl, speedscope and the like::
+
+    app.start_profiling(interval=0.005)
+    ...
+    with open('nmeaserver.folded', 'w') as output:
+        output.write(app.stop_profiling())
+
+Profiling may also be toggled from outside the process with a signal, see
+:attr:`NMEAServer.profile_signal`.
+"""
+
+import sys
+import threading
+import time
+
+#: The name prefixes of the threads sampled by default.
+THREADS = ('client-', 'stream-', 'nmea')
+
+
+class Profiler(object):
+    """Samples the stacks of some threads from a daemon thread.
+
+    Memory is bounded: stacks are truncated to their ``max_depth`` innermost
+    frames, and once ``max_stacks`` distinct stacks are counted, new ones
+    are counted as ``<thread>;[other]``.
+
+    :param interval: the seconds between samples
+    :param threads: the name prefixes of the threads to sample
+    :param max_stacks: the most distinct stacks counted
+    :param max_depth: the most frames kept in a stack
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, interval=0.01, threads=THREADS, max_stacks=5000,
+                 max_depth=64):
+        self.interval = interval
+        self.threads = tuple(threads)
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        #: The number of times each stack was sampled, by stack.
+        self.stacks = {}
+        #: The number of samples taken, and those counted as [other].
+        self.samples = 0
+        self.dropped = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        """Starts sampling, unless already started."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='profiler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops sampling, keeping what was sampled."""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        if thread is not threading.current_thread():
+            thread.join()
+
+    def reset(self):
+        """Forgets the stacks sampled so far."""
+        self.stacks = {}
+        self.samples = 0
+        self.dropped = 0
+
+    def _label(self, name):
+        # Threads of a kind are aggregated, client-('1.2.3.4', 5) is client.
+        for prefix in self.threads:
+            if name.startswith(prefix):
+                return prefix.rstrip('-')
+        return None
+
+    def sample(self):
+        """Takes one sample of the stack of every profiled thread."""
+        labels = {}
+        for thread in threading.enumerate():
+            label = self._label(thread.name)
+            if label is not None:
+                labels[thread.ident] = label
+        stacks = self.stacks
+        for ident, frame in sys._current_frames().items():
+            label = labels.get(ident)
+            if label is None:
+                continue
+            names = []
+            while frame is not None and len(names) < self.max_depth:
+                code = frame.f_code
+                names.append('{} ({}:{})'.format(
+                    code.co_name, code.co_filename, frame.f_lineno))
+                frame = frame.f_back
+            names.append(label)
+            names.reverse()
+            stack = ';'.join(names)
+            if stack not in stacks and len(stacks) >= self.max_stacks:
+                stack = label + ';[other]'
+                self.dropped += 1
+            stacks[stack] = stacks.get(stack, 0) + 1
+            self.samples += 1
+
+    def _run(self):
+        stop = self._stop
+        while not stop.is_set():
+            started = time.time()
+            self.sample()
+            stop.wait(max(0, self.interval - (time.time() - started)))
+
+    def collapsed(self):
+        """Returns the stacks sampled so far in the collapsed stack format:
+        a line per stack, its frames from the thread down separated by
+        semicolons, then a space and its number of samples."""
+        stacks = list(self.stacks.items())
+        return ''.join('{} {}\n'.format(stack, count)
+                       for stack, count in sorted(stacks))
@@ -0,0 +1,172 @@
+"""Offline replay of recorded NMEA logs through a NMEAServer's handlers.
+
+Each sentence of a log, plain or gzip compressed, is passed straight to
+:meth:`NMEAServer.dispatch` with a synthetic connection context, without any
+socket, either as fast as possible or paced by the time of day of the
+sentences::
+
+    report = replay.replay(app, 'capture.log.gz', speed=10)
+    print(report['rate'], report['handlers']['GPGGA']['p99'])
+"""
+
+import gzip
+import os
+import time
+from array import array
+
+from . import formatter
+
+timer = getattr(time, 'perf_counter', time.time)
+
+_DAY = 24 * 3600
+
+
+try:
+    _PATHS = (str, bytes, unicode)
+except NameError:  # Python 3
+    _PATHS = (str, bytes)
+
+
+def open_log(path):
+    """Opens a log for reading bytes, decompressing it if it is gzip."""
+    with open(path, 'rb') as log:
+        magic = log.read(2)
+    if magic == b'\x1f\x8b':
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def sentence_time(sentence):
+    """Returns the time of day of a sentence in seconds, or None when it has
+    none. Read from the 'time' field of its decoder, see the decoders
+    module."""
+    try:
+        fields = formatter.parse(sentence, False).fields
+        value = getattr(fields, 'time', None) if fields is not None else None
+    except ValueError:
+        return None
+    if value is None:
+        return None
+    return value.hour * 3600 + value.minute * 60 + value.second + \
+        value.microsecond / 1e6
+
+
+def _sentence_id(sentence):
+    dollar = sentence.find(b'$')
+    return sentence[dollar + 1:dollar + 6].upper().decode('latin-1')
+
+
+def _percentile(values, fraction):
+    return values[int(round(fraction * (len(values) - 1)))]
+
+
+class Replay(object):
+    """Replays logs through the handlers of a NMEAServer and measures them.
+
+    The speed sets the pacing: None replays as fast as possible, 1 in real
+    time and N at N times real time, from the time of day of the sentences
+    carrying one. Sentences without a time are replayed right after the
+    previous one.
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, nmeaserver, speed=None, context=None):
+        self.nmeaserver = nmeaserver
+        self.speed = speed
+        self.context = context
+        #: The dispatch latencies in seconds by sentence_id.
+        self.latencies = {}
+        self.sentences = 0
+        self.responses = 0
+        self.seconds = 0.0
+
+    def default_context(self):
+        """Creates the connection context of the replayed sentences."""
+        context = {'client_address': 'replay', 'connection': 'replay'}
+        if self.nmeaserver.connection_context_creator is not None:
+            context = self.nmeaserver.connection_context_creator(context)
+        return context
+
+    def run(self, source):
+        """Replays a log and returns the :meth:`report` of all the runs so far.
+
+        :param source: the path of a plain or gzip log, as str, bytes or
+                       path-like object, or an iterable of sentences as
+                       bytes or str
+        """
+        if self.context is None:
+            self.context = self.default_context()
+        if hasattr(os, 'fspath') and isinstance(source, os.PathLike):
+            source = os.fspath(source)
+        if isinstance(source, _PATHS):
+            with open_log(source) as log:
+                self._replay(log)
+        else:
+            self._replay(source)
+        return self.report()
+
+    def _replay(self, lines):
+        dispatch = self.nmeaserver.dispatch
+        context = self.context
+        latencies = self.latencies
+        speed = self.speed
+        first = start = last = None
+        started = timer()
+        for line in lines:
+            if not isinstance(line, bytes):
+                line = line.encode('latin-1')
+            line = line.strip()
+            if not line:
+                continue
+            if speed:
+                now = sentence_time(line)
+                if now is not None:
+                    if first is None:
+                        first, start = now, timer()
+                    elif now < last - _DAY / 2:
+                        # Past midnight.
+                        first -= _DAY
+                    last = now
+                    delay = start + (now - first) / speed - timer()
+                    if delay > 0:
+                        time.sleep(delay)
+            before = timer()
+            response = dispatch(line, context)
+            latency = timer() - before
+            sentence_id = _sentence_id(line)
+            if sentence_id not in latencies:
+                latencies[sentence_id] = array('d')
+            latencies[sentence_id].append(latency)
+            self.sentences += 1
+            if response is not None:
+                self.responses += 1
+        self.seconds += timer() - started
+
+    def report(self):
+        """Returns a dict of the number of sentences and responses, the time
+        spent and the sentences/sec rate, and the count, mean, p50, p99 and
+        max dispatch latency in seconds of each sentence_id."""
+        handlers = {}
+        for sentence_id, latencies in self.latencies.items():
+            values = sorted(latencies)
+            handlers[sentence_id] = {
+                'count': len(values),
+                'mean': sum(values) / len(values),
+                'p50': _percentile(values, 0.5),
+                'p99': _percentile(values, 0.99),
+                'max': values[-1],
+            }
+        return {
+            'sentences': self.sentences,
+            'responses': self.responses,
+            'seconds': self.seconds,
+            'rate': self.sentences / self.seconds if self.seconds else 0.0,
+            'handlers': handlers,
+        }
+
+
+def replay(nmeaserver, source, speed=None, context=None):
+    """Replays a log through the handlers of a NMEAServer and returns the
+    report of :meth:`Replay.run`."""
+    return Replay(nmeaserver, speed, context).run(source)
@@ -0,0 +1,269 @@
+"""Resolution of sentence IDs to the message handler answering them, and
+early rejection of the sentences not wanted.
+
+Handlers are registered for exact sentence IDs, such as 'GPGGA', or for
+patterns where '*' stands for any one character, so that 'GP***' matches
+every sentence of the GP talker, and where a lone leading '*' stands for
+any talker, so that '*GGA' matches GPGGA, GNGGA and so on::
+
+    @app.message('*GGA')
+    def fix(context, message):
+        ...
+
+    @app.message('GNGGA', priority=1)
+    def gnss_fix(context, message):
+        ...
+
+A :class:`SentenceFilter` drops the sentences whose address field its
+allow and deny lists of IDs or patterns reject, before they are parsed::
+
+    app.add_sentence_filter(allow=['*GGA', '*RMC', 'RB***'])
+"""
+
+import re
+import threading
+
+#: The character standing for any one character of a sentence ID.
+WILDCARD = '*'
+
+
+def is_pattern(message_id):
+    """Returns whether a message ID holds wildcards."""
+    return WILDCARD in message_id
+
+
+def address(raw_message):
+    """Returns the 5 characters of the address field of a raw sentence, as
+    str or bytes like the sentence, without decoding or parsing it, or None
+    when it holds no '$'."""
+
+    if isinstance(raw_message, str):
+        start = raw_message.find('$') + 1
+    elif isinstance(raw_message, (bytes, bytearray)):
+        start = raw_message.find(b'$') + 1
+    else:
+        return None
+    if not start:
+        return None
+    field = raw_message[start:start + 5]
+    if type(field) is bytearray:
+        return bytes(field)
+    return field
+
+
+def _compile(pattern):
+    if pattern.startswith(WILDCARD) and not pattern.startswith(WILDCARD * 2):
+        prefix, pattern = '.+', pattern[1:]
+    else:
+        prefix = ''
+    return re.compile(prefix + ''.join(
+        '.' if char == WILDCARD else re.escape(char) for char in pattern) +
+        r'\Z')
+
+
+class HandlerTable(dict):
+    """The dict of handlers by sentence ID or pattern of a NMEAServer, which
+    counts the changes made to it so that the :class:`Router` compiled from
+    it is compiled again after any of them.
+
+    .. versionadded:: 0.2.0
+    """
+
+    #: The number of changes made to the dict.
+    version = 0
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self.version += 1
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self.version += 1
+
+    def clear(self):
+        dict.clear(self)
+        self.version += 1
+
+    def pop(self, *args):
+        try:
+            return dict.pop(self, *args)
+        finally:
+            self.version += 1
+
+    def popitem(self):
+        try:
+            return dict.popitem(self)
+        finally:
+            self.version += 1
+
+    def setdefault(self, key, default=None):
+        try:
+            return dict.setdefault(self, key, default)
+        finally:
+            self.version += 1
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self.version += 1
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+
+class Router(object):
+    """A table resolving sentence IDs to their handler, compiled once from a
+    dict of handlers by sentence ID or pattern and not changed afterwards.
+
+    The handler with the highest priority among those whose ID or pattern
+    matches answers a sentence. Between equal priorities the most specific
+    wins, the one with the most characters that are not wildcards, so that
+    an exact ID wins over the patterns matching it, then the one registered
+    first. A handler registered as None for an exact ID leaves it unknown
+    even when a pattern matches it.
+
+    Each sentence ID is resolved once then looked up in a cache, misses
+    included, so that a sentence nobody handles costs a dict lookup and no
+    exception.
+
+    :param handlers: the handler functions by sentence ID or pattern, a
+                     :class:`HandlerTable` or any dict
+    :param missing: the handler of the sentences no ID or pattern matches
+    :param priorities: the priority of some IDs or patterns, 0 by default
+    :param cache_size: the most sentence IDs cached, all forgotten at once
+                       beyond, which bounds the memory a feed sending
+                       garbage IDs takes
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, handlers, missing=None, priorities=None,
+                 cache_size=4096):
+        #: The dict compiled and its version then, to tell when it changed.
+        #: Read first, so that a change made while compiling is not missed.
+        self.version = getattr(handlers, 'version', None)
+        self.handlers = handlers
+        self.missing = missing
+        self.cache_size = cache_size
+        priorities = priorities or {}
+        ranked = []
+        for order, (message_id, handler) in enumerate(handlers.items()):
+            specificity = len(message_id) - message_id.count(WILDCARD)
+            key = (-priorities.get(message_id, 0), -specificity, order)
+            if is_pattern(message_id):
+                ranked.append((key, _compile(message_id).match, None,
+                               handler))
+            else:
+                ranked.append((key, None, message_id, handler))
+        ranked.sort(key=lambda entry: entry[0])
+        self._routes = tuple(entry[1:] for entry in ranked)
+        self._cache = {}
+
+    def resolve(self, sentence_id):
+        """Returns the handler of a sentence ID, and whether it is unknown
+        and therefore answered by the missing handler."""
+
+        route = self._cache.get(sentence_id)
+        if route is None:
+            route = self._resolve(sentence_id)
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[sentence_id] = route
+        return route
+
+    def _resolve(self, sentence_id):
+        for match, message_id, handler in self._routes:
+            if match is None:
+                if message_id != sentence_id:
+                    continue
+            elif match(sentence_id) is None:
+                continue
+            if handler is None:
+                break
+            return handler, False
+        return self.missing, True
+
+    def __len__(self):
+        return len(self._routes)
+
+
+class SentenceFilter(object):
+    """Rejects sentences from the 5 characters of their address field, read
+    from the raw sentence as received, before it is decoded, parsed or its
+    checksum checked.
+
+    A sentence is accepted when it matches one of the ``allow`` IDs or
+    patterns, if any, and none of the ``deny`` ones. The verdict on each
+    address is cached. Lines without a '$' are not sentences and are always
+    accepted, to be answered by the bad checksum handler as before.
+
+    :param allow: the IDs or patterns to accept, all by default
+    :param deny: the IDs or patterns to reject
+    :param cache_size: the most addresses cached, all forgotten at once
+                       beyond
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, allow=None, deny=None, cache_size=4096):
+        self.allow = None if allow is None else tuple(allow)
+        self.deny = tuple(deny or ())
+        self.cache_size = cache_size
+        self._allow = None if allow is None else \
+            tuple(_matcher(message_id) for message_id in allow)
+        self._deny = tuple(_matcher(message_id) for message_id in self.deny)
+        self._cache = {}
+        self._lock = threading.Lock()
+        #: The sentences rejected, by address.
+        self.rejected = {}
+
+    def accepts(self, raw_message):
+        """Returns whether a raw sentence, as str or bytes, is accepted,
+        counting it in :attr:`rejected` otherwise."""
+
+        field = address(raw_message)
+        if field is None:
+            return True
+        verdict = self.matches(field)
+        if not verdict:
+            if not isinstance(field, str):
+                field = field.decode('latin-1')
+            with self._lock:
+                rejected = self.rejected
+                rejected[field] = rejected.get(field, 0) + 1
+        return verdict
+
+    def matches(self, field):
+        """Returns whether the allow and deny lists accept an address field,
+        as returned by :func:`address`, without counting it."""
+
+        verdict = self._cache.get(field)
+        if verdict is None:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            verdict = self._cache[field] = self._judge(field)
+        return verdict
+
+    def _judge(self, address):
+        if not isinstance(address, str):
+            address = address.decode('latin-1')
+        if self._allow is not None and \
+                not any(match(address) for match in self._allow):
+            return False
+        return not any(match(address) for match in self._deny)
+
+    def stats(self):
+        with self._lock:
+            rejected = dict(self.rejected)
+        return {
+            'allow': self.allow,
+            'deny': self.deny,
+            'rejected': rejected,
+        }
+
+
+def _matcher(message_id):
+    # Returns a function telling whether an address matches message_id.
+    if is_pattern(message_id):
+        return _compile(message_id).match
+    return message_id.__eq__
@@ -1,15 +1,44 @@
 import threading
-import SocketServer
-import formatter
 import logging
 import signal
 import select
+import socket
+import os
 import time
+try:
+    import SocketServer
+except ImportError:  # Python 3
+    import socketserver as SocketServer
+from . import formatter
+from .conflation import Conflator
+from .framing import LineBuffer
+from .limits import LoadShedder
+from .datagram import DatagramServer
+from .sources import SerialSource
+from .metrics import Metrics, MetricsEndpoint
+from .prefork import ProcessGroup
+from .pool import HandlerPool, OrderedResponses
+from .profiler import Profiler
+from .router import HandlerTable, Router, SentenceFilter
+from .state import StateStore
+from .writer import ConnectionWriter
 
 logger = logging.getLogger("nmeaserver")
 signal.signal(signal.SIGINT, signal.SIG_DFL)
-
-class NMEAServer:
+timer = getattr(time, 'perf_counter', time.time)
+
+if bytes is str:  # Python 2
+    def _to_str(data):
+        if isinstance(data, memoryview):
+            return data.tobytes()
+        return str(data)
+else:
+    def _to_str(data):
+        if isinstance(data, str):
+            return data
+        return str(data, 'latin-1')
+
+class NMEAServer(object):
     def default_error_handler(self, context, err):
         logger.debug("Error detected in default nmeaserver handler", 
                      kwargs={"exc_info": 1})
@@ -32,9 +61,27 @@ class NMEAServer:
         logger.debug(err_msg)
         return formatter.format(self.error_sentence_id + "," + err_msg)
 
-    #: The dictionary of handler functions for well-formed nmea messages.
+    _message_handlers = HandlerTable()
+
+    def _get_message_handlers(self):
+        return self._message_handlers
+
+    def _set_message_handlers(self, handlers):
+        if not isinstance(handlers, HandlerTable):
+            handlers = HandlerTable(handlers)
+        self._message_handlers = handlers
+
+    #: The dictionary of handler functions for well-formed nmea messages. A
+    #: dict assigned to it is copied into a :class:`router.HandlerTable`,
+    #: which tells the router of any change: change the handlers through
+    #: this attribute, not through the dict assigned.
     #: .. versionadded:: 1.0
-    message_handlers = {}
+    message_handlers = property(_get_message_handlers, _set_message_handlers)
+
+    #: The priority of the message IDs or patterns registered with one, see
+    #: the router module.
+    #: .. versionadded:: 0.2.0
+    handler_priorities = None
 
     #: The handler to be called when a message with an unknown messageId is
     #: received.
@@ -60,6 +107,13 @@ class NMEAServer:
     #: .. versionadded:: 1.0
     bad_checksum_message_handler = default_bad_checksum
 
+    #: An optional :class:`router.SentenceFilter` dropping unwanted sentences
+    #: before they are parsed, added with :meth:`add_sentence_filter`. A
+    #: connection context may hold its own under 'sentence_filter', which
+    #: is used instead.
+    #: .. versionadded:: 0.2.0
+    sentence_filter = None
+
     #: An optional function that creates a connection-scoped dictionary that
     # represents the 'context' of that connection.
     #: .. versionadded:: 1.0
@@ -85,19 +139,200 @@ class NMEAServer:
 
     #: The thread instance running this server
     server_thread = None
+
+    #: A (read_fd, write_fd) self-pipe used to wake up the connection threads
+    #: blocked waiting for data when the server is shutdown. Each start has
+    #: its own, closed once its last connection thread exited.
+    #: .. versionadded:: 0.2.0
+    wakeup_pipe = None
     
     error_sentence_id = 'TXERR'
 
+    #: The number of workers message handlers are run on. When 0, handlers
+    #: are run inline by the connection threads.
+    #: .. versionadded:: 0.2.0
+    workers = 0
+
+    #: Whether the workers are 'thread' or 'process' workers.
+    #: .. versionadded:: 0.2.0
+    worker_type = 'thread'
+
+    #: The maximum number of handler calls queued or running on the workers
+    #: before connection threads stop reading. Defaults to 64 per worker.
+    #: .. versionadded:: 0.2.0
+    max_pending = None
+
+    #: The :class:`HandlerPool` running the handlers when workers is not 0.
+    #: .. versionadded:: 0.2.0
+    handler_pool = None
+
+    #: How long in seconds the sentences written to a connection may be held
+    #: to be coalesced with the following ones. Responses are always sent once
+    #: all received sentences are handled. 0 sends sentences immediately.
+    #: .. versionadded:: 0.2.0
+    flush_delay = 0
+
+    #: The number of pending bytes of a connection that are sent without
+    #: waiting for the flush_delay.
+    #: .. versionadded:: 0.2.0
+    flush_size = 65536
+
+    #: Whether to set TCP_NODELAY on connections, disabling Nagle's algorithm
+    #: since writes are already coalesced. None keeps the system default.
+    #: .. versionadded:: 0.2.0
+    tcp_nodelay = None
+
+    #: Whether to set TCP_CORK on connections, where supported, so that only
+    #: full segments are sent. Partial segments are held for up to 200 ms,
+    #: which suits high-rate streams rather than request/response traffic.
+    #: .. versionadded:: 0.2.0
+    tcp_cork = False
+
+    #: The maximum number of bytes pending to be sent on a connection whose
+    #: client reads slower than it is written to. None is unbounded.
+    #: .. versionadded:: 0.2.0
+    max_backlog = None
+
+    #: What writing to a connection whose backlog is full does: 'block' until
+    #: there is room or 'drop_oldest' pending sentences.
+    #: .. versionadded:: 0.2.0
+    overflow = 'block'
+
+    #: The :class:`ConnectionWriter` of each open connection, by client
+    #: address.
+    #: .. versionadded:: 0.2.0
+    connections = None
+
+    #: The client addresses of the connections subscribed to each topic
+    #: published to with :meth:`publish`.
+    #: .. versionadded:: 0.2.0
+    subscriptions = None
+
+    #: The :class:`metrics.Metrics` recorded by :meth:`dispatch`, None when
+    #: disabled, which is the default, so that dispatching costs nothing
+    #: more than a check.
+    #: .. versionadded:: 0.2.0
+    metrics = None
+
+    #: The port on the loopback interface serving the metrics in the
+    #: Prometheus text format once started. None serves none.
+    #: .. versionadded:: 0.2.0
+    metrics_port = None
+    metrics_endpoint = None
+
+    #: The :class:`profiler.Profiler` sampling the connection, streamer and
+    #: server threads, once :meth:`start_profiling` was called.
+    #: .. versionadded:: 0.2.0
+    profiler = None
+
+    #: A signal, such as ``signal.SIGUSR2``, toggling profiling on and off.
+    #: When it turns profiling off the collapsed stacks are written to
+    #: :attr:`profile_path`. Only installed when started from the main
+    #: thread.
+    #: .. versionadded:: 0.2.0
+    profile_signal = None
+
+    #: Where the collapsed stacks are written when profiling is turned off
+    #: by :attr:`profile_signal`. None writes nmeaserver-<pid>.folded in the
+    #: current directory.
+    #: .. versionadded:: 0.2.0
+    profile_path = None
+
+    #: The number of processes serving the port, see the prefork module.
+    #: Above 1, :meth:`start` forks them and this process only supervises.
+    #: .. versionadded:: 0.2.0
+    processes = 1
+
+    #: Whether to listen with SO_REUSEPORT, as the forked processes do.
+    #: .. versionadded:: 0.2.0
+    reuse_port = False
+
+    #: The :class:`prefork.ProcessGroup` of the forked processes, in the
+    #: process that started them, and the index of each forked process in
+    #: that process.
+    #: .. versionadded:: 0.2.0
+    process_group = None
+    process_index = None
+
+    #: The :class:`sources.InputSource` dispatching sentences read from
+    #: elsewhere than the TCP connections, added with :meth:`add_source`,
+    #: :meth:`listen_udp` or :meth:`read_serial`.
+    #: .. versionadded:: 0.2.0
+    sources = None
+
+    #: The most connections served at once. Those accepted beyond are closed
+    #: straight away and counted in :attr:`rejected_connections`.
+    #: .. versionadded:: 0.2.0
+    max_connections = None
+
+    #: The number of connections closed for exceeding :attr:`max_connections`.
+    #: .. versionadded:: 0.2.0
+    rejected_connections = 0
+
+    #: The :class:`limits.LoadShedder` limiting the rate of the sentences
+    #: received on the connections, added with :meth:`add_rate_limit`.
+    #: .. versionadded:: 0.2.0
+    rate_limits = None
+
+    #: The :class:`conflation.Conflator` of the sentences of which only the
+    #: latest value matters, given as ``conflate``.
+    #: .. versionadded:: 0.2.0
+    conflation = None
+
+    #: The :class:`state.StateStore` shared by the handlers of every
+    #: connection, read without locks.
+    #: .. versionadded:: 0.2.0
+    state = None
+
     def __init__(self, host='', 
                  port=9000, 
                  debug=False, 
-                 error_sentence_id='TXERR'):
+                 error_sentence_id='TXERR',
+                 workers=0,
+                 worker_type='thread',
+                 max_pending=None,
+                 flush_delay=0,
+                 flush_size=65536,
+                 tcp_nodelay=None,
+                 tcp_cork=False,
+                 max_backlog=None,
+                 overflow='block',
+                 metrics=False,
+                 metrics_port=None,
+                 profile_signal=None,
+                 profile_path=None,
+                 processes=1,
+                 max_connections=None,
+                 conflate=None):
         self.host = host
         self.port = port
         self.debug = debug
         self.error_sentence_id = error_sentence_id
-
-    def message(self, message_id):
+        self.workers = workers
+        self.worker_type = worker_type
+        self.max_pending = max_pending
+        self.flush_delay = flush_delay
+        self.flush_size = flush_size
+        self.tcp_nodelay = tcp_nodelay
+        self.tcp_cork = tcp_cork
+        self.max_backlog = max_backlog
+        self.overflow = overflow
+        self.connections = {}
+        self.subscriptions = {}
+        self.connections_lock = threading.Lock()
+        self.metrics = Metrics() if metrics else None
+        self.metrics_port = metrics_port
+        self.profile_signal = profile_signal
+        self.profile_path = profile_path
+        self.processes = processes
+        self.max_connections = max_connections
+        self.conflation = Conflator(conflate) if conflate else None
+        self.state = StateStore()
+        self.sources = []
+        self.handler_priorities = {}
+        self._router = None
+
+    def message(self, message_id, priority=0):
         """A decorator that registers a function for handling a given message
         ID. Functionally identical to :meth:`add_message_handler` but offering
         a decorator wrapper::
@@ -106,15 +341,18 @@ class NMEAServer:
             def HRB(context, message):
                 return nmea.format("$TXHRB,Success")
 
-        :param message_id: the ID as string of the message to handle
+        :param message_id: the ID as string of the message to handle, or a
+                           pattern such as '*GGA' or 'GP***'
+        :param priority: the priority of the handler over the others
+                         matching the same messages
         """
 
         def decorator(f):
-            self.add_message_handler(message_id, f)
+            self.add_message_handler(message_id, f, priority)
             return f
         return decorator
 
-    def add_message_handler(self, message_id, handler_func=None):
+    def add_message_handler(self, message_id, handler_func=None, priority=0):
         """Connects a handler function to a message_id.  Functionally identical
         to :meth:`message` decorator.  If a handler_func is provided it will be
         registered for the message_id.
@@ -131,15 +369,28 @@ class NMEAServer:
                 return nmea.format("$TXHRB,Success")
             app.add_message_handler('RBHRB', HRB)
 
-        :param message_id: the ID as string of the message to handle
+        The message_id may be a pattern where '*' stands for any character,
+        such as 'GP***', or a lone leading '*' for any talker, such as
+        '*GGA'. Among the handlers matching a message, the one with the
+        highest priority answers it, then the most specific.
+
+        :param message_id: the ID as string of the message to handle, or a
+                           pattern
         :param handler_func: the function to call when a message is received
                              for the specific message_id
+        :param priority: the priority of the handler over the others
+                         matching the same messages
         """
 
         if '$' in message_id:
                 raise AssertionError("message_id should not contain a '$'")
         if message_id is not None:
             self.message_handlers[message_id] = handler_func
+            if priority:
+                self.handler_priorities[message_id] = priority
+            else:
+                self.handler_priorities.pop(message_id, None)
+            self._router = None
         else:
             raise AssertionError("Cannot bind a handler find to 'None'")
 
@@ -287,6 +538,7 @@ class NMEAServer:
         """
 
         self.missing_handler = function
+        self._router = None
 
     def context_creator(self):
         """A decorator that registers a function for creating a connection
@@ -414,6 +666,76 @@ class NMEAServer:
 
         self.error_handler = function
 
+    def add_sentence_filter(self, allow=None, deny=None):
+        """Drops the sentences whose ID is not allowed, or is denied, before
+        they are parsed, without any response. Passing neither removes the
+        existing filter.
+
+        For example::
+
+            app.add_sentence_filter(allow=['*GGA', 'RB***'], deny=['RBDBG'])
+
+        A connection context creator may give a connection its own filter::
+
+            @NMEAServer.context_creator()
+            def context(default_context):
+                default_context['sentence_filter'] = SentenceFilter(
+                    deny=['GPGSV'])
+                return default_context
+
+        :param allow: the IDs or patterns, such as '*GGA', to accept, all by
+                      default
+        :param deny: the IDs or patterns to drop
+        :returns: the :class:`router.SentenceFilter`
+
+        .. versionadded:: 0.2.0
+        """
+
+        if allow is None and deny is None:
+            self.sentence_filter = None
+        else:
+            self.sentence_filter = SentenceFilter(allow, deny)
+        return self.sentence_filter
+
+    def add_rate_limit(self, sentences=None, bytes=None,
+                       connection_sentences=None, connection_bytes=None,
+                       policy='drop_newest', max_queue=256, critical=None,
+                       burst=1.0):
+        """Limits the sentences and bytes per second dispatched from all the
+        connections together and from each one, shedding those beyond as
+        the policy says. Applies to the connections made afterwards. Passing
+        no limit removes the existing ones.
+
+        For example::
+
+            app.add_rate_limit(sentences=20000, connection_sentences=500,
+                               policy='latest', critical=['*HRB'])
+
+        :param sentences: the sentences per second of all connections
+        :param bytes: the bytes per second of all connections
+        :param connection_sentences: the sentences per second of each
+                                     connection
+        :param connection_bytes: the bytes per second of each connection
+        :param policy: 'drop_newest', 'drop_oldest', 'latest' or
+                       'disconnect', see the limits module
+        :param max_queue: the most sentences queued by each connection with
+                          'drop_oldest' or 'latest'
+        :param critical: the IDs or patterns of the sentences never limited
+        :param burst: the seconds worth of sentences let through at once
+        :returns: the :class:`limits.LoadShedder`
+
+        .. versionadded:: 0.2.0
+        """
+
+        if sentences is None and bytes is None and \
+                connection_sentences is None and connection_bytes is None:
+            self.rate_limits = None
+        else:
+            self.rate_limits = LoadShedder(
+                sentences, bytes, connection_sentences, connection_bytes,
+                policy, max_queue, critical, burst)
+        return self.rate_limits
+
     def response_stream(self):
         """A decorator that registers a function for used to generate a 
         stream of responses without a request. This will only be called
@@ -435,8 +757,10 @@ class NMEAServer:
         """Registers a function for used to generate a stream of responses
         without a request. This will only be called once for each new
         connection. Use the value context['stream'] to loop over to detect
-        when to stop streaming messages. Functionally identical to 
-        :meth:`response_stream` decorator.
+        when to stop streaming messages. The function receives the
+        connection's :class:`ConnectionWriter`, shared with the responses to
+        requests: each sentence written is sent whole and in order.
+        Functionally identical to :meth:`response_stream` decorator.
 
         For example::
 
@@ -459,52 +783,469 @@ class NMEAServer:
 
         self.response_streamer = function
 
+    def subscribe(self, connection_context, topic):
+        """Subscribes the connection of a context to the sentences published
+        on a topic with :meth:`publish`. May be called from the context
+        creator, a message handler not running on a process worker, or a
+        response streamer::
+
+            @app.message('RXSUB')
+            def subscribe(context, message):
+                app.subscribe(context, message['data'][0])
+                return formatter.format('TXSUB,OK')
+
+        :param connection_context: the context of the connection
+        :param topic: the topic to subscribe to
+        """
+
+        with self.connections_lock:
+            self.subscriptions.setdefault(topic, set()).add(
+                connection_context['connection'])
+
+    def unsubscribe(self, connection_context, topic):
+        """Stops sending the sentences published on a topic to the connection
+        of a context.
+
+        :param connection_context: the context of the connection
+        :param topic: the topic to unsubscribe from
+        """
+
+        with self.connections_lock:
+            subscribers = self.subscriptions.get(topic)
+            if subscribers is not None:
+                subscribers.discard(connection_context['connection'])
+                if not subscribers:
+                    del self.subscriptions[topic]
+
+    def publish(self, sentence, topic=None):
+        """Sends a sentence to every connection subscribed to a topic, or to
+        every connection when the topic is None, without a streamer thread
+        per connection. The sentence is formatted, checksummed and encoded
+        once and the same bytes are queued on each connection's writer::
+
+            while True:
+                app.publish('GPHDT,{:.1f},T'.format(heading()), 'nav')
+                time.sleep(0.05)
+
+        Publishing blocks on a slow client whose backlog is full unless the
+        server's overflow policy is 'drop_oldest'.
+
+        :param sentence: the sentence as str, with or without its '$' and
+                         checksum, or as ready to send bytes
+        :param topic: the topic to publish on, None for all connections
+        :returns: the number of connections the sentence was queued on
+        """
+
+        data = sentence
+        if not isinstance(data, bytes) or bytes is str:
+            data = formatter.format(data)
+        if not isinstance(data, bytes):
+            data = data.encode('latin-1')
+        if not data.endswith(b"\n"):
+            data = data + b"\n"
+        with self.connections_lock:
+            if topic is None:
+                writers = list(self.connections.values())
+            else:
+                writers = [self.connections[address] for address in
+                           self.subscriptions.get(topic, ())
+                           if address in self.connections]
+        sent = 0
+        for writer in writers:
+            try:
+                writer.write(data)
+                sent += 1
+            except IOError:
+                logger.debug("Could not publish, connection closed")
+        return sent
+
+    def _add_connection(self, address, writer):
+        with self.connections_lock:
+            self.connections[address] = writer
+
+    def _remove_connection(self, address):
+        with self.connections_lock:
+            self.connections.pop(address, None)
+            for topic, subscribers in list(self.subscriptions.items()):
+                subscribers.discard(address)
+                if not subscribers:
+                    del self.subscriptions[topic]
+
+    @property
+    def router(self):
+        """The :class:`router.Router` compiled from :attr:`message_handlers`,
+        compiled again once handlers are added, replaced or removed or the
+        dict is replaced.
+
+        .. versionadded:: 0.2.0
+        """
+
+        router = self._router
+        handlers = self.message_handlers
+        if router is None or router.handlers is not handlers \
+                or router.version != handlers.version \
+                or router.missing != self.missing_handler:
+            router = self._router = Router(
+                self.message_handlers, self.missing_handler,
+                self.handler_priorities)
+        return router
+
+    def _rejected(self, raw_message, connection_context):
+        """Returns whether the :attr:`sentence_filter` of the connection, or
+        of the server, drops a raw message."""
+
+        sentence_filter = connection_context.get('sentence_filter',
+                                                 self.sentence_filter)
+        return sentence_filter is not None and \
+            not sentence_filter.accepts(raw_message)
+
+    def _accepted(self, sentences, connection_context):
+        """Returns the list of the raw sentences that the sentence_filter of
+        the connection, or of the server, accepts. Used before the rate
+        limits, so that the sentences dropped take none of their tokens."""
+
+        sentence_filter = connection_context.get('sentence_filter',
+                                                 self.sentence_filter)
+        if sentence_filter is None:
+            return sentences
+        return [sentence for sentence in sentences
+                if sentence_filter.accepts(sentence)]
+
     def dispatch(self, raw_message, connection_context):
-        """Dispatch the messages received on the NMEAServer socket.
+        """Dispatch the messages received on the NMEAServer socket. The
+        raw_message may be a str or bytes, which are only decoded to a str
+        when parsed or when a handler needs them.
         May be extended, do not override."""
 
+        if self._rejected(raw_message, connection_context):
+            return None
+        metrics = self.metrics
+        if metrics is not None:
+            stamps = [timer()]
         if self.message_pre_handler is not None:
             raw_message = self.message_pre_handler(connection_context, 
-                                                   raw_message)
+                                                   _to_str(raw_message))
+        if metrics is not None:
+            stamps.append(timer())
 
+        sentence_id = None
         try:
-            if raw_message == '':
+            if not len(raw_message):
                 raise EOFError("Empty message received. Ending comm")
 
             message = formatter.parse(raw_message)
             sentence_id = message['sentence_id']
+            if metrics is not None:
+                stamps.append(timer())
+            handler, unknown = self.router.resolve(sentence_id)
             response = None
-            try:
-                if self.message_handlers[sentence_id] is not None:
-                    response = self.message_handlers[sentence_id](
-                        connection_context, message)
-                else:
-                    if self.missing_handler is not None:
-                        response = self.missing_handler(
-                            connection_context, message)
-            except KeyError:
-                if self.missing_handler is not None:
-                        response = self.missing_handler(
-                            connection_context, message)
+            if handler is not None:
+                response = handler(connection_context, message)
+            if metrics is not None:
+                stamps.append(timer())
 
             if self.message_post_handler is not None:
                 self.message_post_handler(
                     connection_context, message, response)
             if not response.endswith("\n"):
                 response = response + "\n"
+            if metrics is not None:
+                stamps.append(timer())
+                metrics.dispatched(sentence_id, stamps, unknown)
             return response
         except ValueError:
+            if metrics is not None:
+                # A ValueError raised after the parse is a handler's.
+                if sentence_id is None:
+                    metrics.count('bad_checksum')
+                else:
+                    metrics.count('errors', sentence_id)
             if self.bad_checksum_message_handler is not None:
                 return self.bad_checksum_message_handler(
-                    connection_context, raw_message)
+                    connection_context, _to_str(raw_message))
         except EOFError as err:
             raise
         except BaseException as err:
+            if metrics is not None:
+                metrics.count('errors', sentence_id)
             logger.error("Detected exception: {}".format(str(err)))
             if self.error_handler is not None:
                 self.error_handler(connection_context, err)
         return None
-        
+
+    def dispatch_from_thread(self, raw_message, connection_context):
+        """Dispatch a message received by a thread of its own, such as that
+        of a :class:`sources.InputSource`, like :meth:`dispatch`."""
+
+        return self.dispatch(raw_message, connection_context)
+
+    def dispatch_to_pool(self, raw_message, connection_context, callback):
+        """Dispatch a message like :meth:`dispatch` but run its message
+        handler on the :attr:`handler_pool`. The response, or None, is passed
+        to callback once available. Blocks while the pool is full. The
+        missing_handler runs on the calling thread. With :attr:`conflation`,
+        a sentence waiting for a worker behind one of the same sentence ID
+        and connection is replaced by a newer one, and its callback passed
+        None.
+        May be extended, do not override."""
+
+        if self._rejected(raw_message, connection_context):
+            callback(None)
+            return
+        metrics = self.metrics
+        if metrics is not None:
+            stamps = [timer()]
+        if self.message_pre_handler is not None:
+            raw_message = self.message_pre_handler(connection_context,
+                                                   _to_str(raw_message))
+        if metrics is not None:
+            stamps.append(timer())
+
+        try:
+            if not len(raw_message):
+                raise EOFError("Empty message received. Ending comm")
+
+            message = formatter.parse(raw_message)
+            sentence_id = message['sentence_id']
+            handler, unknown = self.router.resolve(sentence_id)
+        except EOFError:
+            raise
+        except BaseException as err:
+            callback(self._dispatch_failed(raw_message, connection_context,
+                                           err))
+            return
+        if metrics is not None:
+            stamps.append(timer())
+
+        raw_message = message['sentence']
+
+        def done(response):
+            # The handler stage includes the wait for a worker.
+            if metrics is not None:
+                stamps.append(timer())
+            try:
+                if self.message_post_handler is not None:
+                    self.message_post_handler(
+                        connection_context, message, response)
+                if not response.endswith("\n"):
+                    response = response + "\n"
+            except BaseException as err:
+                response = self._dispatch_failed(
+                    raw_message, connection_context, err, sentence_id)
+            else:
+                if metrics is not None:
+                    stamps.append(timer())
+                    metrics.dispatched(sentence_id, stamps, unknown)
+            callback(response)
+
+        def failed(err):
+            callback(self._dispatch_failed(raw_message, connection_context,
+                                           err, sentence_id))
+
+        if unknown:
+            # The missing handler is usually a method of this server, which
+            # cannot be pickled for a process, and answers at once anyway.
+            try:
+                response = None
+                if handler is not None:
+                    response = handler(connection_context, message)
+            except BaseException as err:
+                failed(err)
+            else:
+                done(response)
+            return
+        key = superseded = None
+        conflation = self.conflation
+        if conflation is not None:
+            field = conflation.key(raw_message)
+            if field is not None:
+                # Conflated per connection, while waiting for a worker.
+                key = (id(connection_context), field)
+
+                def superseded():
+                    conflation.count()
+                    callback(None)
+        self.handler_pool.submit(handler, (connection_context, message),
+                                 done, failed, key, superseded)
+
+    def _dispatch_failed(self, raw_message, connection_context, err,
+                         sentence_id=None):
+        """Handles an exception raised while dispatching, like
+        :meth:`dispatch` does, and returns the response to send, if any."""
+
+        if self.metrics is not None:
+            if isinstance(err, ValueError) and sentence_id is None:
+                self.metrics.count('bad_checksum')
+            else:
+                self.metrics.count('errors', sentence_id)
+        if isinstance(err, ValueError):
+            if self.bad_checksum_message_handler is not None:
+                return self.bad_checksum_message_handler(
+                    connection_context, _to_str(raw_message))
+            return None
+        logger.error("Detected exception: {}".format(str(err)))
+        if self.error_handler is not None:
+            self.error_handler(connection_context, err)
+        return None
+
+    def stats(self):
+        """Returns a dict of runtime statistics about this NMEAServer, such as
+        the queue depth of its handler pool and the backlog of each
+        connection. With :attr:`processes`, the stats of each process are
+        listed under 'processes' instead."""
+
+        if self.process_group is not None:
+            return {'processes': self.process_group.ask('stats')}
+        stats = {}
+        if self.handler_pool is not None:
+            stats['handler_pool'] = self.handler_pool.stats()
+        if self.sentence_filter is not None:
+            stats['sentence_filter'] = self.sentence_filter.stats()
+        if self.rate_limits is not None:
+            stats['rate_limits'] = self.rate_limits.stats()
+        if self.conflation is not None:
+            stats['conflation'] = self.conflation.stats()
+        stats['state'] = self.state.stats()
+        if self.max_connections is not None:
+            stats['rejected_connections'] = self.rejected_connections
+        if self.sources:
+            stats['sources'] = dict(
+                (source.name, source.stats()) for source in self.sources)
+        with self.connections_lock:
+            writers = list(self.connections.items())
+        stats['connections'] = dict(
+            (address, writer.backlog()) for address, writer in writers)
+        return stats
+
+    def start_profiling(self, interval=0.01, threads=None, max_stacks=5000):
+        """Starts sampling the stacks of the connection ('client-*'),
+        streamer ('stream-*') and server ('nmea') threads every interval
+        seconds, or of the threads named with the given prefixes. Sampling
+        resumes, adding to the stacks sampled so far, when already started
+        with the same settings.
+
+        :returns: the :class:`profiler.Profiler`"""
+
+        profiler = self.profiler
+        if profiler is None or profiler.interval != interval or \
+                profiler.max_stacks != max_stacks or \
+                (threads is not None and tuple(threads) != profiler.threads):
+            if profiler is not None:
+                profiler.stop()
+            if threads is None:
+                profiler = Profiler(interval, max_stacks=max_stacks)
+            else:
+                profiler = Profiler(interval, threads, max_stacks)
+            self.profiler = profiler
+        profiler.start()
+        return profiler
+
+    def stop_profiling(self, reset=True):
+        """Stops sampling and returns the stacks sampled in the collapsed
+        stack format, to feed to flamegraph.pl or speedscope, or None when
+        profiling was never started. With reset, the next
+        :meth:`start_profiling` starts afresh."""
+
+        profiler = self.profiler
+        if profiler is None:
+            return None
+        profiler.stop()
+        collapsed = profiler.collapsed()
+        if reset:
+            profiler.reset()
+        return collapsed
+
+    def _toggle_profiling(self, signum=None, frame=None):
+        # The profile_signal handler.
+        if self.profiler is None or not self.profiler.running:
+            self.start_profiling()
+            logger.info("Profiling started")
+            return
+        path = self.profile_path or "nmeaserver-{}.folded".format(os.getpid())
+        with open(path, 'w') as output:
+            output.write(self.stop_profiling())
+        logger.info("Profiling stopped, stacks written to " + path)
+
+    def metrics_snapshot(self):
+        """Returns the :meth:`metrics.Metrics.snapshot` of this NMEAServer,
+        with the bytes sent on each open connection, or None when metrics
+        are disabled."""
+
+        if self.metrics is None:
+            return None
+        if self.process_group is not None:
+            recorders = []
+            bytes_sent = {}
+            for recorder, sent in self.process_group.ask('metrics'):
+                recorders.append(recorder)
+                bytes_sent.update(sent)
+            snapshot = self.metrics.snapshot(recorders)
+        else:
+            snapshot = self.metrics.snapshot()
+            bytes_sent = self._bytes_sent()
+        connections = snapshot['connections']
+        for address, sent in bytes_sent.items():
+            entry = connections.setdefault(address, {'bytes_in': 0})
+            entry['bytes_out'] = sent
+        return snapshot
+
+    def listen_udp(self, port, host=None, group=None, interface='0.0.0.0',
+                   respond=False, **options):
+        """Also receives sentences in UDP datagrams on a port, sent to host,
+        this NMEAServer's host by default, or to a multicast group joined on
+        the interface at the given address. They are dispatched through the
+        same handlers, and responses sent back only with respond. Call
+        before :meth:`start`. With :attr:`processes` every process receives
+        on the port, which suits unicast: each process receives its own copy
+        of multicast datagrams.
+
+        :param options: passed on to :class:`datagram.DatagramServer`
+        :returns: the :class:`datagram.DatagramServer`
+
+        Example usage::
+
+            app.listen_udp(10110, group='239.192.0.1')
+        """
+
+        return self.add_source(DatagramServer(
+            self, port, self.host if host is None else host, group,
+            interface, respond, **options))
+
+    def read_serial(self, path, baudrate=4800, respond=False, **options):
+        """Also reads sentences from a serial port, dispatched through the
+        same handlers, and writes the responses back only with respond.
+        Call before :meth:`start`.
+
+        :param options: passed on to :class:`sources.SerialSource`
+        :returns: the :class:`sources.SerialSource`
+
+        Example usage::
+
+            app.read_serial('/dev/ttyUSB0', 38400)
+        """
+
+        return self.add_source(SerialSource(
+            self, path, baudrate, respond=respond, **options))
+
+    def add_source(self, source):
+        """Adds a :class:`sources.InputSource`, started and shut down along
+        with this NMEAServer. Call before :meth:`start`.
+
+        Example usage::
+
+            app.add_source(FdSource(app, sys.stdin))
+        """
+
+        self.sources.append(source)
+        return source
+
+    def _bytes_sent(self):
+        # The bytes sent on each open connection, by address.
+        with self.connections_lock:
+            writers = list(self.connections.items())
+        return dict((address, writer.bytes_sent)
+                    for address, writer in writers)
+
 
     class MyTCPHandler(SocketServer.StreamRequestHandler):
         """The StreamRequestHandler instance to use to create a NMEAServer"""
@@ -512,6 +1253,11 @@ class NMEAServer:
         context = {}
         nmeaserver = None
 
+        #: The size of the receive buffer of each connection, which bounds
+        #: the length of a sentence.
+        #: .. versionadded:: 0.2.0
+        read_size = 65536
+
         def __init__(self, request, client_address,
                      server, NMEAServer_instance):
             if NMEAServer_instance is None:
@@ -521,17 +1267,47 @@ class NMEAServer:
             SocketServer.StreamRequestHandler.__init__(
                 self, request, client_address, server)
 
+        def setup(self):
+            SocketServer.StreamRequestHandler.setup(self)
+            nmeaserver = self.nmeaserver
+            if nmeaserver.tcp_nodelay is not None:
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY,
+                                        int(nmeaserver.tcp_nodelay))
+            if nmeaserver.tcp_cork and hasattr(socket, 'TCP_CORK'):
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 1)
+            self.writer = ConnectionWriter(
+                self.request, nmeaserver.flush_delay, nmeaserver.flush_size,
+                name="write-" + str(self.client_address[0]),
+                max_backlog=nmeaserver.max_backlog,
+                overflow=nmeaserver.overflow,
+                conflator=nmeaserver.conflation)
+            self.address = "{}:{}".format(*self.client_address[:2])
+            self.admission = None
+            if nmeaserver.rate_limits is not None:
+                self.admission = nmeaserver.rate_limits.connection()
+            nmeaserver._add_connection(self.address, self.writer)
+
+        def finish(self):
+            self.nmeaserver._remove_connection(self.address)
+            if self.admission is not None:
+                self.admission.close()
+            if self.nmeaserver.metrics is not None:
+                self.nmeaserver.metrics.closed(self.address)
+            self.writer.close()
+            SocketServer.StreamRequestHandler.finish(self)
+
         def default_context(self):
             """Creates a default connection context dictionary"""
 
             default_context = {}
             default_context['client_address'] = self.client_address[0]
+            default_context['connection'] = self.address
             return default_context
 
         def handle(self):
             """Handles a request and pass it to NMEAServer.dispatch()"""
 
-            context = self.default_context()
+            self.context = context = self.default_context()
             if self.nmeaserver.connection_context_creator is not None:
                 self.context = self.nmeaserver.connection_context_creator(
                     context)
@@ -539,35 +1315,126 @@ class NMEAServer:
             if self.nmeaserver.response_streamer is not None:
                 self.context['stream'] = True
                 t = threading.Thread(
-                                target = self.nmeaserver.response_streamer,
-                                 args = (self.context, self.wfile),
+                                target = self.stream,
                                  name = "stream-"+str(self.client_address[0]))
                 t.daemon = True
                 t.start()
 
+            if self.nmeaserver.handler_pool is not None:
+                responses = OrderedResponses(
+                    lambda response: self.send(response, block=False))
             try:
-                while not self.nmeaserver.shutdown_flag:
-                    poll_obj = select.poll()
-                    poll_obj.register(self.rfile, select.POLLIN)
-                    
-                    poll_result = poll_obj.poll(0)
-                    if poll_result: 
-                        received = self.rfile.readline().strip()
-                        if self.nmeaserver.debug:
-                            logger.debug("< " + received)
-                        response = self.nmeaserver.dispatch(
-                            received, self.context)
-    
-                        if response is not None:
-                            if self.nmeaserver.debug:
-                                logger.debug("> " + response)
-                            self.wfile.write(format(response))
-                            self.wfile.flush()
-                    else:
-                        time.sleep(0.1)
+                for received in self.readlines():
+                    if self.nmeaserver.debug:
+                        logger.debug("< " + _to_str(received))
+                    if self.nmeaserver.handler_pool is not None:
+                        # Pushes back on this client only, once the
+                        # responses it does not read fill its backlog.
+                        self.writer.wait_room()
+                        seq = responses.reserve()
+                        try:
+                            self.nmeaserver.dispatch_to_pool(
+                                received, self.context,
+                                lambda response, seq=seq: responses.complete(
+                                    seq, response))
+                        except BaseException:
+                            responses.complete(seq, None)
+                            raise
+                        continue
+
+                    response = self.nmeaserver.dispatch(
+                        received, self.context)
+                    if response is not None:
+                        self.send(response)
             except BaseException as e:
                 self.context['stream'] = False
                 logger.warn("Connection closing")
+            if self.nmeaserver.handler_pool is not None:
+                # Sends the responses still running before finish() closes
+                # the writer, as when the handlers run inline.
+                responses.wait()
+
+        def stream(self):
+            """Runs the response_streamer of the NMEAServer until it returns
+            or the connection is closed."""
+
+            try:
+                self.nmeaserver.response_streamer(self.context, self.writer)
+            except IOError:
+                if not self.writer.closed:
+                    raise
+                logger.debug("Stopped streaming, connection closed")
+
+        def send(self, response, block=True):
+            """Queues a response to be sent to the client, see
+            :meth:`ConnectionWriter.write`."""
+
+            if self.nmeaserver.debug:
+                logger.debug("> " + response)
+            try:
+                self.writer.write(response, block)
+            except IOError:
+                logger.debug("Could not send response, connection closed")
+
+        def wait_readable(self, timeout=None):
+            """Blocks until the client socket has data to read, until the
+            NMEAServer is shutdown or for at most timeout seconds. Returns
+            False if the server is shutting down and None on timeout."""
+
+            wakeup = self.server.wakeup_pipe[0]
+            readable, _, _ = select.select([self.request, wakeup], [], [],
+                                           timeout)
+            if not readable:
+                return None
+            return wakeup not in readable
+
+        def readlines(self):
+            """Yields each sentence received from the client, stripped, as soon
+            as it arrives, as bytes. An empty line is yielded when the client
+            disconnects. Stops when the NMEAServer is shutdown.
+
+            With :attr:`NMEAServer.rate_limits`, only the sentences its
+            :class:`limits.Admission` lets through are yielded, those it
+            queues once the limits allow, and those the sentence filter
+            rejects are dropped before they take any of the limits."""
+
+            lines = LineBuffer(self.read_size)
+            metrics = self.nmeaserver.metrics
+            admission = self.admission
+            conflation = self.nmeaserver.conflation
+            while not self.nmeaserver.shutdown_flag:
+                # Nothing else to handle for now, send the responses.
+                self.writer.flush()
+                timeout = None if admission is None else admission.delay()
+                readable = self.wait_readable(timeout)
+                if readable is None:
+                    for sentence in admission.ready():
+                        yield sentence
+                    continue
+                if not readable:
+                    return
+                received = lines.recv_into(self.request)
+                if not received:
+                    sentences = lines.flush()
+                    if admission is not None:
+                        sentences = admission.offer(self.nmeaserver._accepted(
+                            sentences, self.context))
+                    for sentence in sentences:
+                        yield sentence
+                    yield b''
+                    return
+                if metrics is not None:
+                    metrics.received(self.address, received)
+                sentences = lines.sentences()
+                if conflation is not None:
+                    sentences = conflation.conflate(sentences)
+                if admission is not None:
+                    sentences = admission.offer(
+                        self.nmeaserver._accepted(sentences, self.context))
+                for sentence in sentences:
+                    yield sentence
+                if admission is not None:
+                    admission.check()
 
     class ThreadedTCPServer(SocketServer.ThreadingTCPServer):
         nmeaserver = None
@@ -577,15 +1444,40 @@ class NMEAServer:
             if NMEAServer_instance is None:
                 raise ValueError('nmeaserver cannot be None')
 
+            self.nmeaserver = NMEAServer_instance
+            #: The connections being served.
+            self.active = 0
+            self._active_lock = threading.Lock()
             SocketServer.TCPServer.allow_reuse_address = True
             SocketServer.ThreadingTCPServer.__init__(
                 self, server_address, RequestHandlerClass)
-            self.nmeaserver = NMEAServer_instance
             self.daemon_threads = True
+            #: The self-pipe waking up the connection threads of this
+            #: server, see :attr:`NMEAServer.wakeup_pipe`.
+            self.wakeup_pipe = os.pipe()
+            self._closing = False
 
             logger.info('Server Address: {}:{}'.format(
                 str(server_address[0] or "localhost"), str(server_address[1])))
 
+        def server_bind(self):
+            if self.nmeaserver.reuse_port:
+                self.socket.setsockopt(socket.SOL_SOCKET,
+                                       socket.SO_REUSEPORT, 1)
+            SocketServer.ThreadingTCPServer.server_bind(self)
+
+        def verify_request(self, request, client_address):
+            """Refuses the connections beyond
+            :attr:`NMEAServer.max_connections`."""
+
+            limit = self.nmeaserver.max_connections
+            if limit is not None and self.active >= limit:
+                self.nmeaserver.rejected_connections += 1
+                logger.warning("Refused connection from {}, {} connections "
+                               "already".format(client_address[0], limit))
+                return False
+            return True
+
         def finish_request(self, request, client_address):
             """Finish one request by instantiating RequestHandlerClass."""
             self.RequestHandlerClass(
@@ -593,22 +1485,120 @@ class NMEAServer:
 
         def process_request(self, request, client_address):
             """Start a new thread to process the request."""
+            with self._active_lock:
+                self.active += 1
             t = threading.Thread(target = self.process_request_thread,
                                  args = (request, client_address),
                                  name = "client-"+str(client_address))
             t.daemon = self.daemon_threads
             t.start()
 
-    def start(self):
+        def process_request_thread(self, request, client_address):
+            try:
+                SocketServer.ThreadingTCPServer.process_request_thread(
+                    self, request, client_address)
+            finally:
+                with self._active_lock:
+                    self.active -= 1
+                    last = self._closing and not self.active
+                if last:
+                    self._close_wakeup_pipe()
+
+        def wake(self):
+            """Wakes up the connection threads, which then exit. The pipe is
+            never drained, so that those yet to wait return at once."""
+            os.write(self.wakeup_pipe[1], b'x')
+
+        def release(self):
+            """Closes the wakeup pipe once no connection thread may use it,
+            now or when the last one exits. Called once the server stopped
+            accepting connections."""
+            with self._active_lock:
+                self._closing = True
+                if self.active:
+                    return
+            self._close_wakeup_pipe()
+
+        def _close_wakeup_pipe(self):
+            for fd in self.wakeup_pipe:
+                os.close(fd)
+
+    def start(self, processes=None):
+        """Starts serving from a background thread, or from the given number
+        of forked processes, :attr:`processes` by default."""
+
+        self.shutdown_flag = False
+        if processes is not None:
+            self.processes = processes
+        if self.processes > 1:
+            self.process_group = ProcessGroup(self, self.processes)
+        else:
+            self._start_server()
+            try:
+                for source in self.sources:
+                    source.start()
+            except BaseException:
+                self.shutdown()
+                raise
+        self._start_instrumentation()
+
+    def _start_server(self):
+        if self.workers:
+            self.handler_pool = HandlerPool(
+                self.workers, self.worker_type, self.max_pending)
         self.nmeaserver = self.ThreadedTCPServer(
             (self.host, self.port), NMEAServer.MyTCPHandler, self)
+        self.wakeup_pipe = self.nmeaserver.wakeup_pipe
         self.server_thread = threading.Thread(
             name='nmea', target=self.nmeaserver.serve_forever)
         self.server_thread.daemon = True
         self.server_thread.start()
 
+    def _start_instrumentation(self):
+        # Serves the metrics and installs the profile_signal, if configured.
+        if self.metrics is not None and self.metrics_port is not None:
+            self.metrics_endpoint = MetricsEndpoint(self, self.metrics_port)
+            self.metrics_endpoint.start()
+        if self.profile_signal is not None:
+            try:
+                signal.signal(self.profile_signal, self._toggle_profiling)
+            except ValueError:
+                logger.warning("profile_signal can only be installed when "
+                               "started from the main thread")
+
+    def _stop_instrumentation(self):
+        if self.metrics_endpoint is not None:
+            self.metrics_endpoint.shutdown()
+            self.metrics_endpoint = None
+        if self.profiler is not None:
+            self.profiler.stop()
+
+    @property
+    def server_address(self):
+        """The (host, port) actually bound, useful when started on port 0."""
+        if self.process_group is not None:
+            return self.process_group.server_address
+        return self.nmeaserver.server_address
+
     def shutdown(self):
         self.shutdown_flag = True
+        if self.process_group is not None:
+            self.process_group.shutdown()
+            self.process_group = None
+        else:
+            for source in self.sources:
+                source.shutdown()
+            self._shutdown_server()
+        self._stop_instrumentation()
+
+    def _shutdown_server(self):
+        self.nmeaserver.wake()
         self.nmeaserver.shutdown()
         self.nmeaserver.server_close()
-        self.server_thread.join()
\ No newline at end of file
+        self.server_thread.join()
+        # Connection threads still running, such as in a handler, are not
+        # joined: the last one to exit closes the pipe.
+        self.nmeaserver.release()
+        if self.handler_pool is not None:
+            self.handler_pool.close()
+            self.handler_pool = None
\ No newline at end of file
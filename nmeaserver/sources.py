@@ -0,0 +1,299 @@
+"""Sources of sentences other than the TCP connections of a NMEAServer.
+
+An :class:`InputSource` reads sentences from a thread of its own and
+dispatches them through the handlers of a NMEAServer, exactly like those
+received on its connections. :class:`FdSource` reads any file descriptor,
+such as a pipe or a pseudo-terminal, and :class:`SerialSource` a serial
+port::
+
+    app = NMEAServer(port=9000)
+    app.add_source(SerialSource(app, '/dev/ttyUSB0', baudrate=38400))
+    app.start()
+
+Subclasses implement :meth:`InputSource.open`, :meth:`InputSource.fileno`,
+:meth:`InputSource.read_ready` and :meth:`InputSource.close`.
+"""
+
+import errno
+import logging
+import os
+import select
+import threading
+
+from .framing import LineBuffer
+
+logger = logging.getLogger("nmeaserver")
+
+_WOULD_BLOCK = (errno.EAGAIN, errno.EWOULDBLOCK)
+
+
+class InputSource(object):
+    """The base of the sources of sentences, read from a thread named
+    ``source-<name>`` when readable.
+
+    Sentences are dispatched with the connection context of the source,
+    created like those of TCP connections with 'client_address' and
+    'connection' set to the name of the source, and 'transport' set to
+    :attr:`transport`. Responses are only written back with ``respond``.
+
+    .. versionadded:: 0.2.0
+    """
+
+    #: The 'transport' of the connection context of the source.
+    transport = 'source'
+
+    def __init__(self, nmeaserver, name, respond=False):
+        self.nmeaserver = nmeaserver
+        self.name = name
+        self.respond = respond
+        self.thread = None
+        self.wakeup_pipe = None
+        #: The sentences read and those whose dispatch raised.
+        self.sentences = 0
+        self.errors = 0
+
+    def open(self):
+        """Opens what is read from, called by :meth:`start`."""
+        raise NotImplementedError
+
+    def fileno(self):
+        """Returns the file descriptor to wait to be readable."""
+        raise NotImplementedError
+
+    def read_ready(self):
+        """Reads and dispatches what can be read without blocking. Returns
+        False once there is nothing more to read, ever."""
+        raise NotImplementedError
+
+    def close(self):
+        """Closes what is read from, called by :meth:`shutdown`."""
+        raise NotImplementedError
+
+    def thread_name(self):
+        return 'source-{}'.format(self.name)
+
+    def start(self):
+        self.open()
+        self.wakeup_pipe = os.pipe()
+        self.thread = threading.Thread(target=self._run,
+                                       name=self.thread_name())
+        self.thread.daemon = True
+        self.thread.start()
+
+    def shutdown(self):
+        if self.thread is None:
+            return
+        os.write(self.wakeup_pipe[1], b'x')
+        self.thread.join()
+        self.thread = None
+        self.close()
+        for fd in self.wakeup_pipe:
+            os.close(fd)
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def default_context(self):
+        """Creates the connection context of the sentences of the source."""
+        context = {
+            'client_address': self.name,
+            'connection': self.name,
+            'transport': self.transport,
+        }
+        if self.nmeaserver.connection_context_creator is not None:
+            context = self.nmeaserver.connection_context_creator(context)
+        return context
+
+    def _run(self):
+        wakeup = self.wakeup_pipe[0]
+        try:
+            while True:
+                readable, _, _ = select.select([self, wakeup], [], [])
+                if wakeup in readable:
+                    return
+                if not self.read_ready():
+                    logger.info("Source {} ended".format(self.name))
+                    return
+        except BaseException as err:
+            logger.error("Source {} failed: {}".format(self.name, err))
+
+    def dispatch(self, sentences, context, reply=None):
+        """Dispatches sentences through the NMEAServer, passing the
+        responses to reply with ``respond``."""
+        dispatch = self.nmeaserver.dispatch_from_thread
+        if self.nmeaserver.conflation is not None:
+            sentences = self.nmeaserver.conflation.conflate(sentences)
+        for sentence in sentences:
+            self.sentences += 1
+            try:
+                response = dispatch(sentence, context)
+            except EOFError:
+                continue
+            except BaseException as err:
+                self.errors += 1
+                logger.error("Detected exception: {}".format(err))
+                continue
+            if self.respond and response is not None and reply is not None:
+                try:
+                    reply(response.encode('latin-1'))
+                except (IOError, OSError) as err:
+                    logger.debug("Could not respond on {}: {}".format(
+                        self.name, err))
+
+    def stats(self):
+        return {
+            'transport': self.transport,
+            'running': self.running,
+            'sentences': self.sentences,
+            'errors': self.errors,
+        }
+
+
+class FdSource(InputSource):
+    """Reads sentences from a file descriptor, or an object with a fileno(),
+    such as a pipe or a pseudo-terminal.
+
+    The descriptor is made non-blocking and up to ``batch`` reads are made
+    into a preallocated :class:`framing.LineBuffer` each time it is readable,
+    before splitting the sentences they completed. The source ends once the
+    descriptor reaches its end, or reports EIO like the master side of a
+    pseudo-terminal whose other side was closed.
+
+    :param fd: the file descriptor or object to read from
+    :param name: the name of the source, 'fd<n>' by default
+    :param respond: whether to write responses to the descriptor
+    :param read_size: the size of the buffer, the longest sentence
+    :param batch: the most reads each time the descriptor is readable
+    :param closefd: whether :meth:`shutdown` closes the descriptor
+
+    .. versionadded:: 0.2.0
+    """
+
+    transport = 'fd'
+
+    def __init__(self, nmeaserver, fd, name=None, respond=False,
+                 read_size=65536, batch=16, closefd=False):
+        if not isinstance(fd, int):
+            fd = fd.fileno()
+        InputSource.__init__(self, nmeaserver, name or 'fd{}'.format(fd),
+                             respond)
+        self.fd = fd
+        self.read_size = read_size
+        self.batch = batch
+        self.closefd = closefd
+        #: The reads made and the bytes read.
+        self.reads = 0
+        self.bytes_read = 0
+
+    def open(self):
+        _set_blocking(self.fd, False)
+        self.lines = LineBuffer(self.read_size)
+        self.context = self.default_context()
+
+    def fileno(self):
+        return self.fd
+
+    def read_ready(self):
+        lines = self.lines
+        metrics = self.nmeaserver.metrics
+        ended = False
+        for _ in range(self.batch):
+            try:
+                received = lines.read_into(self.fd)
+            except (IOError, OSError) as err:
+                if err.errno in _WOULD_BLOCK:
+                    break
+                if err.errno != errno.EIO:
+                    raise
+                received = 0
+            if not received:
+                ended = True
+                break
+            self.reads += 1
+            self.bytes_read += received
+            if metrics is not None:
+                metrics.received(self.name, received)
+            self.dispatch(lines.sentences(), self.context, self.write)
+        if ended:
+            self.dispatch(lines.flush(), self.context, self.write)
+        return not ended
+
+    def write(self, data):
+        """Writes all of data to the descriptor, waiting for it to be
+        writable when full."""
+        view = memoryview(data)
+        while len(view):
+            try:
+                view = view[os.write(self.fd, view):]
+            except (IOError, OSError) as err:
+                if err.errno not in _WOULD_BLOCK:
+                    raise
+                select.select([], [self.fd], [], 1.0)
+
+    def close(self):
+        if self.closefd:
+            os.close(self.fd)
+
+    def stats(self):
+        stats = InputSource.stats(self)
+        stats['reads'] = self.reads
+        stats['bytes_read'] = self.bytes_read
+        return stats
+
+
+class SerialSource(FdSource):
+    """Reads sentences from a serial port, set to raw mode at a baudrate
+    with termios, so that no serial library is needed.
+
+    :param path: the device, such as '/dev/ttyUSB0'
+    :param baudrate: the speed of the port, 4800 by default as set by
+                     NMEA 0183, None to leave it as it is
+
+    .. versionadded:: 0.2.0
+    """
+
+    transport = 'serial'
+
+    def __init__(self, nmeaserver, path, baudrate=4800, name=None,
+                 respond=False, **options):
+        FdSource.__init__(self, nmeaserver, -1, name or path, respond,
+                          closefd=True, **options)
+        self.path = path
+        self.baudrate = baudrate
+
+    def thread_name(self):
+        return 'source-{}'.format(os.path.basename(self.path))
+
+    def open(self):
+        import termios
+        import tty
+
+        self.fd = os.open(self.path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        try:
+            tty.setraw(self.fd)
+            if self.baudrate is not None:
+                speed = getattr(termios, 'B{}'.format(self.baudrate), None)
+                if speed is None:
+                    raise ValueError('Unsupported baudrate {}'.format(
+                        self.baudrate))
+                attributes = termios.tcgetattr(self.fd)
+                attributes[4] = attributes[5] = speed
+                termios.tcsetattr(self.fd, termios.TCSANOW, attributes)
+        except BaseException:
+            os.close(self.fd)
+            raise
+        FdSource.open(self)
+
+
+def _set_blocking(fd, blocking):
+    if hasattr(os, 'set_blocking'):
+        os.set_blocking(fd, blocking)
+        return
+    import fcntl  # Python 2
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    if blocking:
+        flags &= ~os.O_NONBLOCK
+    else:
+        flags |= os.O_NONBLOCK
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags)
@@ -0,0 +1,191 @@
+"""A state store shared by the handlers of every connection.
+
+The :attr:`NMEAServer.state` store holds values, such as the latest vehicle
+state, that the handlers of every connection read and update::
+
+    @app.message('GPGGA')
+    def fix(context, message):
+        app.state.update(latitude=message['data'][1],
+                         longitude=message['data'][3])
+
+    @app.message('RBSTA')
+    def status(context, message):
+        state = app.state.snapshot()
+        return nmea.format('TXSTA,{},{},{}'.format(
+            state.version, state['latitude'], state['longitude']))
+
+    app.state.subscribe('latitude', lambda key, old, new, version: ...)
+
+Writes copy the values, apply the change to the copy and publish it as a new
+immutable :class:`Snapshot`, so that readers take the current snapshot
+without any lock and never block, nor are blocked by, writers. Only writers
+wait for each other.
+"""
+
+import logging
+import threading
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
+logger = logging.getLogger("nmeaserver")
+
+_MISSING = object()
+
+
+class Snapshot(Mapping):
+    """The values of a :class:`StateStore` at one version, never changed
+    once published. Reads see the values of one write or the next, never
+    half of one.
+
+    .. versionadded:: 0.2.0
+    """
+
+    __slots__ = ('_values', 'version')
+
+    def __init__(self, values, version):
+        self._values = values
+        #: The number of writes made to the store before this snapshot.
+        self.version = version
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return 'Snapshot({!r}, version={})'.format(self._values, self.version)
+
+
+class StateStore(object):
+    """A key/value store read without locks through copy-on-write
+    snapshots, whose changes are published to subscribers.
+
+    Subscribers are called with ``(key, old, new, version)`` after each
+    write changing a key, from the writing thread, with ``old`` or ``new``
+    None when the key was added or removed. Concurrent writes may notify in
+    a different order than they were made: compare versions to discard
+    stale notifications.
+
+    A write copies every value, which keeps reads free but makes writes cost
+    in proportion to the size of the store: batch them with :meth:`update`.
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, values=None):
+        self._snapshot = Snapshot(dict(values or {}), 0)
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        #: The notifications whose subscriber raised.
+        self.errors = 0
+
+    def snapshot(self):
+        """Returns the current :class:`Snapshot`, without locking. Read it
+        rather than the store to see several values of the same write."""
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def get(self, key, default=None):
+        return self._snapshot._values.get(key, default)
+
+    def __getitem__(self, key):
+        return self._snapshot._values[key]
+
+    def __contains__(self, key):
+        return key in self._snapshot._values
+
+    def __len__(self):
+        return len(self._snapshot._values)
+
+    def set(self, key, value):
+        """Sets the value of a key and returns the new version."""
+        return self._write({key: value}, ())
+
+    def update(self, values=None, **more):
+        """Sets the values of several keys at once, in a single version,
+        and returns it."""
+        changes = dict(values or {})
+        changes.update(more)
+        return self._write(changes, ())
+
+    def delete(self, *keys):
+        """Removes keys, ignoring those missing, and returns the version."""
+        return self._write({}, keys)
+
+    def _write(self, changes, removed):
+        with self._lock:
+            current = self._snapshot
+            values = dict(current._values)
+            changed = []
+            for key, value in changes.items():
+                old = values.get(key, _MISSING)
+                if old is _MISSING or old is not value and old != value:
+                    changed.append((key, old, value))
+                values[key] = value
+            for key in removed:
+                old = values.pop(key, _MISSING)
+                if old is not _MISSING:
+                    changed.append((key, old, _MISSING))
+            if not changed:
+                return current.version
+            snapshot = Snapshot(values, current.version + 1)
+            self._snapshot = snapshot
+        self._notify(changed, snapshot.version)
+        return snapshot.version
+
+    def subscribe(self, key, callback):
+        """Calls callback(key, old, new, version) whenever key changes, or
+        whenever any key changes for a key of None."""
+        with self._lock:
+            subscribers = self._subscribers.get(key, ())
+            self._subscribers[key] = subscribers + (callback,)
+
+    def unsubscribe(self, key, callback):
+        with self._lock:
+            subscribers = tuple(subscriber for subscriber in
+                                self._subscribers.get(key, ())
+                                if subscriber != callback)
+            if subscribers:
+                self._subscribers[key] = subscribers
+            else:
+                self._subscribers.pop(key, None)
+
+    def _notify(self, changed, version):
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        every = subscribers.get(None, ())
+        for key, old, new in changed:
+            for callback in subscribers.get(key, ()) + every:
+                try:
+                    callback(key, None if old is _MISSING else old,
+                             None if new is _MISSING else new, version)
+                except BaseException as err:
+                    self.errors += 1
+                    logger.error("State subscriber failed: {}".format(err))
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version,
+            'keys': len(snapshot),
+            'subscribers': sum(len(callbacks) for callbacks in
+                               list(self._subscribers.values())),
+            'errors': self.errors,
+        }
@@ -0,0 +1,296 @@
+"""Coalesced output of the sentences sent on a connection."""
+
+import errno
+import logging
+import socket
+import threading
+import time
+
+logger = logging.getLogger("nmeaserver")
+
+timer = getattr(time, 'monotonic', time.time)
+
+_MSG_DONTWAIT = getattr(socket, 'MSG_DONTWAIT', None)
+_WOULD_BLOCK = (errno.EAGAIN, errno.EWOULDBLOCK)
+
+
+class ConnectionWriter(object):
+    """Collects the sentences to be sent on a connection and sends them from
+    a single writer thread, coalescing whatever is pending into one
+    ``sendall``.
+
+    When the pending sentences are sent depends on the flush policy:
+
+    * ``flush_delay=0`` sends as soon as something is pending. A sentence
+      written while nothing is pending is sent straight away by the writing
+      thread, without blocking, and only what the socket does not accept is
+      left to the writer thread. Sentences written while a send is in
+      progress are coalesced into the next one.
+    * ``flush_delay > 0`` lets sentences accumulate for up to that many
+      seconds after the first one is written, to send fewer, larger packets.
+    * ``flush_size`` sends without waiting any longer once that many bytes
+      are pending.
+
+    :meth:`flush` sends what is pending at once, whatever the policy. It is
+    also a file-like object offering :meth:`write` and :meth:`flush`, safe to
+    share between the threads writing to the same connection. Each write is
+    sent whole, never interleaved with another one.
+
+    ``max_backlog`` bounds the bytes pending for a slow client. Once reached,
+    the ``overflow`` policy either blocks the writing thread until there is
+    room (``'block'``) or discards the oldest pending sentences
+    (``'drop_oldest'``). :meth:`backlog` reports the state of the buffer.
+    A thread shared by several connections, which must not block on any of
+    them, writes with ``block=False`` instead and leaves it to the thread
+    feeding it to wait with :meth:`wait_room`.
+
+    With a :class:`conflation.Conflator`, a sentence written while another
+    one of the same sentence ID it conflates is pending replaces it, in
+    place, so that a slow client gets the latest value rather than every
+    stale one. Only writes of a single sentence are conflated.
+
+    .. versionadded:: 0.2.0
+    """
+
+    def __init__(self, sock, flush_delay=0, flush_size=65536, name=None,
+                 max_backlog=None, overflow='block', conflator=None):
+        if overflow not in ('block', 'drop_oldest'):
+            raise ValueError("overflow must be 'block' or 'drop_oldest'")
+        self.sock = sock
+        self.flush_delay = flush_delay
+        self.flush_size = flush_size
+        self.max_backlog = max_backlog
+        self.overflow = overflow
+        self.conflator = conflator
+        self.closed = False
+        self.pending = []
+        self.pending_bytes = 0
+        # The index in pending of the sentence of each conflated ID.
+        self._slots = {}
+        #: The number of sends and of sentences sent, to tell how well writes
+        #: are coalesced.
+        self.sends = 0
+        self.sentences = 0
+        #: The number of bytes sent.
+        self.bytes_sent = 0
+        #: The number of sentences discarded by the 'drop_oldest' policy and
+        #: the number of writes that blocked for room in the buffer.
+        self.dropped = 0
+        self.blocked = 0
+        self.peak_backlog = 0
+        #: The number of pending sentences replaced by a newer one.
+        self.conflated = 0
+        self._since = None
+        self._partial = False
+        self._flush = False
+        self._sending = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, data, block=True):
+        """Queues a sentence, as str or bytes, to be sent. Blocks while the
+        backlog is full under the 'block' overflow policy, unless block is
+        False, in which case it is queued beyond max_backlog."""
+
+        if not isinstance(data, bytes):
+            data = data.encode('latin-1')
+        with self._cond:
+            if self.closed:
+                raise IOError("Connection writer is closed")
+            if self.flush_delay or self.pending or self._sending or \
+                    _MSG_DONTWAIT is None:
+                self._make_room(len(data), block)
+                self._queue(data)
+                return
+            self._sending = True
+
+        try:
+            sent = self.sock.send(data, _MSG_DONTWAIT)
+        except (IOError, OSError) as err:
+            if err.errno not in _WOULD_BLOCK:
+                self._failed(err)
+                raise IOError("Connection writer is closed")
+            sent = 0
+        with self._cond:
+            self._sending = False
+            if sent:
+                self.sends += 1
+                self.bytes_sent += sent
+            if sent == len(data):
+                self.sentences += 1
+            if sent < len(data):
+                # The rest goes first, ahead of anything queued meanwhile.
+                # It is never dropped, the client already has its start.
+                self.pending.insert(0, data[sent:])
+                self._shift(0, 1)
+                self.pending_bytes += len(data) - sent
+                self.peak_backlog = max(self.peak_backlog, self.pending_bytes)
+                self._partial = True
+                self._since = timer()
+                self._flush = True
+            if self.pending:
+                self._cond.notify_all()
+
+    def _make_room(self, size, block=True):
+        # Applies the overflow policy until size more bytes fit the backlog.
+        if self.max_backlog is None:
+            return
+        if self.overflow == 'drop_oldest':
+            first = 1 if self._partial else 0
+            while len(self.pending) > first and \
+                    self.pending_bytes + size > self.max_backlog:
+                self.pending_bytes -= len(self.pending.pop(first))
+                self._shift(first, -1)
+                self.dropped += 1
+            return
+        if not block:
+            return
+        if self.pending_bytes and self.pending_bytes + size > self.max_backlog:
+            self.blocked += 1
+            self._flush = True
+            self._cond.notify_all()
+            while not self.closed and self.pending_bytes and \
+                    self.pending_bytes + size > self.max_backlog:
+                self._cond.wait()
+            if self.closed:
+                raise IOError("Connection writer is closed")
+
+    def wait_room(self):
+        """Blocks while the backlog is full under the 'block' overflow policy,
+        such as after writes with block=False."""
+
+        if self.max_backlog is None or self.overflow != 'block':
+            return
+        with self._cond:
+            if self.pending_bytes < self.max_backlog:
+                return
+            self.blocked += 1
+            self._flush = True
+            self._cond.notify_all()
+            while not self.closed and self.pending_bytes >= self.max_backlog:
+                self._cond.wait()
+
+    def _shift(self, index, offset):
+        # Moves the slots of the pending sentences from index on by offset,
+        # forgetting the slot of a sentence removed at index.
+        if not self._slots:
+            return
+        for key, slot in list(self._slots.items()):
+            if slot == index and offset < 0:
+                del self._slots[key]
+            elif slot >= index:
+                self._slots[key] = slot + offset
+
+    def _queue(self, data):
+        if self.conflator is not None and \
+                data.find(b'\n') in (-1, len(data) - 1):
+            key = self.conflator.key(data)
+            if key is not None:
+                slot = self._slots.get(key)
+                if slot is not None:
+                    self.pending_bytes += len(data) - len(self.pending[slot])
+                    self.pending[slot] = data
+                    self.conflated += 1
+                    return
+                self._slots[key] = len(self.pending)
+        if not self.pending:
+            self._since = timer()
+            self._cond.notify_all()
+        self.pending.append(data)
+        self.pending_bytes += len(data)
+        self.peak_backlog = max(self.peak_backlog, self.pending_bytes)
+        if self.pending_bytes >= self.flush_size:
+            self._cond.notify_all()
+
+    def flush(self):
+        """Sends the pending sentences without waiting for the flush delay."""
+
+        with self._cond:
+            if self.pending:
+                self._flush = True
+                self._cond.notify_all()
+
+    def backlog(self):
+        """Returns a dict describing the sentences waiting to be sent and how
+        the connection kept up so far."""
+
+        with self._cond:
+            return {
+                'pending': len(self.pending),
+                'pending_bytes': self.pending_bytes,
+                'peak_bytes': self.peak_backlog,
+                'max_backlog': self.max_backlog,
+                'overflow': self.overflow,
+                'sends': self.sends,
+                'sentences': self.sentences,
+                'bytes_sent': self.bytes_sent,
+                'dropped': self.dropped,
+                'blocked': self.blocked,
+                'conflated': self.conflated,
+            }
+
+    def close(self):
+        """Sends what is still pending then stops the writer thread."""
+
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+
+    def _take(self):
+        # Waits for sentences due to be sent according to the flush policy
+        # and takes them, or returns None once closed.
+        with self._cond:
+            while True:
+                if self.pending and not self._sending:
+                    if self.closed or self._flush or not self.flush_delay or \
+                            self.pending_bytes >= self.flush_size:
+                        break
+                    remaining = self._since + self.flush_delay - timer()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                elif self.closed and not self._sending:
+                    return None
+                else:
+                    self._cond.wait()
+            batch = self.pending
+            self.pending = []
+            self.pending_bytes = 0
+            self._slots = {}
+            self._partial = False
+            self._flush = False
+            self._sending = True
+            self._cond.notify_all()
+            return batch
+
+    def _run(self):
+        try:
+            while True:
+                batch = self._take()
+                if batch is None:
+                    return
+                data = b''.join(batch)
+                self.sock.sendall(data)
+                with self._cond:
+                    self._sending = False
+                    self.sends += 1
+                    self.bytes_sent += len(data)
+                    self.sentences += len(batch)
+                    self._cond.notify_all()
+        except (IOError, OSError) as err:
+            self._failed(err)
+
+    def _failed(self, err):
+        logger.debug("Could not send, connection closed: {}".format(err))
+        with self._cond:
+            self.closed = True
+            self._sending = False
+            self.pending = []
+            self.pending_bytes = 0
+            self._slots = {}
+            self._partial = False
+            self._cond.notify_all()
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.aiofixtures
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    The coroutines used by the tests of the nmea.aioserver module, kept apart
+    so that the tests can be imported, and skipped, on Python 2.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import asyncio
+
+from nmea import formatter
+
+
+async def async_handler(context, message):
+    await asyncio.sleep(0.01)
+    return formatter.format('TXASY,' + message['data'][0])
+
+
+async def async_stream(context, writer):
+    while context['stream']:
+        writer.write((formatter.format('TXSTR,1') + '\r\n').encode())
+        await writer.drain()
+        await asyncio.sleep(0.01)
+
+
+async def slow_context_creator(context):
+    await asyncio.sleep(0.1)
+    return context
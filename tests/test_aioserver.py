@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.aioserver
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.aioserver module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import socket
+import sys
+import unittest
+
+if sys.version_info < (3, 7):
+    raise unittest.SkipTest('asyncio backend requires Python 3.7+')
+
+import time  # noqa: E402
+
+from nmea import formatter  # noqa: E402
+from nmea.aioserver import AsyncNMEAServer  # noqa: E402
+from tests import aiofixtures  # noqa: E402
+
+
+class TestAsyncNMEAServer(unittest.TestCase):
+    def setUp(self):
+        self.app = AsyncNMEAServer('127.0.0.1', 0)
+        self.app.message_handlers = {}
+
+        @self.app.message('RXSYN')
+        def sync_handler(context, message):
+            return formatter.format('TXSYN,' + message['data'][0])
+
+        self.app.add_message_handler('RXASY', aiofixtures.async_handler)
+
+    def connect(self):
+        self.app.start()
+        client = socket.create_connection(self.app.server_address, timeout=5)
+        self.addCleanup(client.close)
+        return client, client.makefile('rb')
+
+    def tearDown(self):
+        self.app.shutdown()
+
+    def test_sync_and_async_handlers_keep_order(self):
+        client, rfile = self.connect()
+        client.sendall((formatter.format('RXASY,1') + '\r\n' +
+                        formatter.format('RXSYN,2') + '\r\n').encode())
+        self.assertEqual(rfile.readline().decode().strip(),
+                         formatter.format('TXASY,1'))
+        self.assertEqual(rfile.readline().decode().strip(),
+                         formatter.format('TXSYN,2'))
+
+    def test_bad_checksum(self):
+        client, rfile = self.connect()
+        client.sendall(b'$RXSYN,Test*00\r\n')
+        self.assertIn('TXERR', client.recv(1024).decode())
+
+    def test_async_response_streamer(self):
+        self.app.add_response_stream(aiofixtures.async_stream)
+        client, rfile = self.connect()
+        self.assertEqual(rfile.readline().decode().strip(),
+                         formatter.format('TXSTR,1'))
+
+    def test_sync_response_streamer(self):
+        @self.app.response_stream()
+        def stream(context, wfile):
+            wfile.write(formatter.format('TXSTR,2') + '\r\n')
+
+        client, rfile = self.connect()
+        self.assertEqual(rfile.readline().decode().strip(),
+                         formatter.format('TXSTR,2'))
+
+    def test_sync_response_streamer_per_connection(self):
+        # More connections than the workers of the loop's default executor.
+        streaming = []
+
+        @self.app.response_stream()
+        def stream(context, wfile):
+            streaming.append(context)
+            while context['stream']:
+                wfile.write(formatter.format('TXSTR,3') + '\r\n')
+                time.sleep(0.05)
+
+        self.app.start()
+        clients = [socket.create_connection(self.app.server_address, timeout=5)
+                   for _ in range(60)]
+        try:
+            for client in clients:
+                self.assertEqual(
+                    client.makefile('rb').readline().decode().strip(),
+                    formatter.format('TXSTR,3'))
+        finally:
+            for client in clients:
+                client.close()
+        deadline = time.time() + 5
+        while any(context['stream'] for context in streaming):
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+
+    def test_sync_response_streamer_blocks_on_slow_client(self):
+        written = []
+
+        @self.app.response_stream()
+        def stream(context, wfile):
+            data = formatter.format('TXSTR,' + 'x' * 1000) + '\r\n'
+            while True:
+                wfile.write(data)
+                written.append(len(data))
+
+        client, rfile = self.connect()
+        time.sleep(0.5)
+        # Bounded by the socket buffers and the transport's high-water mark.
+        self.assertLess(sum(written), 16 * 2 ** 20)
+        client.close()
+
+    def test_max_connections_with_async_context_creator(self):
+        self.app.max_connections = 2
+        self.app.add_context_creator(aiofixtures.slow_context_creator)
+        self.app.start()
+        clients = [socket.create_connection(self.app.server_address, timeout=5)
+                   for _ in range(4)]
+        try:
+            for client in clients:
+                client.sendall(
+                    (formatter.format('RXSYN,1') + '\r\n').encode())
+            replies = []
+            for client in clients:
+                try:
+                    replies.append(client.makefile('rb').readline())
+                except (IOError, OSError):
+                    # Refused after the sentence was sent, which resets it.
+                    replies.append(b'')
+        finally:
+            for client in clients:
+                client.close()
+        self.assertEqual(sum(1 for reply in replies if reply), 2)
+        self.assertEqual(self.app.rejected_connections, 2)
+
+    def test_publish(self):
+        @self.app.context_creator()
+        def context(default_context):
+            self.app.subscribe(default_context, 'nav')
+            return default_context
+
+        client, rfile = self.connect()
+        client.sendall((formatter.format('RXSYN,1') + '\r\n').encode())
+        rfile.readline()
+        self.assertEqual(self.app.publish('GPHDT,1.0,T', 'nav'), 1)
+        self.assertEqual(rfile.readline().decode().strip(),
+                         formatter.format('GPHDT,1.0,T'))
+
+    def test_many_connections(self):
+        self.app.start()
+        clients = [socket.create_connection(self.app.server_address, timeout=5)
+                   for _ in range(200)]
+        try:
+            for i, client in enumerate(clients):
+                client.sendall(
+                    (formatter.format('RXSYN,' + str(i)) + '\r\n').encode())
+            for i, client in enumerate(clients):
+                self.assertEqual(
+                    client.makefile('rb').readline().decode().strip(),
+                    formatter.format('TXSYN,' + str(i)))
+        finally:
+            for client in clients:
+                client.close()
+
+
+class TestAsyncNMEAServerOptions(unittest.TestCase):
+    def test_unsupported_options(self):
+        with self.assertRaises(ValueError) as raised:
+            AsyncNMEAServer('127.0.0.1', 0, workers=4, flush_delay=0.01)
+        self.assertIn('workers, flush_delay', str(raised.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
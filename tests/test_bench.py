@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.bench
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.bench module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from nmea import bench
+
+
+class TestBench(unittest.TestCase):
+    def test_micro(self):
+        results = bench.micro(count=100, repeat=1)
+        self.assertIn('parse strict long', results)
+        self.assertIn('calc_checksum short', results)
+        for result in results.values():
+            self.assertGreater(result['ops_per_sec'], 0)
+
+    def test_load(self):
+        result = bench.load(connections=2, rate=200, duration=0.3)
+        self.assertGreater(result['sentences'], 30)
+        self.assertLessEqual(result['sentences'], 62)
+        self.assertLessEqual(result['p50'], result['p999'])
+        self.assertGreaterEqual(result['cpu_seconds'], 0)
+
+    def test_load_as_fast_as_possible(self):
+        result = bench.load(connections=2, duration=0.2, window=4)
+        self.assertGreater(result['sentences'], 0)
+
+    def test_state(self):
+        result = bench.state(threads=8, writers=1, duration=0.1, keys=4)
+        for name in ('store', 'locked_dict'):
+            self.assertGreater(result[name]['reads_per_sec'], 0)
+            self.assertGreater(result[name]['writes_per_sec'], 0)
+            self.assertLessEqual(result[name]['write_p50'],
+                                 result[name]['write_max'])
+
+    def test_json(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'results.json')
+        bench.main(['micro', '--count', '10', '--json', path])
+        with open(path) as output:
+            results = json.load(output)
+        self.assertIn('python', results['environment'])
+        self.assertIn('format long', results['micro'])
+        self.assertNotIn('load', results)
+
+    def test_percentile(self):
+        samples = list(range(1000))
+        self.assertEqual(bench.percentile(samples, 0.5), 500)
+        self.assertEqual(bench.percentile(samples, 0.999), 999)
+        self.assertIsNone(bench.percentile([], 0.5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.client
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.client module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import socket
+import threading
+import time
+import unittest
+
+from nmea import client, formatter, server
+
+
+class Feed(object):
+    """An upstream endpoint sending sentences to each connection."""
+
+    def __init__(self, data=b''):
+        self.data = data
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(16)
+        self.address = self.listener.getsockname()
+        self.connections = []
+        self.received = b''
+        thread = threading.Thread(target=self.serve)
+        thread.daemon = True
+        thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                sock, _ = self.listener.accept()
+            except (IOError, OSError):
+                return
+            self.connections.append(sock)
+            sock.sendall(self.data)
+            thread = threading.Thread(target=self.receive, args=(sock,))
+            thread.daemon = True
+            thread.start()
+
+    def receive(self, sock):
+        try:
+            while True:
+                data = sock.recv(4096)
+                if not data:
+                    return
+                self.received += data
+        except (IOError, OSError):
+            return
+
+    def close(self):
+        self.listener.close()
+        for sock in self.connections:
+            self.drop(sock)
+
+    def drop(self, sock):
+        # Shut down first, as closing alone does not wake up receive.
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except (IOError, OSError):
+            pass
+        sock.close()
+
+
+def sentences(*headings):
+    return ''.join(formatter.format('GPHDT,{},T'.format(heading)) + '\r\n'
+                   for heading in headings).encode()
+
+
+@unittest.skipIf(client.selectors is None, 'requires selectors')
+class TestClient(unittest.TestCase):
+    def setUp(self):
+        self.app = server.NMEAServer('127.0.0.1', 0)
+        self.app.message_handlers = {}
+        self.received = []
+
+        @self.app.message('GPHDT')
+        def hdt(context, message):
+            self.received.append((context['connection'], message['data'][0]))
+            return formatter.format('TXHDT,' + message['data'][0])
+
+        self.client = client.NMEAClient(self.app, backoff=0.01,
+                                        max_backoff=0.05)
+        self.addCleanup(self.client.shutdown)
+
+    def feed(self, data=b''):
+        feed = Feed(data)
+        self.addCleanup(feed.close)
+        return feed
+
+    def wait_for(self, condition):
+        deadline = time.time() + 5
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_feeds(self):
+        feeds = [self.feed(sentences(index, index + 100)) for index in
+                 range(20)]
+        for feed in feeds:
+            self.client.add(*feed.address)
+        self.client.start()
+        self.wait_for(lambda: len(self.received) == 40)
+        self.assertEqual([thread.name for thread in threading.enumerate()
+                          if thread.name == 'upstream'], ['upstream'])
+        name = '{}:{}'.format(*feeds[3].address)
+        self.assertEqual(sorted(heading for connection, heading in
+                                self.received if connection == name),
+                         ['103', '3'])
+        stats = self.client.stats()[name]
+        self.assertEqual(stats['state'], 'connected')
+        self.assertEqual(stats['sentences'], 2)
+        # Responses are only relayed when asked.
+        self.assertEqual(feeds[3].received, b'')
+
+    def test_respond(self):
+        feed = self.feed(sentences(1, 2))
+        self.client.add(feed.address[0], feed.address[1], name='feed',
+                        respond=True)
+        self.client.start()
+        expected = ''.join(formatter.format('TXHDT,{}'.format(heading)) +
+                           '\n' for heading in (1, 2)).encode()
+        self.wait_for(lambda: feed.received == expected)
+        self.client.send('feed', formatter.format('TXHDT,3'))
+        self.wait_for(lambda: feed.received.endswith(
+            formatter.format('TXHDT,3').encode() + b'\n'))
+
+    def test_pooled_respond(self):
+        app = server.NMEAServer('127.0.0.1', 0, workers=4)
+        app.message_handlers = self.app.message_handlers
+        app.start()
+        self.addCleanup(app.shutdown)
+        pooled = client.NMEAClient(app)
+        self.addCleanup(pooled.shutdown)
+        feed = self.feed(sentences(*range(20)))
+        pooled.add(*feed.address, respond=True)
+        pooled.start()
+        expected = ''.join(formatter.format('TXHDT,{}'.format(heading)) +
+                           '\n' for heading in range(20)).encode()
+        self.wait_for(lambda: feed.received == expected)
+
+    def test_reconnect(self):
+        feed = self.feed(sentences(1))
+        upstream = self.client.add(*feed.address)
+        self.client.start()
+        self.wait_for(lambda: len(self.received) == 1)
+        feed.drop(feed.connections[0])
+        self.wait_for(lambda: len(self.received) == 2)
+        self.assertEqual(upstream.connects, 2)
+        self.assertEqual(upstream.failures, 1)
+
+    def test_backoff(self):
+        feed = self.feed()
+        address = feed.address
+        feed.close()
+        upstream = self.client.add(*address)
+        self.client.start()
+        self.wait_for(lambda: upstream.failures >= 3)
+        self.assertIn(upstream.state, ('waiting', 'connecting'))
+        self.assertIsNotNone(upstream.last_error)
+
+    def test_remove(self):
+        feed = self.feed()
+        upstream = self.client.add(*feed.address)
+        self.client.start()
+        self.wait_for(lambda: upstream.state == 'connected')
+        self.client.remove(upstream)
+        self.wait_for(lambda: upstream.state == 'removed')
+        self.assertIsNone(upstream.sock)
+        self.assertEqual(self.client.stats(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
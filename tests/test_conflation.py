@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.conflation
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.conflation module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import socket
+import threading
+import time
+import unittest
+
+from nmea import conflation, formatter, server
+
+
+def sentence(body):
+    return (formatter.format(body) + '\r\n').encode()
+
+
+class TestConflator(unittest.TestCase):
+    def test_conflate(self):
+        conflator = conflation.Conflator(['*GGA', 'GPHDT'])
+        sentences = [b'$GPGGA,1*00', b'$GPHDT,1*00', b'$GPRMC,1*00',
+                     b'$GPGGA,2*00', b'$GNGGA,1*00', b'$GPRMC,2*00',
+                     b'$GPHDT,2*00']
+        self.assertEqual(conflator.conflate(sentences),
+                         [b'$GPRMC,1*00', b'$GPGGA,2*00', b'$GNGGA,1*00',
+                          b'$GPRMC,2*00', b'$GPHDT,2*00'])
+        self.assertEqual(conflator.stats()['conflated'], 2)
+
+    def test_key(self):
+        conflator = conflation.Conflator(['*GGA'])
+        self.assertEqual(conflator.key(b'$GPGGA,1*00\r\n'), b'GPGGA')
+        self.assertEqual(conflator.key('$GPGGA,1*00'), 'GPGGA')
+        self.assertIsNone(conflator.key(b'$GPHDT,1*00'))
+        self.assertIsNone(conflator.key(b'garbage'))
+
+
+class TestServerConflation(unittest.TestCase):
+    server_options = {}
+
+    def setUp(self):
+        self.app = server.NMEAServer('127.0.0.1', 0, conflate=['*HDT'],
+                                     **self.server_options)
+        self.app.message_handlers = {}
+        self.app.add_message_handler(
+            'RXTST', lambda context, message: formatter.format('TXTST'))
+        self.received = []
+        self.blocked = threading.Event()
+        self.release = threading.Event()
+
+        @self.app.message('GPHDT')
+        def hdt(context, message):
+            if not self.received:
+                self.blocked.set()
+                self.release.wait(5)
+            self.received.append(message['data'][0])
+            return formatter.format('TXHDT,' + message['data'][0])
+
+        self.app.start()
+        self.addCleanup(self.app.shutdown)
+        self.client = socket.create_connection(self.app.server_address,
+                                               timeout=5)
+        self.addCleanup(self.client.close)
+
+    def test_handler_gets_latest(self):
+        self.client.sendall(sentence('GPHDT,0'))
+        self.assertTrue(self.blocked.wait(5))
+        # Received while the handler is busy, only the latest is dispatched.
+        self.client.sendall(b''.join(sentence('GPHDT,{}'.format(index))
+                                     for index in range(1, 50)))
+        self.release.set()
+        rfile = self.client.makefile('rb')
+        self.assertEqual(rfile.readline().decode().strip(),
+                         formatter.format('TXHDT,0'))
+        self.assertEqual(rfile.readline().decode().strip(),
+                         formatter.format('TXHDT,49'))
+        self.assertEqual(self.received, ['0', '49'])
+        self.assertEqual(self.app.stats()['conflation']['conflated'], 48)
+
+
+
+class TestPoolConflation(TestServerConflation):
+    server_options = {'workers': 2}
+
+    def test_waiting_for_a_worker(self):
+        self.client.sendall(sentence('GPHDT,0'))
+        self.assertTrue(self.blocked.wait(5))
+        # Each in a read of its own, queued behind the one running.
+        for index in range(1, 50):
+            self.client.sendall(sentence('GPHDT,{}'.format(index)))
+            time.sleep(0.002)
+        self.client.sendall(sentence('RXTST,1'))
+        time.sleep(0.1)
+        self.release.set()
+        rfile = self.client.makefile('rb')
+        self.assertEqual([rfile.readline().decode().strip()
+                          for _ in range(3)],
+                         [formatter.format('TXHDT,0'),
+                          formatter.format('TXHDT,49'),
+                          formatter.format('TXTST')])
+        self.assertEqual(self.received, ['0', '49'])
+        stats = self.app.stats()
+        self.assertEqual(stats['conflation']['conflated'], 48)
+        self.assertGreater(stats['handler_pool']['superseded'], 0)
+        self.assertEqual(stats['handler_pool']['pending'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
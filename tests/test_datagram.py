@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.datagram
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.datagram module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import socket
+import struct
+import time
+import unittest
+
+from nmea import formatter, server
+
+GROUP = '239.255.74.1'
+
+
+class TestDatagram(unittest.TestCase):
+    def setUp(self):
+        self.app = server.NMEAServer('127.0.0.1', 0, metrics=True)
+        self.app.message_handlers = {}
+        self.received = []
+
+        @self.app.message('GPHDT')
+        def hdt(context, message):
+            self.received.append((context['transport'], message['data'][0]))
+            return formatter.format('TXHDT,OK')
+
+        self.sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(self.sender.close)
+
+    def datagram(self, *headings):
+        return ''.join(formatter.format('GPHDT,{},T'.format(heading)) +
+                       '\r\n' for heading in headings).encode()
+
+    def wait(self, expected):
+        deadline = time.time() + 5
+        while len(self.received) < expected and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.received), expected)
+
+    def test_unicast(self):
+        receiver = self.app.listen_udp(0, respond=True)
+        self.app.start()
+        self.addCleanup(self.app.shutdown)
+        self.sender.sendto(self.datagram(1, 2, 3), receiver.server_address)
+        # The last sentence of a datagram may lack its line break.
+        self.sender.sendto(self.datagram(4).strip(), receiver.server_address)
+        self.wait(4)
+        self.assertEqual(self.received, [('udp', '1'), ('udp', '2'),
+                                         ('udp', '3'), ('udp', '4')])
+        self.sender.settimeout(5)
+        # Sent once each sentence is dispatched.
+        for _ in range(4):
+            response, _ = self.sender.recvfrom(1024)
+            self.assertEqual(response, formatter.format('TXHDT,OK').encode()
+                             + b'\n')
+        stats = self.app.stats()['sources'][receiver.name]
+        self.assertEqual(stats['datagrams'], 2)
+        self.assertEqual(stats['sentences'], 4)
+        self.assertEqual(stats['senders'], 1)
+        snapshot = self.app.metrics_snapshot()
+        self.assertEqual(snapshot['sentences']['GPHDT']['messages'], 4)
+        self.assertIn('udp:{}'.format(receiver.server_address[1]),
+                      snapshot['connections'])
+
+    def test_no_response(self):
+        receiver = self.app.listen_udp(0)
+        self.app.start()
+        self.addCleanup(self.app.shutdown)
+        self.sender.sendto(self.datagram(1), receiver.server_address)
+        self.wait(1)
+        self.sender.settimeout(0.1)
+        self.assertRaises(socket.timeout, self.sender.recvfrom, 1024)
+
+    def test_multicast(self):
+        receiver = self.app.listen_udp(0, host='', group=GROUP,
+                                       interface='127.0.0.1')
+        try:
+            self.app.start()
+        except (IOError, OSError) as err:
+            self.skipTest('no loopback multicast: {}'.format(err))
+        self.addCleanup(self.app.shutdown)
+        self.sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                               socket.inet_aton('127.0.0.1'))
+        self.sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP,
+                               struct.pack('b', 1))
+        self.sender.sendto(self.datagram(7, 8),
+                           (GROUP, receiver.server_address[1]))
+        self.wait(2)
+        self.assertEqual(self.received, [('udp', '7'), ('udp', '8')])
+
+    def test_shutdown(self):
+        receiver = self.app.listen_udp(0)
+        self.app.start()
+        self.app.shutdown()
+        self.assertIsNone(receiver.thread)
+        self.assertRaises(socket.error, receiver.sock.getsockname)
+
+
+if __name__ == '__main__':
+    unittest.main()
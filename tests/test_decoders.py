@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.decoders
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.decoders module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import datetime
+import pickle
+import unittest
+
+from nmea import decoders, formatter
+
+
+class TestDecoders(unittest.TestCase):
+    def test_gga(self):
+        fields = formatter.parse(formatter.format(
+            'GPGGA,123519,4807.038,N,01131.000,W,1,08,0.9,545.4,M,46.9,M,,'
+        )).fields
+        self.assertEqual(fields.time, datetime.time(12, 35, 19))
+        self.assertAlmostEqual(fields.latitude, 48.1173)
+        self.assertAlmostEqual(fields.longitude, -11.516666666)
+        self.assertEqual(fields.quality, 1)
+        self.assertEqual(fields.satellites, 8)
+        self.assertEqual(fields['altitude'], 545.4)
+        self.assertEqual(fields.geoid_separation, 46.9)
+        self.assertIsNone(fields.age)
+        self.assertIsNone(fields.station)
+
+    def test_rmc(self):
+        fields = formatter.parse(formatter.format(
+            'GPRMC,123519.25,A,4807.038,S,01131.000,E,022.4,084.4,230394,'
+            '003.1,W')).fields
+        self.assertEqual(fields.time, datetime.time(12, 35, 19, 250000))
+        self.assertEqual(fields.status, 'A')
+        self.assertAlmostEqual(fields.latitude, -48.1173)
+        self.assertEqual(fields.speed_knots, 22.4)
+        self.assertEqual(fields.date, datetime.date(1994, 3, 23))
+        self.assertEqual(fields.variation, -3.1)
+        self.assertIsNone(fields.mode)
+
+    def test_vtg_and_hdt(self):
+        vtg = formatter.parse(formatter.format(
+            'GPVTG,054.7,T,034.4,M,005.5,N,010.2,K,A')).fields
+        self.assertEqual(vtg.as_dict(), {
+            'true_track': 54.7, 'magnetic_track': 34.4, 'speed_knots': 5.5,
+            'speed_kmh': 10.2, 'mode': 'A'})
+        hdt = formatter.parse(formatter.format('HEHDT,274.07,T')).fields
+        self.assertEqual(hdt.heading, 274.07)
+
+    def test_memoized(self):
+        message = formatter.parse(formatter.format('HEHDT,274.07,T'))
+        self.assertIs(message.fields, message.fields)
+        heading = message.fields.heading
+        self.assertIs(message.fields.heading, heading)
+        self.assertIn('heading', vars(message.fields))
+
+    def test_unknown_type(self):
+        self.assertIsNone(formatter.parse('$RBHRB,Test*52').fields)
+        with self.assertRaises(AttributeError):
+            formatter.parse(formatter.format('HEHDT,274.07,T')).fields.speed
+
+    def test_register(self):
+        decoders.register('RBHRB', [
+            ('date', decoders.date),
+            ('time', decoders.utc_time),
+            ('latitude', decoders.latitude, 2),
+            ('longitude', decoders.longitude, 2),
+            ('team', str),
+            ('count', int),
+        ])
+        self.addCleanup(decoders.unregister, 'RBHRB')
+        message = formatter.parse(
+            '$RBHRB,101218,161229,21.31198,N,157.88972,W,AUVSI,2*01')
+        self.assertEqual(list(message.fields), [
+            'date', 'time', 'latitude', 'longitude', 'team', 'count'])
+        self.assertEqual(message.fields.date, datetime.date(2018, 12, 10))
+        self.assertAlmostEqual(message.fields.longitude, -1 - 57.88972 / 60)
+        self.assertEqual(message.fields.count, 2)
+
+    def test_duplicate_field(self):
+        with self.assertRaises(ValueError):
+            decoders.Decoder('BAD', [('a', int), ('a', int)])
+
+    def test_decode_dict(self):
+        message = formatter.regex_parse(formatter.format('HEHDT,274.07,T'))
+        self.assertEqual(decoders.decode(message).heading, 274.07)
+
+    def test_pickle_after_decoding(self):
+        message = formatter.parse(formatter.format('HEHDT,274.07,T'))
+        message.fields.heading
+        self.assertEqual(pickle.loads(pickle.dumps(message)).fields.heading,
+                         274.07)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,7 +8,15 @@
     :license: APLv2, see LICENSE for more details.
 """
 
+import datetime
+import json
+import math
+import operator
+import os
+import pickle
+import tempfile
 import unittest
+from functools import reduce
 
 from nmea import formatter
 
@@ -30,6 +38,34 @@ class TestStringMethods(unittest.TestCase):
         self.assertEqual(formatter.calc_checksum(
             "$RBHRB,101218,161229,21.31198,N,157.88972,W,AUVSI,2*01"), '01')
 
+    def test_calcchecksum_bytes_like(self):
+        nmea_bytes = b'$RBDOK,101218,161229,AUVSI,2*3E'
+        self.assertEqual(formatter.calc_checksum(nmea_bytes), '3E')
+        self.assertEqual(formatter.calc_checksum(bytearray(nmea_bytes)), '3E')
+        self.assertEqual(formatter.calc_checksum(memoryview(nmea_bytes)),
+                         '3E')
+        self.assertEqual(formatter.calc_checksum(memoryview(
+            b'noise' + nmea_bytes)[5:]), '3E')
+
+    def test_calcchecksum_long(self):
+        nmea_str = 'RBDOK,' + 'ABCDEFGH' * 2000 + 'I'
+        self.assertEqual(formatter.calc_checksum(nmea_str), '%02X' % reduce(
+            operator.xor, map(ord, nmea_str), 0))
+
+    def test_calcchecksums(self):
+        sentences = ['$RBDOK,101218,161229,AUVSI,2*3E',
+                     'RBHRB,101218,161229,21.31198,N,157.88972,W,AUVSI,2',
+                     b'$RBHRB,Test', '', '$', '*12']
+        self.assertEqual(formatter.calc_checksums(sentences),
+                         [formatter.calc_checksum(sentence)
+                          for sentence in sentences])
+
+    def test_checksum_batch(self):
+        buf = b'$RBDOK,101218,161229,AUVSI,2*3E$RBHRB,Test*52'
+        self.assertEqual(
+            formatter.checksum_batch(buf, [1, 32, 0], [28, 42, 0]).tolist(),
+            [0x3E, 0x52, 0])
+
     def test_formatSentence_missing_prefix(self):
         self.assertEqual(
             formatter.format(
@@ -94,6 +130,182 @@ class TestStringMethods(unittest.TestCase):
         with self.assertRaises(ValueError):
             formatter.parse(nmea_str)
 
+    def assertSameAsRegex(self, nmea_str, strict):
+        try:
+            expected = formatter.regex_parse(nmea_str, strict)
+        except ValueError as err:
+            with self.assertRaises(ValueError) as raised:
+                formatter.parse(nmea_str, strict)
+            self.assertEqual(raised.exception.args, err.args)
+        else:
+            self.assertEqual(formatter.parse(nmea_str, strict), expected)
+
+    def test_parse_same_as_regex(self):
+        for nmea_str in ['$GPGGA,1,2*4B', '$gpgga,1,2*4b', '$RBHRB,Test*52\r\n',
+                         'noise$RBHRB,Test*52', 'RBHRB,Test*52',
+                         'GPGGA,1,AAAAA,2*11', '$$RBHRB,Test*52',
+                         '$RBHRB,*52', '$RBHRB,Test', '$RBHRB,Test*5',
+                         '$RB_RB,Test*52', '$RBHRB;Test*52', '$RBHRB,', '',
+                         '$RBHRB,Te$st*52', '$RBHRB,Test**52']:
+            for strict in (True, False):
+                self.assertSameAsRegex(nmea_str, strict)
+
+    def test_parseNMEA_bad_checksum_message(self):
+        with self.assertRaises(ValueError) as raised:
+            formatter.parse('$RBHRB,Test*28')
+        self.assertEqual(raised.exception.args,
+                         ('Checksum does not match: 28 != 52.',))
+
+    def test_parseNMEA_garbage(self):
+        with self.assertRaises(ValueError) as raised:
+            formatter.parse('garbage', False)
+        self.assertEqual(raised.exception.args,
+                         ('Could not parse data:', 'garbage'))
+
+    def test_sentence_mapping(self):
+        nmea_str = '$RBHRB,101218,161229,21.31198,N,157.88972,W,AUVSI,2*01'
+        message = formatter.parse(nmea_str)
+        self.assertIsInstance(message, formatter.Sentence)
+        self.assertEqual(dict(message), formatter.regex_parse(nmea_str))
+        self.assertEqual(message.sentence_id, 'RBHRB')
+        self.assertEqual(message.talker, 'RB')
+        self.assertEqual(message.data, message['data'])
+        self.assertIs(message.data, message.data)
+        self.assertEqual(message.get('checksum', 'none'), 'none')
+        self.assertNotIn('checksum', message)
+        with self.assertRaises(KeyError):
+            message['checksum']
+
+    def test_sentence_lazy_data(self):
+        message = formatter.parse('$RBHRB,Test*52')
+        self.assertIsNone(message._data)
+        message['data'][0] = 'Changed'
+        self.assertEqual(message['data'], ['Changed'])
+
+    def test_sentence_set_keys(self):
+        message = formatter.parse('$RBHRB,Test*52')
+        message['sentence_id'] = 'TXHRB'
+        message['sentence'] = '$TXHRB,Other*00'
+        message['extra'] = 1
+        self.assertEqual(message['talker'], 'RB')
+        self.assertEqual(message['data'], ['Test'])
+        self.assertEqual(len(message), 6)
+        self.assertEqual(sorted(message.keys()), [
+            'data', 'extra', 'sentence', 'sentence_id', 'sentence_type',
+            'talker'])
+        del message['extra']
+        self.assertNotIn('extra', message)
+
+    def test_sentence_dict_methods(self):
+        nmea_str = '$RBHRB,Test*52'
+        message = formatter.parse(nmea_str)
+        expected = formatter.regex_parse(nmea_str)
+        self.assertEqual(message.setdefault('extra', 1), 1)
+        self.assertEqual(message.setdefault('extra', 2), 1)
+        message.update({'checksum': '52'}, source='test')
+        self.assertEqual(message.pop('checksum'), '52')
+        self.assertEqual(message.pop('checksum', None), None)
+        self.assertRaises(KeyError, message.pop, 'checksum')
+        self.assertEqual(message.pop('source'), 'test')
+        other = message.copy()
+        key, value = other.popitem()
+        self.assertNotIn(key, other)
+        other[key] = value
+        self.assertEqual(other, message)
+        copy = message.copy()
+        self.assertIsInstance(copy, formatter.Sentence)
+        del copy['extra']
+        self.assertEqual(message['extra'], 1)
+        self.assertEqual(dict(copy), expected)
+        self.assertEqual(message.pop('data'), ['Test'])
+        self.assertNotIn('data', message)
+        self.assertEqual(len(message), 5)
+        message.clear()
+        self.assertEqual(len(message), 0)
+        self.assertEqual(dict(message), {})
+        message['data'] = ['Back']
+        self.assertEqual(dict(message), {'data': ['Back']})
+        self.assertEqual(len(copy), 5)
+
+    def test_sentence_json(self):
+        message = formatter.parse('$RBHRB,Test*52')
+        self.assertEqual(json.loads(json.dumps(dict(message))),
+                         formatter.regex_parse('$RBHRB,Test*52'))
+
+    def test_sentence_pickle(self):
+        message = formatter.parse('$RBHRB,Test*52')
+        message['extra'] = 1
+        self.assertEqual(pickle.loads(pickle.dumps(message)), message)
+
+    def test_sentence_has_no_dict(self):
+        with self.assertRaises(AttributeError):
+            formatter.parse('$RBHRB,Test*52').__dict__
+
+    LOG = [
+        formatter.format('GPGGA,123519,4807.038,N,01131.000,W,1,08,0.9,'
+                         '545.4,M,46.9,M,,'),
+        formatter.format('GPRMC,123519.25,A,4807.038,S,01131.000,E,022.4,'
+                         '084.4,230394,003.1,W'),
+        '$GPGGA,123520,4807.038,N,01131.000,W,1,08,0.9,545.4,M,46.9,M,,*00',
+        '',
+        'garbage',
+        'noise$gpgga,123521,,,,,0,00,,,M,,M,,*' +
+        formatter.calc_checksum('gpgga,123521,,,,,0,00,,,M,,M,,'),
+    ]
+
+    def test_parse_buffer(self):
+        log = ('\r\n'.join(self.LOG) + '\n').encode()
+        result = formatter.parse_buffer(log, 'GGA')
+        self.assertEqual(result['lines'], 6)
+        self.assertEqual(result['bad'].tolist(),
+                         [False, False, True, False, True, False])
+        self.assertEqual(result['line'].tolist(), [0, 5])
+        columns = result['columns']
+        self.assertEqual(columns['time'].tolist(), [45319.0, 45321.0])
+        self.assertAlmostEqual(columns['latitude'][0], 48.1173)
+        self.assertAlmostEqual(columns['longitude'][0], -11.516666666)
+        self.assertTrue(math.isnan(columns['latitude'][1]))
+        self.assertEqual(columns['satellites'].tolist(), [8.0, 0.0])
+        self.assertEqual(columns['station'].tolist(), [b'', b''])
+
+    def test_parse_buffer_lax(self):
+        log = '\n'.join(self.LOG).encode()
+        result = formatter.parse_buffer(log, 'GPGGA', strict=False)
+        self.assertEqual(result['line'].tolist(), [0, 2, 5])
+        self.assertEqual(result['bad'].tolist(),
+                         [False, False, False, False, True, False])
+
+    def test_parse_buffer_same_as_parse(self):
+        log = ('\n'.join(self.LOG) + '\n').encode()
+        result = formatter.parse_buffer(log, 'RMC')
+        fields = formatter.parse(self.LOG[1]).fields
+        columns = result['columns']
+        self.assertEqual(result['line'].tolist(), [1])
+        for name in ('latitude', 'longitude', 'speed_knots', 'course',
+                     'variation'):
+            self.assertAlmostEqual(columns[name][0], getattr(fields, name))
+        self.assertEqual(columns['date'][0].item(), fields.date)
+        self.assertEqual(columns['timestamp'][0].item(),
+                         datetime.datetime.combine(fields.date, fields.time))
+        self.assertEqual(columns['status'].tolist(), [b'A'])
+
+    def test_parse_buffer_without_decoder(self):
+        with self.assertRaises(ValueError):
+            formatter.parse_buffer(b'$RBHRB,Test*52\n', 'HRB')
+
+    def test_parse_file(self):
+        log = tempfile.NamedTemporaryFile(delete=False)
+        self.addCleanup(os.remove, log.name)
+        log.write(('\n'.join(self.LOG * 50) + '\n').encode())
+        log.close()
+        chunks = list(formatter.parse_file(log.name, 'GGA', chunk_size=500))
+        self.assertGreater(len(chunks), 10)
+        self.assertEqual(sum(chunk['lines'] for chunk in chunks), 300)
+        lines = [line for chunk in chunks for line in chunk['line'].tolist()]
+        self.assertEqual(lines, [i * 6 + offset for i in range(50)
+                                 for offset in (0, 5)])
+        self.assertEqual(list(formatter.parse_file(os.devnull, 'GGA')), [])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.framing
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.framing module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import os
+import socket
+import unittest
+
+from nmea import formatter
+from nmea.framing import LineBuffer
+
+
+class TestLineBuffer(unittest.TestCase):
+    def test_lines(self):
+        lines = LineBuffer()
+        self.assertEqual(lines.feed(b'$A*00\r\n  $B*01 \r\n\r\n$C'),
+                         [b'$A*00', b'$B*01'])
+        self.assertEqual(lines.feed(b'*02\r\n'), [b'$C*02'])
+
+    def test_back_to_back_sentences(self):
+        lines = LineBuffer()
+        self.assertEqual(lines.feed(b'noise$A*00$B*01\r\n'),
+                         [b'noise$A*00', b'$B*01'])
+
+    def test_flush(self):
+        lines = LineBuffer()
+        self.assertEqual(lines.feed(b'$A*00\r\n$B*01'), [b'$A*00'])
+        self.assertEqual(lines.flush(), [b'$B*01'])
+        self.assertEqual(lines.flush(), [])
+
+    def test_reuses_buffer(self):
+        lines = LineBuffer(16)
+        received = []
+        for _ in range(10):
+            received += lines.feed(b'$ABCDE,123*45\r\n')
+        self.assertEqual(received, [b'$ABCDE,123*45'] * 10)
+        self.assertEqual(len(lines.buffer), 16)
+
+    def test_discards_overlong_line(self):
+        lines = LineBuffer(8)
+        self.assertEqual(lines.feed(b'0123456789\n$A*00\n'), [b'$A*00'])
+
+    def test_recv_into(self):
+        left, right = socket.socketpair()
+        self.addCleanup(left.close)
+        self.addCleanup(right.close)
+        lines = LineBuffer()
+        left.sendall(b'$A*00\r\n$B')
+        self.assertEqual(lines.recv_into(right), 9)
+        self.assertEqual(lines.sentences(), [b'$A*00'])
+        left.close()
+        self.assertEqual(lines.recv_into(right), 0)
+        self.assertEqual(lines.flush(), [b'$B'])
+
+    def test_read_into(self):
+        read, write = os.pipe()
+        self.addCleanup(os.close, read)
+        lines = LineBuffer()
+        os.write(write, b'$A*00\r\n$B')
+        self.assertEqual(lines.read_into(read), 9)
+        self.assertEqual(lines.sentences(), [b'$A*00'])
+        os.close(write)
+        self.assertEqual(lines.read_into(read), 0)
+        self.assertEqual(lines.flush(), [b'$B'])
+
+    def test_parse_bytes(self):
+        nmea_str = '$RBHRB,101218,161229,21.31198,N,157.88972,W,AUVSI,2*01'
+        lines = LineBuffer()
+        sentence, = lines.feed((nmea_str + '\r\n').encode())
+        self.assertEqual(formatter.parse(sentence), formatter.parse(nmea_str))
+        self.assertEqual(formatter.parse(memoryview(sentence)),
+                         formatter.parse(nmea_str))
+
+
+if __name__ == '__main__':
+    unittest.main()
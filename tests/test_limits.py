@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.limits
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.limits module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import socket
+import sys
+import time
+import unittest
+
+from nmea import formatter, limits, server
+
+
+def sentence(body):
+    return (formatter.format(body) + '\r\n').encode()
+
+
+class TestRateLimit(unittest.TestCase):
+    def test_burst_and_refill(self):
+        limit = limits.RateLimit(sentences=10, burst=0.5)
+        now = limits.timer()
+        self.assertEqual([limit.admit(10, now) for _ in range(6)],
+                         [True] * 5 + [False])
+        self.assertAlmostEqual(limit.delay(10, now), 0.1, 3)
+        self.assertTrue(limit.admit(10, now + 0.11))
+
+    def test_bytes(self):
+        limit = limits.RateLimit(bytes=100)
+        now = limits.timer()
+        self.assertTrue(limit.admit(60, now))
+        self.assertFalse(limit.admit(60, now))
+        self.assertTrue(limit.admit(40, now))
+        # Larger than the burst, it waits for a full bucket.
+        self.assertTrue(limit.admit(500, now + 1))
+
+
+class TestAdmission(unittest.TestCase):
+    def admission(self, policy, **options):
+        self.shedder = limits.LoadShedder(connection_sentences=2,
+                                          policy=policy, burst=1, **options)
+        return self.shedder.connection()
+
+    def test_drop_newest(self):
+        admission = self.admission('drop_newest')
+        sentences = [b'$GPHDT,%d*00' % index for index in range(5)]
+        self.assertEqual(admission.offer(sentences), sentences[:2])
+        self.assertIsNone(admission.delay())
+        self.assertEqual(self.shedder.stats()['dropped_newest'], 3)
+
+    def test_drop_oldest(self):
+        admission = self.admission('drop_oldest', max_queue=2)
+        sentences = [b'$GPHDT,%d*00' % index for index in range(5)]
+        self.assertEqual(admission.offer(sentences), sentences[:2])
+        self.assertEqual(list(admission.queue), sentences[3:])
+        self.assertEqual(self.shedder.stats()['dropped_oldest'], 1)
+        self.assertGreater(admission.delay(), 0)
+        self.assertEqual(admission.ready(limits.timer() + 1), sentences[3:])
+
+    def test_latest(self):
+        admission = self.admission('latest')
+        sentences = [b'$GPHDT,1*00', b'$GPHDT,2*00', b'$GPHDT,3*00',
+                     b'$GPRMC,4*00', b'$GPHDT,5*00']
+        self.assertEqual(admission.offer(sentences), sentences[:2])
+        self.assertEqual(admission.ready(limits.timer() + 1),
+                         [b'$GPRMC,4*00', b'$GPHDT,5*00'])
+        self.assertEqual(self.shedder.stats()['replaced'], 1)
+
+    def test_disconnect(self):
+        admission = self.admission('disconnect')
+        sentences = [b'$GPHDT,%d*00' % index for index in range(3)]
+        self.assertEqual(admission.offer(sentences), sentences[:2])
+        self.assertTrue(admission.overloaded)
+        self.assertEqual(self.shedder.stats()['disconnected'], 1)
+
+    def test_critical(self):
+        admission = self.admission('drop_newest', critical=['*HRB'])
+        sentences = [b'$GPHDT,1*00'] * 3 + [b'$RBHRB,1*00'] * 3
+        self.assertEqual(admission.offer(sentences),
+                         sentences[:2] + sentences[3:])
+        self.assertEqual(self.shedder.stats()['critical'], 3)
+
+    def test_shared(self):
+        shedder = limits.LoadShedder(sentences=3, burst=1)
+        first, second = shedder.connection(), shedder.connection()
+        self.assertEqual(len(first.offer([b'$GPHDT,1*00'] * 2)), 2)
+        self.assertEqual(len(second.offer([b'$GPHDT,1*00'] * 2)), 1)
+
+    def test_policy(self):
+        self.assertRaises(ValueError, limits.LoadShedder, sentences=1,
+                          policy='random')
+
+
+class TestServerLimits(unittest.TestCase):
+    server_class = server.NMEAServer
+
+    def setUp(self):
+        self.app = self.server_class('127.0.0.1', 0, max_connections=2)
+        self.app.message_handlers = {}
+        self.app.add_message_handler(
+            'RXTST', lambda context, message: formatter.format(
+                'TXTST,' + message['data'][0]))
+        self.app.add_message_handler(
+            'RXHRB', lambda context, message: formatter.format('TXHRB'))
+
+    def tearDown(self):
+        self.app.shutdown()
+
+    def connect(self):
+        client = socket.create_connection(self.app.server_address, timeout=5)
+        self.addCleanup(client.close)
+        return client
+
+    def read(self, client, count):
+        rfile = client.makefile('rb')
+        return [rfile.readline().decode().strip() for _ in range(count)]
+
+    def test_rate_limit(self):
+        self.app.add_rate_limit(connection_sentences=5, burst=1,
+                                critical=['RXHRB'])
+        self.app.start()
+        client = self.connect()
+        client.sendall(b''.join(sentence('RXTST,{}'.format(index))
+                                for index in range(50)) +
+                       sentence('RXHRB,1'))
+        self.assertEqual(self.read(client, 6),
+                         [formatter.format('TXTST,{}'.format(index))
+                          for index in range(5)] + [formatter.format('TXHRB')])
+        stats = self.app.stats()['rate_limits']
+        self.assertEqual(stats['dropped_newest'], 45)
+        self.assertEqual(stats['critical'], 1)
+
+    def test_filtered_before_limits(self):
+        self.app.add_sentence_filter(deny=['GPGSV'])
+        self.app.add_rate_limit(connection_sentences=1, burst=2)
+        self.app.start()
+        client = self.connect()
+        client.sendall(sentence('GPGSV,1') + sentence('GPGSV,2') +
+                       sentence('RXTST,1') + sentence('RXTST,2'))
+        self.assertEqual(self.read(client, 2),
+                         [formatter.format('TXTST,1'),
+                          formatter.format('TXTST,2')])
+        self.assertEqual(self.app.stats()['rate_limits']['dropped_newest'], 0)
+
+    def test_latest(self):
+        self.app.add_rate_limit(connection_sentences=20, burst=0.05,
+                                policy='latest')
+        self.app.start()
+        client = self.connect()
+        client.sendall(b''.join(sentence('RXTST,{}'.format(index))
+                                for index in range(50)))
+        # The last value is dispatched once the limit allows.
+        self.assertEqual(self.read(client, 2),
+                         [formatter.format('TXTST,0'),
+                          formatter.format('TXTST,49')])
+        self.assertEqual(self.app.stats()['rate_limits']['replaced'], 48)
+
+    def test_disconnect(self):
+        self.app.add_rate_limit(connection_sentences=1, burst=1,
+                                policy='disconnect')
+        self.app.start()
+        client = self.connect()
+        client.sendall(sentence('RXTST,1') + sentence('RXTST,2'))
+        rfile = client.makefile('rb')
+        self.assertEqual(rfile.readline().decode().strip(),
+                         formatter.format('TXTST,1'))
+        self.assertEqual(rfile.readline(), b'')
+
+    def test_max_connections(self):
+        self.app.start()
+        clients = [self.connect() for _ in range(2)]
+        for client in clients:
+            client.sendall(sentence('RXTST,1'))
+            self.assertEqual(self.read(client, 1),
+                             [formatter.format('TXTST,1')])
+        refused = self.connect()
+        self.assertEqual(refused.recv(1024), b'')
+        self.assertEqual(self.app.stats()['rejected_connections'], 1)
+        clients[0].close()
+        deadline = time.time() + 5
+        while True:
+            client = self.connect()
+            try:
+                client.sendall(sentence('RXTST,2'))
+                if self.read(client, 1) == [formatter.format('TXTST,2')]:
+                    break
+            except (IOError, OSError):
+                pass
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+
+
+if sys.version_info >= (3, 7):
+    from nmea.aioserver import AsyncNMEAServer
+
+    class TestAsyncServerLimits(TestServerLimits):
+        server_class = AsyncNMEAServer
+
+
+if __name__ == '__main__':
+    unittest.main()
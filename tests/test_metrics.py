@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.metrics
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.metrics module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import socket
+import threading
+import time
+import unittest
+
+try:
+    from urllib2 import urlopen, HTTPError
+except ImportError:  # Python 3
+    from urllib.request import urlopen
+    from urllib.error import HTTPError
+
+from nmea import formatter, metrics, server
+
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = metrics.Histogram()
+        for microseconds in range(1, 1001):
+            histogram.record(microseconds / 1e6)
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 1000)
+        self.assertAlmostEqual(summary['mean'], 500.5e-6)
+        self.assertAlmostEqual(summary['max'], 1e-3)
+        # Buckets are within about 6% of the values they hold.
+        self.assertLess(abs(summary['p50'] - 500e-6), 500e-6 * 0.07)
+        self.assertLess(abs(summary['p99'] - 990e-6), 990e-6 * 0.07)
+        self.assertLessEqual(summary['p999'], summary['max'])
+
+    def test_small_values(self):
+        histogram = metrics.Histogram()
+        histogram.record(0)
+        histogram.record(5e-9)
+        self.assertEqual(histogram.percentile(0.5), 1e-9)
+        self.assertEqual(histogram.percentile(1), 5e-9)
+
+    def test_empty(self):
+        self.assertIsNone(metrics.Histogram().percentile(0.5))
+        self.assertIsNone(metrics.Histogram().summary()['mean'])
+
+    def test_merge(self):
+        first, second = metrics.Histogram(), metrics.Histogram()
+        first.record(1e-6)
+        second.record(1e-3)
+        first.merge(second)
+        self.assertEqual(first.count, 2)
+        self.assertEqual(first.max, 1e-3)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_threads_merged(self):
+        recorded = metrics.Metrics()
+
+        def record():
+            for _ in range(100):
+                recorded.dispatched('GPGGA', [0.0, 1e-6, 2e-6, 3e-6, 4e-6])
+            recorded.count('bad_checksum')
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        # Dead threads' recorders are kept once merged.
+        for thread in threads:
+            thread.join()
+        record()
+        for _ in range(2):
+            snapshot = recorded.snapshot()
+            self.assertEqual(snapshot['totals']['messages'], 500)
+            self.assertEqual(snapshot['totals']['bad_checksum'], 5)
+            stages = snapshot['sentences']['GPGGA']['stages']
+            self.assertEqual(sorted(stages), sorted(metrics.STAGES))
+            self.assertEqual(stages['parse']['count'], 500)
+
+    def test_reset(self):
+        recorded = metrics.Metrics()
+        recorded.count('errors', 'GPGGA')
+        recorded.received('a:1', 10)
+        recorded.reset()
+        snapshot = recorded.snapshot()
+        self.assertEqual(snapshot['totals']['errors'], 0)
+        self.assertEqual(snapshot['connections'], {})
+
+    def test_prometheus(self):
+        recorded = metrics.Metrics()
+        recorded.dispatched('GPGGA', [0.0, 1e-6, 2e-6, 3e-6, 4e-6], True)
+        recorded.received('a:1', 82)
+        text = metrics.prometheus(recorded.snapshot())
+        self.assertIn('nmeaserver_messages_total 1\n', text)
+        self.assertIn('nmeaserver_unknown_total{sentence_id="GPGGA"} 1\n',
+                      text)
+        self.assertIn('nmeaserver_dispatch_seconds_count{sentence_id="GPGGA",'
+                      'stage="handler"} 1\n', text)
+        self.assertIn('nmeaserver_connection_bytes_in_total{connection="a:1"}'
+                      ' 82\n', text)
+
+
+class TestDispatch(unittest.TestCase):
+    def setUp(self):
+        self.app = server.NMEAServer('127.0.0.1', 0, metrics=True)
+        self.app.message_handlers = {}
+
+        @self.app.message('RBHRB')
+        def hrb(context, message):
+            return formatter.format('TXHRB,OK')
+
+        @self.app.message('RBERR')
+        def err(context, message):
+            raise RuntimeError('handler failed')
+
+    def test_disabled(self):
+        self.assertIsNone(server.NMEAServer().metrics)
+        self.assertIsNone(server.NMEAServer().metrics_snapshot())
+
+    def test_dispatch(self):
+        context = {'client_address': 'test'}
+        for body in ('RBHRB,1', 'RBHRB,2', 'RBUNK,1', 'RBERR,1'):
+            self.app.dispatch(formatter.format(body), context)
+        self.app.dispatch('$RBHRB,1*00', context)
+        snapshot = self.app.metrics_snapshot()
+        self.assertEqual(snapshot['totals'], {
+            'messages': 3, 'bad_checksum': 1, 'unknown': 1, 'errors': 1})
+        self.assertEqual(snapshot['sentences']['RBHRB']['messages'], 2)
+        self.assertEqual(snapshot['sentences']['RBUNK']['unknown'], 1)
+        self.assertEqual(snapshot['sentences']['RBERR']['errors'], 1)
+        handler = snapshot['sentences']['RBHRB']['stages']['handler']
+        self.assertEqual(handler['count'], 2)
+        self.assertGreater(handler['max'], 0)
+
+    def test_pool_dispatch(self):
+        app = server.NMEAServer('127.0.0.1', 0, workers=2, metrics=True)
+        app.message_handlers = self.app.message_handlers
+        app.start()
+        self.addCleanup(app.shutdown)
+        done = threading.Event()
+        app.dispatch_to_pool(formatter.format('RBHRB,1'), {},
+                             lambda response: done.set())
+        self.assertTrue(done.wait(5))
+        stages = app.metrics_snapshot()['sentences']['RBHRB']['stages']
+        self.assertEqual(stages['posthandler']['count'], 1)
+
+    def test_connection_bytes(self):
+        self.app.start()
+        self.addCleanup(self.app.shutdown)
+        client = socket.create_connection(self.app.nmeaserver.server_address)
+        self.addCleanup(client.close)
+        request = (formatter.format('RBHRB,1') + '\r\n').encode()
+        client.sendall(request)
+        response = client.makefile('rb').readline()
+        # The writer counts what it sent once send() returns.
+        for _ in range(100):
+            connection, = self.app.metrics_snapshot()['connections'].values()
+            if connection['bytes_out']:
+                break
+            time.sleep(0.01)
+        self.assertEqual(connection, {'bytes_in': len(request),
+                                      'bytes_out': len(response)})
+
+    def test_endpoint(self):
+        endpoint = metrics.MetricsEndpoint(self.app, 0)
+        endpoint.start()
+        self.addCleanup(endpoint.shutdown)
+        self.app.dispatch(formatter.format('RBHRB,1'), {})
+        url = 'http://{}:{}/metrics'.format(*endpoint.server_address)
+        response = urlopen(url, timeout=5)
+        self.assertIn('text/plain', response.info()['Content-Type'])
+        text = response.read().decode()
+        self.assertIn('nmeaserver_messages_total{sentence_id="RBHRB"} 1\n',
+                      text)
+        with self.assertRaises(HTTPError):
+            urlopen(url.replace('/metrics', '/other'), timeout=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
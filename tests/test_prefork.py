@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.prefork
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.prefork module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import os
+import socket
+import unittest
+
+from nmea import formatter, prefork, server
+
+CLIENTS = 16
+
+
+@unittest.skipUnless(prefork.supported(), 'requires SO_REUSEPORT and fork')
+class TestPrefork(unittest.TestCase):
+    def setUp(self):
+        self.app = server.NMEAServer('127.0.0.1', 0, metrics=True)
+        self.app.message_handlers = {}
+
+        @self.app.message('RBPID')
+        def pid(context, message):
+            return formatter.format('TXPID,{}'.format(os.getpid()))
+
+    def request(self, client):
+        client.sendall((formatter.format('RBPID,1') + '\r\n').encode())
+        return client.makefile('rb').readline()
+
+    def test_processes(self):
+        self.app.start(processes=2)
+        self.addCleanup(self.app.shutdown)
+        self.assertNotEqual(self.app.server_address[1], 0)
+        pids = set()
+        clients = []
+        for _ in range(CLIENTS):
+            client = socket.create_connection(self.app.server_address)
+            clients.append(client)
+            self.addCleanup(client.close)
+            response = formatter.parse(self.request(client).strip())
+            pids.add(int(response['data'][0]))
+        self.assertNotIn(os.getpid(), pids)
+        self.assertEqual(len(pids), 2)
+
+        snapshot = self.app.metrics_snapshot()
+        self.assertEqual(snapshot['sentences']['RBPID']['messages'], CLIENTS)
+        self.assertEqual(len(snapshot['connections']), CLIENTS)
+        self.assertEqual(len(self.app.stats()['processes']), 2)
+
+    def test_shutdown(self):
+        self.app.start(processes=2)
+        processes = [process for process, _ in
+                     self.app.process_group.processes]
+        address = self.app.server_address
+        self.app.shutdown()
+        for process in processes:
+            self.assertFalse(process.is_alive())
+            self.assertEqual(process.exitcode, 0)
+        self.assertRaises(socket.error, socket.create_connection, address)
+
+    def test_bind_error(self):
+        taken = socket.socket()
+        self.addCleanup(taken.close)
+        taken.bind(('127.0.0.1', 0))
+        taken.listen(1)
+        self.app.port = taken.getsockname()[1]
+        self.assertRaises(socket.error, self.app.start, 2)
+        self.assertIsNone(self.app.process_group)
+
+
+if __name__ == '__main__':
+    unittest.main()
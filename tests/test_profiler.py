@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.profiler
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.profiler module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import unittest
+
+from nmea import profiler, server
+
+
+def spin_in_handler(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+
+def spin_elsewhere(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+
+class TestProfiler(unittest.TestCase):
+    def spin(self, target, name):
+        stop = threading.Event()
+        thread = threading.Thread(target=target, args=(stop,), name=name)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(stop.set)
+
+    def test_collapsed(self):
+        self.spin(spin_in_handler, "client-('127.0.0.1', 1)")
+        self.spin(spin_elsewhere, 'other')
+        sampler = profiler.Profiler(interval=0.001)
+        sampler.start()
+        time.sleep(0.1)
+        sampler.stop()
+        self.assertFalse(sampler.running)
+        self.assertGreater(sampler.samples, 0)
+        lines = sampler.collapsed().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(stack.startswith('client;'))
+            self.assertGreater(int(count), 0)
+        self.assertIn('spin_in_handler (', sampler.collapsed())
+        self.assertNotIn('spin_elsewhere', sampler.collapsed())
+
+    def test_bounded(self):
+        self.spin(spin_in_handler, 'nmea')
+        sampler = profiler.Profiler(max_stacks=1, max_depth=2)
+        for _ in range(50):
+            sampler.sample()
+        self.assertEqual(sampler.samples, 50)
+        self.assertLessEqual(len(sampler.stacks), 2)
+        for stack in sampler.stacks:
+            self.assertLessEqual(stack.count(';'), 2)
+        sampler.reset()
+        self.assertEqual(sampler.collapsed(), '')
+
+
+class TestServerProfiling(unittest.TestCase):
+    def setUp(self):
+        self.app = server.NMEAServer('127.0.0.1', 0)
+
+    def test_start_stop(self):
+        self.assertIsNone(self.app.stop_profiling())
+        self.app.start()
+        self.addCleanup(self.app.shutdown)
+        sampler = self.app.start_profiling(interval=0.001)
+        self.assertIs(self.app.start_profiling(interval=0.001), sampler)
+        time.sleep(0.05)
+        collapsed = self.app.stop_profiling()
+        self.assertIn('nmea;', collapsed)
+        self.assertIn('serve_forever', collapsed)
+        self.assertEqual(sampler.samples, 0)
+
+    @unittest.skipUnless(hasattr(signal, 'SIGUSR2'), 'requires SIGUSR2')
+    def test_signal(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.app.profile_signal = signal.SIGUSR2
+        self.app.profile_path = os.path.join(directory, 'profile.folded')
+        self.app.start()
+        self.addCleanup(signal.signal, signal.SIGUSR2, signal.SIG_DFL)
+        self.addCleanup(self.app.shutdown)
+        os.kill(os.getpid(), signal.SIGUSR2)
+        time.sleep(0.05)
+        self.assertTrue(self.app.profiler.running)
+        os.kill(os.getpid(), signal.SIGUSR2)
+        time.sleep(0.05)
+        self.assertFalse(self.app.profiler.running)
+        with open(self.app.profile_path) as profile:
+            self.assertIn('nmea;', profile.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.replay
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.replay module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import gzip
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from nmea import formatter, replay, server
+
+LOG = [formatter.format('GPGGA,1235{:02},4807.038,N,01131.000,E,1,08,0.9,'
+                        '545.4,M,46.9,M,,'.format(second))
+       for second in range(0, 6, 2)] + \
+    [formatter.format('HEHDT,274.07,T'), '', '$GPGGA,Bad*00']
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.app = server.NMEAServer()
+        self.app.message_handlers = {}
+        self.received = []
+
+        @self.app.message('GPGGA')
+        def gga(context, message):
+            self.received.append((context['client_address'],
+                                  message['data'][0]))
+            return formatter.format('TXGGA,OK')
+
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_log(self, name, opener=open):
+        path = os.path.join(self.directory, name)
+        with opener(path, 'wb') as log:
+            log.write(('\r\n'.join(LOG) + '\r\n').encode())
+        return path
+
+    def assertReplayed(self, report):
+        self.assertEqual(self.received, [('replay', '123500'),
+                                         ('replay', '123502'),
+                                         ('replay', '123504')])
+        self.assertEqual(report['sentences'], 5)
+        # The missing handler and the bad checksum handler respond too.
+        self.assertEqual(report['responses'], 5)
+        self.assertEqual(report['handlers']['GPGGA']['count'], 4)
+        self.assertEqual(report['handlers']['HEHDT']['count'], 1)
+        for stats in report['handlers'].values():
+            self.assertLessEqual(stats['p50'], stats['max'])
+        self.assertGreater(report['rate'], 0)
+
+    def test_plain_log(self):
+        self.assertReplayed(replay.replay(self.app, self.write_log('a.log')))
+
+    def test_gzip_log(self):
+        self.assertReplayed(replay.replay(
+            self.app, self.write_log('a.log.gz', gzip.open)))
+
+    @unittest.skipUnless(hasattr(os, 'fspath'), 'needs path-like objects')
+    def test_path_like_log(self):
+        import pathlib
+        self.assertReplayed(replay.replay(
+            self.app, pathlib.Path(self.write_log('a.log'))))
+
+    def test_lines(self):
+        self.assertReplayed(replay.replay(self.app, LOG))
+
+    def test_speed(self):
+        start = time.time()
+        report = replay.replay(self.app, LOG, speed=20)
+        self.assertGreaterEqual(time.time() - start, 0.2)
+        self.assertLess(report['seconds'], 2)
+
+    def test_past_midnight(self):
+        lines = [formatter.format('GPGGA,235959.9,,,,,0,00,,,M,,M,,'),
+                 formatter.format('GPGGA,000000.1,,,,,0,00,,,M,,M,,')]
+        start = time.time()
+        replay.replay(self.app, lines, speed=1)
+        self.assertLess(time.time() - start, 1)
+
+    def test_sentence_time(self):
+        self.assertEqual(replay.sentence_time(LOG[1].encode()),
+                         12 * 3600 + 35 * 60 + 2)
+        self.assertIsNone(replay.sentence_time(LOG[3]))
+        self.assertIsNone(replay.sentence_time('garbage'))
+
+    def test_context_creator(self):
+        @self.app.context_creator()
+        def context(default_context):
+            default_context['client_address'] = 'created'
+            return default_context
+        self.addCleanup(self.app.add_context_creator, None)
+        replay.replay(self.app, LOG[:1])
+        self.assertEqual(self.received, [('created', '123500')])
+
+
+if __name__ == '__main__':
+    unittest.main()
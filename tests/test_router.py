@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.router
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.router module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import threading
+import unittest
+
+from nmea import formatter, router, server
+
+
+def gga(context, message): pass
+def gnss(context, message): pass
+def talker(context, message): pass
+def missing(context, message): pass
+
+
+class TestRouter(unittest.TestCase):
+    def test_exact(self):
+        table = router.Router({'GPGGA': gga}, missing)
+        self.assertEqual(table.resolve('GPGGA'), (gga, False))
+        self.assertEqual(table.resolve('GPRMC'), (missing, True))
+
+    def test_wildcards(self):
+        table = router.Router({'*GGA': gga, 'GP***': talker}, missing)
+        self.assertEqual(table.resolve('GNGGA'), (gga, False))
+        self.assertEqual(table.resolve('GPRMC'), (talker, False))
+        self.assertEqual(table.resolve('GNRMC'), (missing, True))
+        # Each '*' but a lone leading one stands for one character.
+        self.assertEqual(table.resolve('GPRMCX'), (missing, True))
+        self.assertEqual(table.resolve('GGA'), (missing, True))
+        self.assertEqual(table.resolve('PGRMGGA'), (gga, False))
+
+    def test_specificity(self):
+        table = router.Router({'*GGA': gga, 'GP***': talker, 'GNGGA': gnss})
+        self.assertEqual(table.resolve('GNGGA'), (gnss, False))
+        # Four characters that are not wildcards win over two.
+        self.assertEqual(table.resolve('GPGGA'), (gga, False))
+
+    def test_priority(self):
+        table = router.Router({'*GGA': gga, 'GP***': talker, 'GNGGA': gnss},
+                              priorities={'GP***': 1, '*GGA': 2})
+        self.assertEqual(table.resolve('GPGGA'), (gga, False))
+        self.assertEqual(table.resolve('GNGGA'), (gga, False))
+        self.assertEqual(table.resolve('GPRMC'), (talker, False))
+
+    def test_none_excludes(self):
+        table = router.Router({'GP***': talker, 'GPGSV': None}, missing)
+        self.assertEqual(table.resolve('GPGSV'), (missing, True))
+        self.assertEqual(table.resolve('GPGSA'), (talker, False))
+
+    def test_cache(self):
+        table = router.Router({'*GGA': gga}, missing, cache_size=2)
+        for sentence_id in ('GPGGA', 'AAAAA', 'BBBBB', 'GPGGA'):
+            table.resolve(sentence_id)
+        self.assertLessEqual(len(table._cache), 2)
+        self.assertEqual(table.resolve('GPGGA'), (gga, False))
+
+
+class TestSentenceFilter(unittest.TestCase):
+    def test_allow(self):
+        accepted = router.SentenceFilter(allow=['*GGA', 'RB***'])
+        self.assertTrue(accepted.accepts(b'$GPGGA,1*00'))
+        self.assertTrue(accepted.accepts('$RBHRB,1*00'))
+        self.assertTrue(accepted.accepts(bytearray(b'$GNGGA,1*00')))
+        self.assertFalse(accepted.accepts(b'$GPGSV,1*00'))
+        self.assertFalse(accepted.accepts('$GPGSV,2*00'))
+        self.assertEqual(accepted.stats()['rejected'], {'GPGSV': 2})
+
+    def test_deny(self):
+        accepted = router.SentenceFilter(allow=['GP***'], deny=['GPGSV'])
+        self.assertTrue(accepted.accepts(b'$GPGGA,1*00'))
+        self.assertFalse(accepted.accepts(b'$GPGSV,1*00'))
+        self.assertFalse(accepted.accepts(b'$GNGGA,1*00'))
+
+    def test_not_sentences(self):
+        accepted = router.SentenceFilter(allow=['GPGGA'])
+        self.assertTrue(accepted.accepts(b''))
+        self.assertTrue(accepted.accepts(b'garbage'))
+
+
+    def test_concurrent_rejections(self):
+        denied = router.SentenceFilter(deny=['GPGSV'])
+
+        def reject():
+            for _ in range(10000):
+                denied.accepts(b'$GPGSV,1*00')
+
+        threads = [threading.Thread(target=reject) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(denied.stats()['rejected'], {'GPGSV': 80000})
+
+
+class TestDispatch(unittest.TestCase):
+    def setUp(self):
+        self.app = server.NMEAServer('127.0.0.1', 0)
+        self.app.message_handlers = {}
+        self.app.add_unknown_message(
+            lambda context, message: formatter.format('TXUNK'))
+
+    def dispatch(self, sentence):
+        return self.app.dispatch(formatter.format(sentence), {}).strip()
+
+    def test_dispatch(self):
+        @self.app.message('*GGA')
+        def fix(context, message):
+            return formatter.format('TXFIX,' + message['sentence_id'])
+
+        @self.app.message('GNGGA', priority=-1)
+        def low(context, message):
+            return formatter.format('TXLOW')
+
+        self.assertEqual(self.dispatch('GPGGA,1'),
+                         formatter.format('TXFIX,GPGGA'))
+        self.assertEqual(self.dispatch('GNGGA,1'),
+                         formatter.format('TXFIX,GNGGA'))
+        self.assertEqual(self.dispatch('GPRMC,1'), formatter.format('TXUNK'))
+
+    def test_recompiled(self):
+        self.assertEqual(self.dispatch('GPRMC,1'), formatter.format('TXUNK'))
+        self.app.add_message_handler(
+            'GPRMC', lambda context, message: formatter.format('TXRMC'))
+        self.assertEqual(self.dispatch('GPRMC,1'), formatter.format('TXRMC'))
+        self.app.message_handlers = {
+            'GP***': lambda context, message: formatter.format('TXGP')}
+        self.assertEqual(self.dispatch('GPRMC,1'), formatter.format('TXGP'))
+        self.app.add_unknown_message(None)
+        self.assertIsNone(self.app.dispatch(formatter.format('GNRMC,1'), {}))
+
+    def test_recompiled_on_any_change(self):
+        handlers = self.app.message_handlers
+        handlers['GPRMC'] = lambda context, message: formatter.format('TXOLD')
+        self.assertEqual(self.dispatch('GPRMC,1'), formatter.format('TXOLD'))
+        handlers['GPRMC'] = lambda context, message: formatter.format('TXNEW')
+        self.assertEqual(self.dispatch('GPRMC,1'), formatter.format('TXNEW'))
+        # Same size, different handlers.
+        del handlers['GPRMC']
+        handlers['GP***'] = lambda context, message: formatter.format('TXGP')
+        self.assertEqual(self.dispatch('GPRMC,1'), formatter.format('TXGP'))
+        handlers.update({'GPRMC': handlers.pop('GP***')})
+        self.assertEqual(self.dispatch('GPRMC,1'), formatter.format('TXGP'))
+        self.assertEqual(self.dispatch('GPGGA,1'), formatter.format('TXUNK'))
+
+    def test_filter(self):
+        self.app.add_message_handler(
+            '*GGA', lambda context, message: formatter.format('TXGGA'))
+        self.app.add_sentence_filter(deny=['GPGSV'])
+        self.assertIsNone(self.app.dispatch(formatter.format('GPGSV,1'), {}))
+        self.assertEqual(self.dispatch('GPGGA,1'), formatter.format('TXGGA'))
+        # A filter rejects before the checksum is checked.
+        self.assertIsNone(self.app.dispatch(b'$GPGSV,1*00', {}))
+        self.assertEqual(self.app.stats()['sentence_filter']['rejected'],
+                         {'GPGSV': 2})
+        context = {'sentence_filter': router.SentenceFilter(deny=['*GGA'])}
+        self.assertIsNone(self.app.dispatch(formatter.format('GPGGA,1'),
+                                            context))
+        self.assertEqual(self.app.dispatch(formatter.format('GPGSV,1'),
+                                           context).strip(),
+                         formatter.format('TXUNK'))
+        self.app.add_sentence_filter()
+        self.assertIsNone(self.app.sentence_filter)
+
+    def test_pooled_filter(self):
+        self.app.add_sentence_filter(allow=['GPGGA'])
+        responses = []
+        self.app.dispatch_to_pool(formatter.format('GPGSV,1'), {},
+                                  responses.append)
+        self.assertEqual(responses, [None])
+
+
+if __name__ == '__main__':
+    unittest.main()
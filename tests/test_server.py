@@ -8,14 +8,25 @@
     :license: APLv2, see LICENSE for more details.
 """
 
+import os
+import socket
+import time
 import unittest
 
-from nmea import server
+from nmea import server, formatter
 
 
 def dummy1(): pass
 def dummy2(): pass
 
+def big_handler(context, message):
+    return formatter.format('TXBIG,' + 'x' * 8192)
+
+
+def pooled_handler(context, message):
+    time.sleep(float(message['data'][0]))
+    return formatter.format('TXSLP,' + message['data'][0])
+
 def assertServerClean(self):
     self.assertIsNone(self.nmeaserver.missing_handler)
     self.assertIsNone(self.nmeaserver.message_pre_handler)
@@ -25,7 +36,7 @@ def assertServerClean(self):
     self.assertIsNone(self.nmeaserver.connection_context_creator)
 
 class TestStringMethods(unittest.TestCase):
-    nmeaserver = nmeaserver.NMEAServer()
+    nmeaserver = server.NMEAServer()
 
     def test_add_message_handler(self):
         assertServerClean(self)
@@ -92,5 +103,289 @@ class TestStringMethods(unittest.TestCase):
         self.assertIsNone(self.nmeaserver.error_handler)
         assertServerClean(self) 
 
+
+class TestConnection(unittest.TestCase):
+    def setUp(self):
+        self.app = server.NMEAServer('127.0.0.1', 0)
+        self.app.message_handlers = {}
+        self.app.add_message_handler(
+            'RXTST', lambda context, message: formatter.format(
+                'TXTST,' + message['data'][0]))
+        self.app.start()
+        self.client = socket.create_connection(
+            self.app.nmeaserver.server_address, timeout=5)
+        self.rfile = self.client.makefile('rb')
+
+    def tearDown(self):
+        self.client.close()
+        if not self.app.shutdown_flag:
+            self.app.shutdown()
+
+    def request(self, sentence):
+        self.client.sendall((formatter.format(sentence) + '\r\n').encode())
+        return self.rfile.readline().decode().strip()
+
+    def test_response_latency(self):
+        self.request('RXTST,warmup')
+        start = time.time()
+        self.assertEqual(self.request('RXTST,1'), formatter.format('TXTST,1'))
+        self.assertLess(time.time() - start, 0.05)
+
+    def test_multiple_sentences_in_one_packet(self):
+        self.client.sendall((formatter.format('RXTST,1') + '\r\n' +
+                             formatter.format('RXTST,2') + '\r\n').encode())
+        self.assertEqual(self.rfile.readline().decode().strip(),
+                         formatter.format('TXTST,1'))
+        self.assertEqual(self.rfile.readline().decode().strip(),
+                         formatter.format('TXTST,2'))
+
+    def test_shutdown_wakes_idle_connection(self):
+        self.request('RXTST,1')
+        self.app.shutdown()
+        self.assertEqual(self.rfile.readline(), b'')
+
+    def test_connection_backlog(self):
+        self.request('RXTST,1')
+        address = '{}:{}'.format(*self.client.getsockname()[:2])
+        backlog = self.app.stats()['connections'][address]
+        self.assertEqual(backlog['pending'], 0)
+        self.assertEqual(backlog['dropped'], 0)
+        self.rfile.close()
+        self.client.close()
+        deadline = time.time() + 5
+        while address in self.app.stats()['connections'] and \
+                time.time() < deadline:
+            time.sleep(0.01)
+        self.assertNotIn(address, self.app.stats()['connections'])
+
+    def test_streamer_shares_the_writer(self):
+        self.client.close()
+        self.app.shutdown()
+
+        def streamer(context, writer):
+            while context['stream']:
+                writer.write(formatter.format('TXSTR,' + 'x' * 200) + '\r\n')
+                time.sleep(0)
+        self.app.add_response_stream(streamer)
+        self.app.start()
+        self.addCleanup(self.app.add_response_stream, None)
+        self.client = socket.create_connection(
+            self.app.nmeaserver.server_address, timeout=5)
+        self.rfile = self.client.makefile('rb')
+        expected = formatter.format('TXTST,1')
+        for _ in range(50):
+            self.client.sendall(
+                (formatter.format('RXTST,1') + '\r\n').encode())
+        responses = 0
+        while responses < 50:
+            line = self.rfile.readline().decode().strip()
+            if line == expected:
+                responses += 1
+            else:
+                self.assertEqual(line,
+                                 formatter.format('TXSTR,' + 'x' * 200))
+
+
+class TestPublish(unittest.TestCase):
+    def setUp(self):
+        self.app = server.NMEAServer('127.0.0.1', 0)
+        self.app.message_handlers = {}
+
+        @self.app.message('RXSUB')
+        def subscribe(context, message):
+            self.app.subscribe(context, message['data'][0])
+            return formatter.format('TXSUB,' + message['data'][0])
+
+        @self.app.message('RXUNS')
+        def unsubscribe(context, message):
+            self.app.unsubscribe(context, message['data'][0])
+            return formatter.format('TXUNS,' + message['data'][0])
+
+        self.app.start()
+        self.addCleanup(self.app.shutdown)
+
+    def connect(self, *topics):
+        client = socket.create_connection(
+            self.app.nmeaserver.server_address, timeout=5)
+        self.addCleanup(client.close)
+        rfile = client.makefile('rb')
+        self.addCleanup(rfile.close)
+        for topic in topics:
+            client.sendall(
+                (formatter.format('RXSUB,' + topic) + '\r\n').encode())
+            self.assertEqual(rfile.readline().decode().strip(),
+                             formatter.format('TXSUB,' + topic))
+        return client, rfile
+
+    def test_publish_to_all(self):
+        clients = [self.connect('ais') for _ in range(3)]
+        self.assertEqual(self.app.publish('GPHDT,1.0,T'), 3)
+        for client, rfile in clients:
+            self.assertEqual(rfile.readline(),
+                             (formatter.format('GPHDT,1.0,T') + '\n').encode())
+
+    def test_publish_to_subscribers(self):
+        _, nav = self.connect('nav')
+        _, both = self.connect('nav', 'ais')
+        _, ais = self.connect('ais')
+        self.assertEqual(self.app.publish('GPHDT,1.0,T', 'nav'), 2)
+        self.assertEqual(self.app.publish(b'$AIVDM,1*00\r\n', 'ais'), 2)
+        self.assertEqual(self.app.publish('GPHDT,2.0,T', 'none'), 0)
+        hdt = (formatter.format('GPHDT,1.0,T') + '\n').encode()
+        self.assertEqual(nav.readline(), hdt)
+        self.assertEqual(both.readline(), hdt)
+        self.assertEqual(both.readline(), b'$AIVDM,1*00\r\n')
+        self.assertEqual(ais.readline(), b'$AIVDM,1*00\r\n')
+
+    def test_unsubscribe(self):
+        client, rfile = self.connect('nav')
+        client.sendall((formatter.format('RXUNS,nav') + '\r\n').encode())
+        self.assertEqual(rfile.readline().decode().strip(),
+                         formatter.format('TXUNS,nav'))
+        self.assertEqual(self.app.publish('GPHDT,1.0,T', 'nav'), 0)
+        self.assertEqual(self.app.subscriptions, {})
+
+    def test_disconnect_unsubscribes(self):
+        client, rfile = self.connect('nav')
+        rfile.close()
+        client.close()
+        deadline = time.time() + 5
+        while self.app.subscriptions and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.app.subscriptions, {})
+
+
+class TestLifecycle(unittest.TestCase):
+    @unittest.skipUnless(os.path.isdir('/proc/self/fd'), 'needs /proc')
+    def test_restart_does_not_leak_fds(self):
+        def cycle():
+            app = server.NMEAServer('127.0.0.1', 0)
+            app.start()
+            app.shutdown()
+
+        cycle()
+        before = len(os.listdir('/proc/self/fd'))
+        for _ in range(10):
+            cycle()
+        self.assertLessEqual(len(os.listdir('/proc/self/fd')), before)
+
+
+    def test_wakeup_pipe_outlives_connection_threads(self):
+        app = server.NMEAServer('127.0.0.1', 0)
+        app.message_handlers = {'RXSLP': pooled_handler}
+        app.start()
+        pipe = app.wakeup_pipe
+        client = socket.create_connection(app.server_address, timeout=5)
+        self.addCleanup(client.close)
+        client.sendall((formatter.format('RXSLP,0.5') + '\r\n').encode())
+        time.sleep(0.1)
+        app.shutdown()
+        # The connection thread, still in its handler, may select on it.
+        for fd in pipe:
+            os.fstat(fd)
+        # Closed by the connection thread once its handler returned.
+        deadline = time.time() + 5
+        while True:
+            try:
+                os.fstat(pipe[0])
+            except OSError:
+                break
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+        self.assertRaises(OSError, os.fstat, pipe[1])
+
+
+class TestHandlerPool(unittest.TestCase):
+    def start(self, worker_type):
+        self.app = server.NMEAServer('127.0.0.1', 0, workers=4,
+                                     worker_type=worker_type, max_pending=8)
+        self.app.message_handlers = {'RXSLP': pooled_handler}
+        self.app.start()
+        self.addCleanup(self.app.shutdown)
+        client = socket.create_connection(
+            self.app.nmeaserver.server_address, timeout=5)
+        self.addCleanup(client.close)
+        return client
+
+    def assertInOrder(self, client):
+        delays = ['0.2', '0.0', '0.1', '0.0']
+        client.sendall(''.join(formatter.format('RXSLP,' + delay) + '\r\n'
+                               for delay in delays).encode())
+        rfile = client.makefile('rb')
+        for delay in delays:
+            self.assertEqual(rfile.readline().decode().strip(),
+                             formatter.format('TXSLP,' + delay))
+
+    def test_thread_pool_keeps_order(self):
+        start = time.time()
+        self.assertInOrder(self.start('thread'))
+        self.assertLess(time.time() - start, 0.29)
+        stats = self.app.stats()['handler_pool']
+        self.assertEqual(stats['submitted'], 4)
+        self.assertEqual(stats['completed'], 4)
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['max_pending'], 8)
+
+    def test_process_pool_keeps_order(self):
+        self.assertInOrder(self.start('process'))
+
+    def test_process_pool_unknown_sentence(self):
+        client = self.start('process')
+        client.sendall((formatter.format('RXUNK,1') + '\r\n' +
+                        formatter.format('RXSLP,0.0') + '\r\n').encode())
+        rfile = client.makefile('rb')
+        self.assertIn("Received message 'RXUNK'",
+                      rfile.readline().decode())
+        self.assertEqual(rfile.readline().decode().strip(),
+                         formatter.format('TXSLP,0.0'))
+        self.assertEqual(self.app.stats()['handler_pool']['pending'], 0)
+
+    def test_half_close(self):
+        client = self.start('thread')
+        client.sendall((formatter.format('RXSLP,0.1') + '\r\n').encode())
+        client.shutdown(socket.SHUT_WR)
+        rfile = client.makefile('rb')
+        self.assertEqual(rfile.readline().decode().strip(),
+                         formatter.format('TXSLP,0.1'))
+        self.assertEqual(rfile.readline(), b'')
+
+    def test_slow_client_does_not_stall_others(self):
+        self.app = server.NMEAServer('127.0.0.1', 0, workers=4,
+                                     max_backlog=16384)
+        self.app.message_handlers = {'RXSLP': pooled_handler,
+                                     'RXBIG': big_handler}
+        self.app.start()
+        self.addCleanup(self.app.shutdown)
+        slow = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(slow.close)
+        slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        slow.connect(self.app.server_address)
+        # Never read, far more than the socket buffers hold.
+        slow.setblocking(False)
+        request = (formatter.format('RXBIG,1') + '\r\n').encode()
+        try:
+            for _ in range(4096):
+                slow.send(request)
+        except (IOError, OSError):
+            pass
+        time.sleep(0.5)
+        client = socket.create_connection(self.app.server_address, timeout=5)
+        self.addCleanup(client.close)
+        client.sendall((formatter.format('RXSLP,0.0') + '\r\n').encode())
+        self.assertEqual(client.makefile('rb').readline().decode().strip(),
+                         formatter.format('TXSLP,0.0'))
+
+    def test_backpressure(self):
+        client = self.start('thread')
+        client.sendall(''.join(formatter.format('RXSLP,0.05') + '\r\n'
+                               for _ in range(16)).encode())
+        rfile = client.makefile('rb')
+        for _ in range(16):
+            rfile.readline()
+        stats = self.app.stats()['handler_pool']
+        self.assertLessEqual(stats['peak_pending'], 8)
+        self.assertGreater(stats['blocked'], 0)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.sources
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.sources module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import os
+import select
+import time
+import unittest
+
+from nmea import formatter, server
+from nmea.sources import FdSource
+
+
+class TestSources(unittest.TestCase):
+    def setUp(self):
+        self.app = server.NMEAServer('127.0.0.1', 0)
+        self.app.message_handlers = {}
+        self.received = []
+
+        @self.app.message('GPHDT')
+        def hdt(context, message):
+            self.received.append((context['transport'], message['data'][0]))
+            return formatter.format('TXHDT,OK')
+
+    def sentences(self, *headings):
+        return ''.join(formatter.format('GPHDT,{},T'.format(heading)) +
+                       '\r\n' for heading in headings).encode()
+
+    def wait(self, expected):
+        deadline = time.time() + 5
+        while len(self.received) < expected and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.received), expected)
+
+    def test_pipe(self):
+        read, write = os.pipe()
+        source = self.app.add_source(FdSource(self.app, read, closefd=True))
+        self.app.start()
+        self.addCleanup(self.app.shutdown)
+        os.write(write, self.sentences(1, 2))
+        # Split sentences are put back together.
+        os.write(write, self.sentences(3)[:5])
+        self.wait(2)
+        os.write(write, self.sentences(3)[5:] + self.sentences(4).strip())
+        os.close(write)
+        self.wait(4)
+        self.assertEqual([heading for _, heading in self.received],
+                         ['1', '2', '3', '4'])
+        self.assertEqual(self.received[0][0], 'fd')
+        source.thread.join(5)
+        stats = self.app.stats()['sources'][source.name]
+        self.assertFalse(stats['running'])
+        self.assertEqual(stats['sentences'], 4)
+
+    @unittest.skipUnless(hasattr(os, 'openpty'), 'requires a pty')
+    def test_serial_pty(self):
+        device, port = os.openpty()
+        self.addCleanup(os.close, device)
+        path = os.ttyname(port)
+        os.close(port)
+        source = self.app.read_serial(path, 9600, respond=True)
+        self.app.start()
+        self.addCleanup(self.app.shutdown)
+        os.write(device, self.sentences(7, 8))
+        self.wait(2)
+        self.assertEqual(self.received, [('serial', '7'), ('serial', '8')])
+        response = b''
+        expected = (formatter.format('TXHDT,OK') + '\n').encode() * 2
+        deadline = time.time() + 5
+        while len(response) < len(expected) and time.time() < deadline:
+            if select.select([device], [], [], 0.1)[0]:
+                response += os.read(device, 1024)
+        self.assertEqual(response, expected)
+        self.assertEqual(source.name, path)
+
+    def test_shutdown(self):
+        read, write = os.pipe()
+        self.addCleanup(os.close, write)
+        source = self.app.add_source(FdSource(self.app, read, closefd=True))
+        self.app.start()
+        self.app.shutdown()
+        self.assertIsNone(source.thread)
+        self.assertRaises(OSError, os.fstat, read)
+
+
+if __name__ == '__main__':
+    unittest.main()
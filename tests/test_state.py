@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.state
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.state module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import threading
+import unittest
+
+from nmea import formatter, server, state
+
+
+class TestStateStore(unittest.TestCase):
+    def setUp(self):
+        self.store = state.StateStore({'heading': 1.0})
+        self.changes = []
+
+    def record(self, key, old, new, version):
+        self.changes.append((key, old, new, version))
+
+    def test_snapshots(self):
+        before = self.store.snapshot()
+        self.assertEqual(self.store.update(heading=2.0, speed=5.0), 1)
+        after = self.store.snapshot()
+        # A snapshot never changes once taken.
+        self.assertEqual(dict(before), {'heading': 1.0})
+        self.assertEqual(before.version, 0)
+        self.assertEqual(dict(after), {'heading': 2.0, 'speed': 5.0})
+        self.assertEqual(after.version, 1)
+        self.assertEqual(self.store['speed'], 5.0)
+        self.assertIn('speed', self.store)
+        self.assertEqual(self.store.get('course', 0), 0)
+        self.assertEqual(self.store.delete('speed', 'course'), 2)
+        self.assertNotIn('speed', self.store)
+        self.assertEqual(len(self.store), 1)
+
+    def test_unchanged(self):
+        self.assertEqual(self.store.set('heading', 1.0), 0)
+        self.assertEqual(self.store.delete('course'), 0)
+
+    def test_subscribe(self):
+        self.store.subscribe('heading', self.record)
+        self.store.subscribe(None, self.record)
+        self.store.update(heading=2.0, speed=5.0)
+        self.assertEqual(sorted(self.changes, key=repr), sorted([
+            ('heading', 1.0, 2.0, 1), ('heading', 1.0, 2.0, 1),
+            ('speed', None, 5.0, 1)], key=repr))
+        self.store.unsubscribe(None, self.record)
+        del self.changes[:]
+        self.store.delete('heading')
+        self.assertEqual(self.changes, [('heading', 2.0, None, 2)])
+        self.assertEqual(self.store.stats()['subscribers'], 1)
+
+    def test_failing_subscriber(self):
+        self.store.subscribe('heading', lambda *change: 1 / 0)
+        self.store.subscribe('heading', self.record)
+        self.store.set('heading', 3.0)
+        self.assertEqual(self.changes, [('heading', 1.0, 3.0, 1)])
+        self.assertEqual(self.store.stats()['errors'], 1)
+
+    def test_concurrent_writes(self):
+        def write(offset):
+            for index in range(200):
+                self.store.set('key{}'.format(offset), index)
+        threads = [threading.Thread(target=write, args=(offset,))
+                   for offset in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        snapshot = self.store.snapshot()
+        self.assertEqual(snapshot.version, 8 * 200)
+        self.assertEqual(sorted(snapshot.get('key{}'.format(offset))
+                                for offset in range(8)), [199] * 8)
+
+
+class TestServerState(unittest.TestCase):
+    def test_handlers_share_state(self):
+        app = server.NMEAServer('127.0.0.1', 0)
+        app.message_handlers = {}
+
+        @app.message('GPHDT')
+        def heading(context, message):
+            app.state.set('heading', message['data'][0])
+            return formatter.format('TXHDT,OK')
+
+        @app.message('RBSTA')
+        def status(context, message):
+            snapshot = app.state.snapshot()
+            return formatter.format('TXSTA,{},{}'.format(
+                snapshot.version, snapshot.get('heading')))
+
+        app.dispatch(formatter.format('GPHDT,270.5,T'), {})
+        self.assertEqual(app.dispatch(formatter.format('RBSTA,1'),
+                                      {}).strip(),
+                         formatter.format('TXSTA,1,270.5'))
+        self.assertEqual(app.stats()['state']['keys'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.nmea.writer
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the nmea.writer module.
+
+    :license: APLv2, see LICENSE for more details.
+"""
+
+import socket
+import threading
+import time
+import unittest
+
+from nmea.conflation import Conflator
+from nmea.writer import ConnectionWriter
+
+
+class TestConnectionWriter(unittest.TestCase):
+    def setUp(self):
+        self.left, self.right = socket.socketpair()
+        self.right.settimeout(5)
+        self.addCleanup(self.left.close)
+        self.addCleanup(self.right.close)
+
+    def read(self, size):
+        data = b''
+        while len(data) < size:
+            data += self.right.recv(size - len(data))
+        return data
+
+    def test_immediate(self):
+        writer = ConnectionWriter(self.left)
+        writer.write('$A*00\r\n')
+        self.assertEqual(self.read(7), b'$A*00\r\n')
+        writer.close()
+        self.assertEqual(writer.sends, 1)
+
+    def test_coalesces_within_flush_delay(self):
+        writer = ConnectionWriter(self.left, flush_delay=0.05)
+        for i in range(10):
+            writer.write('$A*0' + str(i) + '\r\n')
+        self.assertEqual(self.read(70), b''.join(
+            ('$A*0' + str(i) + '\r\n').encode() for i in range(10)))
+        writer.close()
+        self.assertEqual(writer.sends, 1)
+        self.assertEqual(writer.sentences, 10)
+
+    def test_flush_size(self):
+        writer = ConnectionWriter(self.left, flush_delay=60, flush_size=14)
+        writer.write(b'$A*00\r\n')
+        writer.write(b'$B*00\r\n')
+        start = time.time()
+        self.assertEqual(self.read(14), b'$A*00\r\n$B*00\r\n')
+        self.assertLess(time.time() - start, 1)
+        writer.close()
+
+    def test_flush(self):
+        writer = ConnectionWriter(self.left, flush_delay=60)
+        writer.write(b'$A*00\r\n')
+        writer.flush()
+        self.assertEqual(self.read(7), b'$A*00\r\n')
+        writer.close()
+
+    def test_close_sends_pending(self):
+        writer = ConnectionWriter(self.left, flush_delay=60)
+        writer.write(b'$A*00\r\n')
+        writer.close()
+        self.assertEqual(self.read(7), b'$A*00\r\n')
+        with self.assertRaises(IOError):
+            writer.write(b'$B*00\r\n')
+
+    def test_keeps_order_when_socket_is_full(self):
+        writer = ConnectionWriter(self.left)
+        sentences = [('$A,' + 'x' * 1000 + str(i) + '\r\n').encode()
+                     for i in range(1000)]
+        for sentence in sentences:
+            writer.write(sentence)
+        expected = b''.join(sentences)
+        self.assertEqual(self.read(len(expected)), expected)
+        writer.close()
+
+    def test_drop_oldest(self):
+        writer = ConnectionWriter(self.left, flush_delay=60, max_backlog=14,
+                                  overflow='drop_oldest')
+        for name in 'ABC':
+            writer.write('$' + name + '*00\r\n')
+        self.assertEqual(writer.backlog()['dropped'], 1)
+        self.assertEqual(writer.backlog()['pending_bytes'], 14)
+        writer.close()
+        self.assertEqual(self.read(14), b'$B*00\r\n$C*00\r\n')
+
+    def test_block_sends_before_queueing_more(self):
+        writer = ConnectionWriter(self.left, flush_delay=60, max_backlog=7)
+        writer.write(b'$A*00\r\n')
+        writer.write(b'$B*00\r\n')
+        self.assertEqual(self.read(7), b'$A*00\r\n')
+        backlog = writer.backlog()
+        self.assertEqual(backlog['blocked'], 1)
+        self.assertEqual(backlog['pending_bytes'], 7)
+        writer.close()
+        self.assertEqual(self.read(7), b'$B*00\r\n')
+
+    def test_write_without_blocking(self):
+        writer = ConnectionWriter(self.left, flush_delay=60, max_backlog=7)
+        writer.write(b'$A*00\r\n')
+        writer.write(b'$B*00\r\n', block=False)
+        self.assertEqual(writer.backlog()['pending_bytes'], 14)
+        self.assertEqual(writer.backlog()['blocked'], 0)
+        # Sends what is pending to make room.
+        writer.wait_room()
+        self.assertEqual(self.read(14), b'$A*00\r\n$B*00\r\n')
+        self.assertEqual(writer.backlog()['blocked'], 1)
+        writer.close()
+
+    def test_concurrent_writes_are_not_interleaved(self):
+        writer = ConnectionWriter(self.left, max_backlog=4096)
+        sentence = {}
+        for name in 'ABCD':
+            sentence[name] = ('$' + name + ',' + name * 500 + '*00\r\n').encode()
+
+        def write(name):
+            for _ in range(200):
+                writer.write(sentence[name])
+        threads = [threading.Thread(target=write, args=(name,))
+                   for name in sentence]
+        for thread in threads:
+            thread.start()
+        received = self.read(len(sentence['A']) * 800)
+        for thread in threads:
+            thread.join()
+        writer.close()
+        lines = received.split(b'\n')[:-1]
+        self.assertEqual(len(lines), 800)
+        for line in lines:
+            self.assertEqual(line + b'\n', sentence[line[1:2].decode()])
+
+    def test_overflow_policy(self):
+        with self.assertRaises(ValueError):
+            ConnectionWriter(self.left, overflow='drop_newest')
+
+    def test_conflation(self):
+        writer = ConnectionWriter(self.left, flush_delay=10,
+                                  conflator=Conflator(['*GGA']))
+        for sentence in (b'$GPGGA,1*00\r\n', b'$GPHDT,1*00\r\n',
+                         b'$GNGGA,1*00\r\n', b'$GPGGA,2*00\r\n',
+                         b'$GPHDT,2*00\r\n', b'$GPGGA,3*00\r\n'):
+            writer.write(sentence)
+        writer.flush()
+        expected = (b'$GPGGA,3*00\r\n$GPHDT,1*00\r\n$GNGGA,1*00\r\n'
+                    b'$GPHDT,2*00\r\n')
+        self.assertEqual(self.read(len(expected)), expected)
+        writer.close()
+        self.assertEqual(writer.backlog()['conflated'], 2)
+
+    def test_conflation_after_drop(self):
+        writer = ConnectionWriter(self.left, flush_delay=10, max_backlog=26,
+                                  overflow='drop_oldest',
+                                  conflator=Conflator(['*GGA']))
+        for sentence in (b'$GPHDT,1*00\r\n', b'$GPGGA,1*00\r\n',
+                         b'$GPHDT,2*00\r\n', b'$GPGGA,2*00\r\n'):
+            writer.write(sentence)
+        writer.flush()
+        expected = b'$GPHDT,2*00\r\n$GPGGA,2*00\r\n'
+        self.assertEqual(self.read(len(expected)), expected)
+        writer.close()
+        self.assertEqual(writer.dropped, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()